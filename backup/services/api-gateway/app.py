@@ -5,25 +5,46 @@ Flask-based API Gateway that routes requests to appropriate microservices.
 Handles authentication, request forwarding, and WebSocket connections.
 """
 
-from flask import Flask, request, jsonify, redirect, url_for
+if __name__ == '__main__':
+    # pywsgi serves every request on a greenlet of one thread: make sockets,
+    # sleeps and threading primitives (the token validator's batch locks and
+    # events, outbound requests calls) cooperative before anything imports them
+    from gevent import monkey
+    monkey.patch_all()
+
+from flask import Flask, Response, request, jsonify, redirect, url_for
 from flask_cors import CORS
 from flask_sockets import Sockets
 import os
+import sys
 import jwt
 import json
 import logging
 import requests
+import hashlib
+import random
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 from datetime import datetime, timedelta
 from functools import wraps
 
+# Shared service utilities
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.jwks import KeySet, KeySetUnavailable, JWT_LEGACY_HS256
+from shared.revocation import RevocationList
+from shared.dataloader import CoalescingLoader
+from shared.cache import TTLCache
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Has-Next-Page'])  # keyset pagination headers
 sockets = Sockets(app)
 
 # Configuration
@@ -40,53 +61,302 @@ SOCIAL_SERVICE_URL = os.environ.get('SOCIAL_SERVICE_URL', 'http://localhost:5005
 STREAK_SERVICE_URL = os.environ.get('STREAK_SERVICE_URL', 'http://localhost:5006')
 GRAPHQL_GATEWAY_URL = os.environ.get('GRAPHQL_GATEWAY_URL', 'http://localhost:5000')
 
+# HTTP client configuration
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 2))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', 2))
+HTTP_RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', 0.1))  # seconds
+
+# Health check configuration
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', 2))
+HEALTH_CACHE_TTL = float(os.environ.get('HEALTH_CACHE_TTL', 5))  # seconds
+
+# Proxy configuration
+PROXY_PASSTHROUGH = os.environ.get('PROXY_PASSTHROUGH', 'True').lower() == 'true'
+PROXY_CHUNK_SIZE = int(os.environ.get('PROXY_CHUNK_SIZE', 64 * 1024))
+
+# Keyset pagination headers set by list endpoints; relayed in both proxy modes
+PAGINATION_HEADERS = ('X-Next-Cursor', 'X-Has-Next-Page')
+
+# Upstream response headers relayed to the client in pass-through mode
+PASSTHROUGH_HEADERS = (
+    'Content-Type',
+    'Content-Length',
+    'Content-Encoding',
+    'Cache-Control',
+    'ETag',
+    'Last-Modified',
+    'Content-Disposition'
+) + PAGINATION_HEADERS
+
+# Token verification keys, published by the Auth service
+JWKS_URL = os.environ.get('JWKS_URL', f'{AUTH_SERVICE_URL}/.well-known/jwks.json')
+REVOCATIONS_URL = os.environ.get('REVOCATIONS_URL', f'{AUTH_SERVICE_URL}/auth/revocations')
+
+# Token verification cache
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 10000))
+AUTH_CACHE_MAX_TTL = int(os.environ.get('AUTH_CACHE_MAX_TTL', 300))  # seconds
+
+# Tokens the Auth service is asked about are sent in batches (validateTokens)
+VALIDATE_BATCH_SIZE = int(os.environ.get('VALIDATE_BATCH_SIZE', 100))
+VALIDATE_BATCH_WAIT = float(os.environ.get('VALIDATE_BATCH_WAIT', 0.005))  # seconds to gather a batch
+
 # WebSocket clients
 ws_clients = {}
 
+class TokenCache:
+    """Verified tokens, keyed by token hash, in a TTLCache whose entries expire at the token's exp"""
+    
+    def __init__(self, max_size, max_ttl):
+        self.max_ttl = max_ttl
+        self._cache = TTLCache(max_size)
+    
+    @staticmethod
+    def key_for(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+    
+    def get(self, token):
+        """Return (user, claims) cached for a token, or (None, None) on miss"""
+        entry = self._cache.get(self.key_for(token))
+        if entry is None:
+            return None, None
+        return entry['user'], entry['claims']
+    
+    def set(self, token, claims, user):
+        """Cache a verified token until its exp (capped at max_ttl)"""
+        ttl = min(claims.get('exp', time.time() + self.max_ttl) - time.time(), self.max_ttl)
+        if ttl <= 0:
+            return
+        
+        entry = {'user': user, 'claims': claims, 'user_id': str(claims.get('id'))}
+        self._cache.set(self.key_for(token), entry, ttl)
+    
+    def revoke(self, token=None, user_id=None):
+        """Drop a single token or every cached token of a user"""
+        if token:
+            self._cache.delete(self.key_for(token))
+        if user_id is not None:
+            user_id = str(user_id)
+            self._cache.delete_where(lambda key, entry: entry['user_id'] == user_id)
+    
+    def stats(self):
+        return self._cache.stats()
+
+token_cache = TokenCache(AUTH_CACHE_SIZE, AUTH_CACHE_MAX_TTL)
+key_set = KeySet(JWKS_URL, legacy_secret=SECRET_KEY if JWT_LEGACY_HS256 else None)
+revocation_list = RevocationList()
+
+class ServiceClient:
+    """Keep-alive connection pool to a single upstream service.
+    
+    Every call gets connect/read timeouts; GETs are retried a bounded number of
+    times on connection errors and timeouts with full-jitter exponential backoff.
+    """
+    
+    def __init__(self, name, base_url, pool_size):
+        self.name = name
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        self.max_retries = HTTP_MAX_RETRIES
+        self.backoff = HTTP_RETRY_BACKOFF
+        
+        self.session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+        
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+    
+    def request(self, method, path, retry=True, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        url = f"{self.base_url}{path}"
+        attempts = 1 + (self.max_retries if retry and method == 'GET' else 0)
+        
+        for attempt in range(attempts):
+            self._track(1)
+            try:
+                return self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt + 1 >= attempts:
+                    with self._lock:
+                        self.errors += 1
+                    raise
+                with self._lock:
+                    self.retries += 1
+            finally:
+                self._track(-1)
+            
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+    
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+    
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+    
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+    
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+    
+    def _track(self, delta):
+        with self._lock:
+            if delta > 0:
+                self.requests += 1
+            self.in_flight += delta
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+    
+    def stats(self):
+        """Pool utilization for /health"""
+        idle = 0
+        opened = 0
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is not None:
+                idle += pool.pool.qsize() if pool.pool else 0
+                opened += pool.num_connections
+        
+        with self._lock:
+            return {
+                'poolSize': self.pool_size,
+                'inFlight': self.in_flight,
+                'peakInFlight': self.peak_in_flight,
+                'utilization': round(self.in_flight / self.pool_size, 2),
+                'connectionsOpened': opened,
+                'idleSlots': idle,
+                'requests': self.requests,
+                'retries': self.retries,
+                'errors': self.errors
+            }
+
+def pool_size_for(name):
+    """Per-upstream pool size, e.g. MOOD_POOL_SIZE, defaulting to HTTP_POOL_SIZE"""
+    return int(os.environ.get(f'{name.upper()}_POOL_SIZE', HTTP_POOL_SIZE))
+
+service_clients = {
+    name: ServiceClient(name, url, pool_size_for(name))
+    for name, url in (
+        ('auth', AUTH_SERVICE_URL),
+        ('user', USER_SERVICE_URL),
+        ('mood', MOOD_SERVICE_URL),
+        ('hug', HUG_SERVICE_URL),
+        ('social', SOCIAL_SERVICE_URL),
+        ('streak', STREAK_SERVICE_URL),
+        ('graphql', GRAPHQL_GATEWAY_URL)
+    )
+}
+
+def get_service_client(service_url):
+    """Look up the pooled client for a service base URL"""
+    for client in service_clients.values():
+        if client.base_url == service_url:
+            return client
+    raise ValueError(f"No client configured for {service_url}")
+
 # Authentication utilities
-def authenticate():
-    """Verify JWT token from Authorization header"""
+def get_token_from_request():
+    """Extract JWT token from request headers"""
     auth_header = request.headers.get('Authorization')
     if not auth_header:
         return None
     
     try:
-        # Extract token
-        token = auth_header.split(' ')[1]
-        
-        # Verify token with Auth service
-        response = requests.post(
-            f"{AUTH_SERVICE_URL}/graphql",
-            json={
-                "query": """
-                query ValidateToken($token: String!) {
-                    validateToken(token: $token) {
-                        valid
-                        user {
-                            id
-                            username
-                            email
-                        }
+        return auth_header.split(' ')[1]
+    except (IndexError, AttributeError):
+        return None
+
+def validate_tokens_with_auth_service(tokens):
+    """Validate a batch of tokens with one Auth service call; returns {token: user or None}"""
+    response = service_clients['auth'].post(
+        '/graphql',
+        json={
+            "query": """
+            query ValidateTokens($tokens: [String!]!) {
+                validateTokens(tokens: $tokens) {
+                    valid
+                    user {
+                        id
+                        username
+                        email
                     }
                 }
-                """,
-                "variables": {"token": token}
             }
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('data') and result['data'].get('validateToken'):
-                validation = result['data']['validateToken']
-                if validation.get('valid') and validation.get('user'):
-                    return validation['user']
-        
-        # Fallback to local validation if Auth service is unavailable
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            return {'id': payload.get('id')}
-        except:
-            return None
+            """,
+            "variables": {"tokens": tokens}
+        }
+    )
+    
+    validations = None
+    if response.status_code == 200:
+        validations = (response.json().get('data') or {}).get('validateTokens')
+    if validations is None:
+        raise requests.RequestException(f"validateTokens failed with status {response.status_code}")
+    
+    return {
+        token: validation['user'] if validation.get('valid') and validation.get('user') else None
+        for token, validation in zip(tokens, validations)
+    }
+
+# Concurrent validations (e.g. WebSocket clients reconnecting together) share a call
+token_validator = CoalescingLoader(validate_tokens_with_auth_service, VALIDATE_BATCH_SIZE, VALIDATE_BATCH_WAIT)
+
+def validate_token_with_auth_service(token):
+    """Ask the Auth service to validate a token.
+    
+    Returns (reachable, user); user is None when the token was rejected.
+    """
+    try:
+        return True, token_validator.load(token)
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"Auth service unavailable: {str(e)}")
+        return False, None
+
+def user_from_claims(claims):
+    return {
+        'id': claims.get('id'),
+        'username': claims.get('username'),
+        'email': claims.get('email')
+    }
+
+def verify_token(token):
+    """Verify a JWT locally against the Auth service's published keys and resolve its user"""
+    user, claims = token_cache.get(token)
+    if user:
+        # Revocations arrive after tokens are cached, so check on every hit
+        return None if revocation_list.is_revoked(claims) else user
+    
+    try:
+        claims = key_set.decode(token)
+    except KeySetUnavailable:
+        # No keys yet (Auth service unreachable since startup): ask it directly (not cached)
+        reachable, user = validate_token_with_auth_service(token)
+        return user
+    except jwt.InvalidTokenError:
+        return None
+    
+    if revocation_list.is_revoked(claims):
+        return None
+    
+    user = user_from_claims(claims)
+    token_cache.set(token, claims, user)
+    return user
+
+def authenticate():
+    """Verify JWT token from Authorization header"""
+    token = get_token_from_request()
+    if not token:
+        return None
+    
+    try:
+        return verify_token(token)
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
         return None
@@ -114,9 +384,30 @@ def optional_auth(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def forward_request(service, path, method='GET', data=None, headers=None):
-    """Forward request to microservice and return response"""
+def stream_response(upstream):
+    """Relay an upstream response to the client chunk by chunk, without decoding it"""
+    def generate():
+        try:
+            for chunk in upstream.raw.stream(PROXY_CHUNK_SIZE, decode_content=False):
+                yield chunk
+        finally:
+            upstream.close()
+    
+    headers = [(name, upstream.headers[name]) for name in PASSTHROUGH_HEADERS if name in upstream.headers]
+    response = Response(generate(), status=upstream.status_code, headers=headers)
+    response.call_on_close(upstream.close)
+    return response
+
+def forward_request(service, path, method='GET', data=None, headers=None, passthrough=None):
+    """Forward request to microservice and return response
+    
+    In pass-through mode (PROXY_PASSTHROUGH, the default) the upstream body,
+    status and content headers are streamed to the client as-is; otherwise the
+    body is decoded as JSON and re-serialized by Flask.
+    """
     url = f"{service}{path}"
+    if passthrough is None:
+        passthrough = PROXY_PASSTHROUGH
     
     # Forward headers
     forwarded_headers = {}
@@ -127,36 +418,77 @@ def forward_request(service, path, method='GET', data=None, headers=None):
     if hasattr(request, 'user') and request.user:
         forwarded_headers['X-User-ID'] = str(request.user['id'])
     
+    if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+        return jsonify({'error': f'Unsupported method: {method}'}), 400
+    
+    # Forward query string (limit, pagination, ...)
+    params = list(request.args.items(multi=True))
+    
     try:
-        # Make request to service
-        if method == 'GET':
-            response = requests.get(url, headers=forwarded_headers)
-        elif method == 'POST':
-            response = requests.post(url, json=data, headers=forwarded_headers)
-        elif method == 'PUT':
-            response = requests.put(url, json=data, headers=forwarded_headers)
-        elif method == 'DELETE':
-            response = requests.delete(url, headers=forwarded_headers)
+        # Make request to service over its pooled connection
+        client = get_service_client(service)
+        if method in ('POST', 'PUT'):
+            response = client.request(method, path, params=params, json=data,
+                                      headers=forwarded_headers, stream=passthrough)
         else:
-            return jsonify({'error': f'Unsupported method: {method}'}), 400
-        
-        # Return response from service
-        return response.json(), response.status_code
+            response = client.request(method, path, params=params,
+                                      headers=forwarded_headers, stream=passthrough)
+    except requests.Timeout as e:
+        logger.error(f"Timeout forwarding request to {url}: {str(e)}")
+        return {
+            'error': 'Service timeout',
+            'details': str(e)
+        }, 504
     except requests.RequestException as e:
         logger.error(f"Error forwarding request to {url}: {str(e)}")
         return {
             'error': 'Service unavailable',
             'details': str(e)
         }, 503
+    
+    if passthrough:
+        return stream_response(response)
+    
+    # Return response from service; non-JSON bodies (e.g. HTML error pages) are relayed verbatim
+    try:
+        pagination = {name: response.headers[name] for name in PAGINATION_HEADERS if name in response.headers}
+        return response.json(), response.status_code, pagination
+    except ValueError:
+        return Response(
+            response.content,
+            status=response.status_code,
+            content_type=response.headers.get('Content-Type', 'text/plain')
+        )
 
 # REST API Endpoints
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    services_status = {}
+# Health probes run in parallel; the last result is shared by callers for HEALTH_CACHE_TTL
+health_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='health-probe')
+health_cache = {'checked_at': 0, 'services': None}
+health_lock = threading.Lock()
+
+def probe_service(name, url):
+    """Probe a single service's /health endpoint"""
+    if url == 'self':
+        return {
+            'status': 'healthy',
+            'url': 'self'
+        }
     
-    # Check each service
+    try:
+        response = service_clients[name].get('/health', timeout=HEALTH_CHECK_TIMEOUT, retry=False)
+        return {
+            'status': 'healthy' if response.status_code == 200 else 'unhealthy',
+            'url': url
+        }
+    except requests.RequestException:
+        return {
+            'status': 'unhealthy',
+            'url': url
+        }
+
+def check_services_health(deep=False):
+    """Probe all services concurrently, reusing a recent result unless deep is set"""
     services = {
         'auth': AUTH_SERVICE_URL,
         'user': USER_SERVICE_URL,
@@ -164,31 +496,36 @@ def health_check():
         'gateway': 'self'
     }
     
-    for name, url in services.items():
-        if url == 'self':
-            services_status[name] = {
-                'status': 'healthy',
-                'url': 'self'
-            }
-            continue
+    # Concurrent callers wait for the in-progress probe and reuse its result
+    with health_lock:
+        age = time.monotonic() - health_cache['checked_at']
+        if not deep and health_cache['services'] is not None and age < HEALTH_CACHE_TTL:
+            return health_cache['services'], True
         
-        try:
-            response = requests.get(f"{url}/health", timeout=2)
-            services_status[name] = {
-                'status': 'healthy' if response.status_code == 200 else 'unhealthy',
-                'url': url
-            }
-        except requests.RequestException:
-            services_status[name] = {
-                'status': 'unhealthy',
-                'url': url
-            }
+        futures = {name: health_executor.submit(probe_service, name, url) for name, url in services.items()}
+        services_status = {name: future.result() for name, future in futures.items()}
+        
+        health_cache['services'] = services_status
+        health_cache['checked_at'] = time.monotonic()
+        return services_status, False
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    """Health check endpoint; ?deep=true bypasses the cached probe result"""
+    deep = request.args.get('deep', 'false').lower() == 'true'
+    services_status, cached = check_services_health(deep)
     
     all_healthy = all(service['status'] == 'healthy' for service in services_status.values())
     
     return jsonify({
         'status': 'healthy' if all_healthy else 'degraded',
-        'services': services_status
+        'services': services_status,
+        'cached': cached,
+        'authCache': token_cache.stats(),
+        'jwks': key_set.stats(),
+        'revocations': revocation_list.stats(),
+        'tokenValidator': token_validator.stats(),
+        'pools': {name: client.stats() for name, client in service_clients.items()}
     }), 200 if all_healthy else 503
 
 # Auth endpoints
@@ -213,7 +550,16 @@ def refresh_token():
 @app.route('/api/auth/logout', methods=['POST'])
 def logout():
     """Forward logout request to Auth service"""
-    return forward_request(AUTH_SERVICE_URL, '/auth/logout', method='POST')
+    token = get_token_from_request()
+    headers = {}
+    if token:
+        headers['Authorization'] = request.headers.get('Authorization')
+        
+        # Evict the user's cached tokens so the logout takes effect immediately
+        user = authenticate()
+        token_cache.revoke(token=token, user_id=user['id'] if user else None)
+    
+    return forward_request(AUTH_SERVICE_URL, '/auth/logout', method='POST', headers=headers)
 
 # User endpoints
 @app.route('/api/users/<user_id>', methods=['GET'])
@@ -244,12 +590,25 @@ def create_mood():
     data = request.json
     return forward_request(MOOD_SERVICE_URL, '/moods', method='POST', data=data)
 
+@app.route('/api/moods/batch', methods=['POST'])
+@login_required
+def create_moods():
+    """Create a batch of mood entries"""
+    data = request.json
+    return forward_request(MOOD_SERVICE_URL, '/moods/batch', method='POST', data=data)
+
 @app.route('/api/users/<user_id>/moods', methods=['GET'])
 @optional_auth
 def get_moods(user_id):
     """Get mood history for a user"""
     return forward_request(MOOD_SERVICE_URL, f'/users/{user_id}/moods')
 
+@app.route('/api/users/<user_id>/moods/export', methods=['GET'])
+@login_required
+def export_moods(user_id):
+    """Stream a user's full mood history (always passed through, never buffered)"""
+    return forward_request(MOOD_SERVICE_URL, f'/users/{user_id}/moods/export', passthrough=True)
+
 @app.route('/api/moods/feed', methods=['GET'])
 @optional_auth
 def get_mood_feed():
@@ -283,6 +642,12 @@ def get_sent_hugs(user_id):
     """Get hugs sent by a user"""
     return forward_request(HUG_SERVICE_URL, f'/users/{user_id}/sent-hugs')
 
+@app.route('/api/users/<user_id>/hugs/export', methods=['GET'])
+@login_required
+def export_hugs(user_id):
+    """Stream a user's full hug history (always passed through, never buffered)"""
+    return forward_request(HUG_SERVICE_URL, f'/users/{user_id}/hugs/export', passthrough=True)
+
 @app.route('/api/group-hugs', methods=['POST'])
 @login_required
 def create_group_hug():
@@ -429,8 +794,8 @@ def websocket_endpoint(ws):
                 user_id = ws_clients[client_id]['user_id']
                 # Set user offline in User service
                 try:
-                    requests.put(
-                        f"{USER_SERVICE_URL}/users/{user_id}/online",
+                    service_clients['user'].put(
+                        f"/users/{user_id}/online",
                         json={'isOnline': False},
                         headers={'X-User-ID': str(user_id)}
                     )
@@ -495,51 +860,27 @@ def handle_authentication(ws, data, client_id):
         return
     
     try:
-        # Verify token with Auth service
-        response = requests.post(
-            f"{AUTH_SERVICE_URL}/graphql",
-            json={
-                "query": """
-                query ValidateToken($token: String!) {
-                    validateToken(token: $token) {
-                        valid
-                        user {
-                            id
-                            username
-                            email
-                        }
-                    }
-                }
-                """,
-                "variables": {"token": token}
-            }
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('data') and result['data'].get('validateToken'):
-                validation = result['data']['validateToken']
-                if validation.get('valid') and validation.get('user'):
-                    user = validation['user']
-                    ws_clients[client_id]['authenticated'] = True
-                    ws_clients[client_id]['user_id'] = user['id']
-                    
-                    # Set user online in User service
-                    try:
-                        requests.put(
-                            f"{USER_SERVICE_URL}/users/{user['id']}/online",
-                            json={'isOnline': True},
-                            headers={'X-User-ID': str(user['id'])}
-                        )
-                    except Exception as e:
-                        logger.error(f"Error setting user online: {str(e)}")
-                    
-                    ws.send(json.dumps({
-                        'type': 'auth_response',
-                        'success': True,
-                        'user': user
-                    }))
-                    return
+        user = verify_token(token)
+        if user:
+            ws_clients[client_id]['authenticated'] = True
+            ws_clients[client_id]['user_id'] = user['id']
+            
+            # Set user online in User service
+            try:
+                service_clients['user'].put(
+                    f"/users/{user['id']}/online",
+                    json={'isOnline': True},
+                    headers={'X-User-ID': str(user['id'])}
+                )
+            except Exception as e:
+                logger.error(f"Error setting user online: {str(e)}")
+            
+            ws.send(json.dumps({
+                'type': 'auth_response',
+                'success': True,
+                'user': user
+            }))
+            return
         
         # Token validation failed
         ws.send(json.dumps({
@@ -666,8 +1007,8 @@ def handle_fetch_data(ws, data, client_id):
     
     # Make request to service
     try:
-        response = requests.get(
-            f"{service}{endpoint}",
+        response = get_service_client(service).get(
+            endpoint,
             headers={'X-User-ID': str(ws_clients[client_id]['user_id'])}
         )
         
@@ -699,8 +1040,8 @@ def handle_service_message(ws, data, client_id, service, endpoint):
     message_data = data.get('data', {})
     
     try:
-        response = requests.post(
-            f"{service}{endpoint}",
+        response = get_service_client(service).post(
+            endpoint,
             json=message_data,
             headers={'X-User-ID': str(ws_clients[client_id]['user_id'])}
         )
@@ -735,6 +1076,11 @@ if __name__ == '__main__':
     from gevent import pywsgi
     from geventwebsocket.handler import WebSocketHandler
     
+    # Fetch token verification keys, then keep them fresh in the background,
+    # and follow the Auth service's revocation feed
+    key_set.start()
+    revocation_list.start(REVOCATIONS_URL)
+    
     server = pywsgi.WSGIServer(('0.0.0.0', PORT), app, handler_class=WebSocketHandler)
     logger.info(f"Starting API Gateway on port {PORT}")
     server.serve_forever()
\ No newline at end of file
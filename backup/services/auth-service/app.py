@@ -18,6 +18,21 @@ from ariadne.constants import PLAYGROUND_HTML
 import json
 import sqlite3  # Using SQLite for simplicity; in production, use PostgreSQL with SQLAlchemy
 from functools import wraps
+import sys
+import time
+import hashlib
+import secrets
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Shared service utilities live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import SQLiteDatabase
+from shared.migrations import apply_migrations
+from shared.jwks import SigningKeys, decode_token, JWT_LEGACY_HS256
+from shared.cache import TTLCache
+from shared.revocation import REVOCATION_FEED_TOKEN, feed_reader_allowed
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -31,12 +46,35 @@ CORS(app)
 SECRET_KEY = os.environ.get('JWT_SECRET', 'your-secret-key')
 TOKEN_EXPIRATION = int(os.environ.get('TOKEN_EXPIRATION', 86400))  # 24 hours in seconds
 PORT = int(os.environ.get('PORT', 5001))
+JWT_KEY_DIR = os.environ.get('JWT_KEY_DIR', 'keys')  # PEM private keys; the newest signs
+
+# Refresh tokens: lifetime, and how expired ones are purged
+REFRESH_TOKEN_EXPIRATION = int(os.environ.get('REFRESH_TOKEN_EXPIRATION', TOKEN_EXPIRATION * 7))  # seconds
+REFRESH_TOKEN_SWEEP_INTERVAL = int(os.environ.get('REFRESH_TOKEN_SWEEP_INTERVAL', 300))  # seconds
+REFRESH_TOKEN_SWEEP_BATCH = int(os.environ.get('REFRESH_TOKEN_SWEEP_BATCH', 500))  # rows deleted per write transaction
+
+# Token validation and user lookups
+VALIDATE_TOKENS_MAX = int(os.environ.get('VALIDATE_TOKENS_MAX', 500))  # tokens per validateTokens call
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL = float(os.environ.get('USER_CACHE_TTL', 5))  # seconds; bounds staleness after writes made outside this service
+USER_BATCH_SIZE = 500  # ids per IN (...) query
+
+# Access token revocation feed (/auth/revocations)
+REVOCATION_FEED_LIMIT = int(os.environ.get('REVOCATION_FEED_LIMIT', 1000))  # revocations per response
+REVOCATION_MAX_WAIT = float(os.environ.get('REVOCATION_MAX_WAIT', 30))  # longest long-poll, seconds
+
+# Password hashing: bcrypt cost and the process pool it runs in
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))  # 0 hashes on the request thread
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 16))  # calls waiting for a worker before rejecting
 
 # Database setup - would typically use SQLAlchemy in production
+DATABASE_PATH = os.environ.get('DATABASE_PATH', 'auth.db')
+database = SQLiteDatabase(DATABASE_PATH, app)
+
 def get_db():
-    db = sqlite3.connect('auth.db')
-    db.row_factory = sqlite3.Row
-    return db
+    """Connection for the current request (pooled, released at teardown)"""
+    return database.get()
 
 def init_db():
     with app.app_context():
@@ -56,17 +94,8 @@ def init_db():
         )
         ''')
         
-        # Create refresh_tokens table if not exists
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS refresh_tokens (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            token TEXT UNIQUE NOT NULL,
-            expires_at TIMESTAMP NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-        ''')
+        # Create refresh_tokens table if not exists (older databases are converted by migration 1)
+        cursor.execute(REFRESH_TOKENS_TABLE)
         
         # Create social_accounts table if not exists
         cursor.execute('''
@@ -83,52 +112,288 @@ def init_db():
         
         db.commit()
         
-        # Create sample user for testing
+        # Create sample user for testing (hashing only when it doesn't exist yet)
         try:
-            hashed = bcrypt.hashpw('password123'.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            cursor.execute(
-                'INSERT OR IGNORE INTO users (username, email, password, display_name) VALUES (?, ?, ?, ?)',
-                ('testuser', 'test@example.com', hashed, 'Test User')
-            )
-            db.commit()
+            if not get_user_by_username('testuser'):
+                hashed = password_hasher.hash('password123')
+                cursor.execute(
+                    'INSERT OR IGNORE INTO users (username, email, password, display_name) VALUES (?, ?, ?, ?)',
+                    ('testuser', 'test@example.com', hashed, 'Test User')
+                )
+                db.commit()
         except sqlite3.IntegrityError:
             # User already exists
             pass
+        
+        apply_migrations(db, MIGRATIONS)
+
+# Refresh tokens are opaque random strings; only their SHA-256 is stored, so the
+# key is a fixed 32 bytes and a leaked table can't be replayed. expires_at is in
+# epoch seconds.
+REFRESH_TOKENS_TABLE = '''
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    token_hash BLOB PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+) WITHOUT ROWID
+'''
+
+def hash_refresh_tokens(cursor):
+    """Convert a refresh_tokens table that stored raw tokens to the hashed layout"""
+    cursor.execute('PRAGMA table_info(refresh_tokens)')
+    if 'token' not in {column['name'] for column in cursor.fetchall()}:
+        return
+    
+    cursor.execute('ALTER TABLE refresh_tokens RENAME TO refresh_tokens_old')
+    cursor.execute(REFRESH_TOKENS_TABLE)
+    
+    # Tokens already handed out keep working: they are looked up by hash
+    cursor.execute('SELECT user_id, token, expires_at, created_at FROM refresh_tokens_old')
+    rows = []
+    for row in cursor.fetchall():
+        expires_at = row['expires_at']
+        if isinstance(expires_at, str):
+            expires_at = datetime.strptime(expires_at[:19], '%Y-%m-%d %H:%M:%S')
+        rows.append((
+            refresh_token_hash(row['token']),
+            row['user_id'],
+            int((expires_at - datetime(1970, 1, 1)).total_seconds()),
+            row['created_at']
+        ))
+    cursor.executemany(
+        'INSERT OR IGNORE INTO refresh_tokens (token_hash, user_id, expires_at, created_at) VALUES (?, ?, ?, ?)',
+        rows
+    )
+    cursor.execute('DROP TABLE refresh_tokens_old')
+
+# Schema migrations, applied in order by init_db()
+MIGRATIONS = [
+    (1, 'hashed refresh tokens', [
+        hash_refresh_tokens,
+        # Sweeper range scans, and logout / password change by user
+        'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_expires ON refresh_tokens (expires_at)',
+        'CREATE INDEX IF NOT EXISTS idx_refresh_tokens_user ON refresh_tokens (user_id)'
+    ]),
+    # A revocation is one access token (jti), or every token of user_id
+    # issued before issued_before (jti NULL). Rows are kept until the tokens
+    # they cover have expired; id is the feed cursor and is never reused.
+    (2, 'revoked access tokens', [
+        '''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            jti TEXT,
+            user_id INTEGER NOT NULL,
+            issued_before REAL,
+            expires_at INTEGER NOT NULL,
+            revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_revoked_tokens_jti ON revoked_tokens (jti)',
+        'CREATE INDEX IF NOT EXISTS idx_revoked_tokens_user ON revoked_tokens (user_id, issued_before)',
+        'CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens (expires_at)'
+    ])
+]
+
+# Password hashing
+class PasswordHasherBusy(Exception):
+    """Every hashing worker is busy and the wait queue is full"""
+
+class PasswordHasher:
+    """bcrypt hashing and verification off the request threads.
+    
+    bcrypt is deliberately slow, so it runs in a pool of worker processes
+    (or inline on the calling thread when there are no workers). At most
+    workers + queue_size calls are admitted at once; beyond that calls fail
+    fast with PasswordHasherBusy instead of queueing, so a login storm can't
+    hold up health checks and token refreshes behind password hashing.
+    """
+    
+    def __init__(self, workers, queue_size, rounds):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rounds = rounds
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Create the worker pool (otherwise created by the first call)"""
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                logger.info(f"Password hasher started ({self.workers} workers, cost {self.rounds})")
+        return self._executor
+    
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy('Too many concurrent password operations')
+        
+        executor = self._executor or self.start()
+        if executor is None:
+            try:
+                return fn(*args)
+            finally:
+                self._release()
+        
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the worker is done, even if the caller gives up waiting
+        future.add_done_callback(lambda _: self._release())
+        return future.result()
+    
+    def _release(self):
+        with self._lock:
+            self.completed += 1
+        self._slots.release()
+    
+    def hash(self, password):
+        """bcrypt hash of password at the configured cost"""
+        salt = bcrypt.gensalt(self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+    
+    def verify(self, password, hashed):
+        """Whether password matches the bcrypt hash"""
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+    
+    def needs_rehash(self, hashed):
+        """Whether hashed was made with a cost other than the configured one"""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+    
+    def count_rehash(self):
+        with self._lock:
+            self.rehashed += 1
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queueSize': self.queue_size,
+                'rounds': self.rounds,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed
+            }
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE, BCRYPT_ROUNDS)
+
+def rehash_password(user_id, password, old_hash):
+    """Store password at the configured cost, unless the hash changed meanwhile (background thread)"""
+    try:
+        new_hash = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        # Logins come first; the next successful login tries again
+        return
+    
+    try:
+        with database.connection() as db:
+            cursor = db.execute(
+                'UPDATE users SET password = ? WHERE id = ? AND password = ?',
+                (new_hash, user_id, old_hash)
+            )
+            db.commit()
+            if cursor.rowcount:
+                user_changed(user_id)
+                password_hasher.count_rehash()
+    except sqlite3.Error as e:
+        logger.error(f"Error rehashing password for user {user_id}: {str(e)}")
 
 # Authentication utilities
-def create_token(user_id, expires_in=TOKEN_EXPIRATION):
-    """Create a JWT token for a user"""
+signing_keys = SigningKeys(JWT_KEY_DIR)
+
+def create_token(user, expires_in=TOKEN_EXPIRATION):
+    """Create a JWT token for a user, signed with the current key.
+    
+    username and email ride along so services can identify the user from
+    the token alone.
+    """
     payload = {
-        'id': user_id,
+        'id': user['id'],
+        'username': user['username'],
+        'email': user['email'],
         'exp': datetime.utcnow() + timedelta(seconds=expires_in),
-        'iat': datetime.utcnow()
+        # Sub-second, so a per-user revocation cutoff separates tokens issued
+        # just before it from a login right after
+        'iat': time.time(),
+        'jti': secrets.token_urlsafe(12)
     }
-    return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
+    return signing_keys.sign(payload)
+
+def verify_tokens(tokens):
+    """Verify JWT tokens and return their payloads, None for invalid or revoked ones"""
+    payloads = []
+    for token in tokens:
+        try:
+            payloads.append(decode_token(
+                token,
+                signing_keys.verification_keys(),
+                legacy_secret=SECRET_KEY if JWT_LEGACY_HS256 else None
+            ))
+        except jwt.InvalidTokenError:
+            payloads.append(None)
+    
+    # Revocation is checked for the valid ones together, in order
+    flags = iter(revoked_flags([payload for payload in payloads if payload]))
+    return [payload if payload and not next(flags) else None for payload in payloads]
 
 def verify_token(token):
-    """Verify a JWT token and return the payload"""
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
+    """Verify a JWT token and return the payload (None if revoked)"""
+    return verify_tokens([token])[0]
+
+# Users by id, without password. Every write to a users row in this service
+# calls user_changed(); the short USER_CACHE_TTL covers rows changed by
+# anything else (another auth process, a migration, manual edits).
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+def user_changed(user_id):
+    """Drop a user's cached record; call after updating their users row"""
+    user_cache.delete(int(user_id))
+
+def get_users_by_ids(user_ids):
+    """Users by id as {id: user}, from the cache and one IN (...) query for the rest"""
+    users = {}
+    missing = []
+    for user_id in dict.fromkeys(int(user_id) for user_id in user_ids):
+        cached = user_cache.get(user_id)
+        if cached is None:
+            missing.append(user_id)
+        else:
+            users[user_id] = cached
+    
+    db = get_db()
+    for i in range(0, len(missing), USER_BATCH_SIZE):
+        batch = missing[i:i + USER_BATCH_SIZE]
+        cursor = db.execute(
+            f'SELECT * FROM users WHERE id IN ({",".join("?" * len(batch))})',
+            batch
+        )
+        for row in cursor.fetchall():
+            # Convert to dict and remove password
+            user_dict = dict(row)
+            user_dict.pop('password', None)
+            user_cache.set(user_dict['id'], user_dict)
+            users[user_dict['id']] = user_dict
+    
+    return users
 
 def get_user_by_id(user_id):
     """Get user by ID"""
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-    user = cursor.fetchone()
-    
-    if not user:
-        return None
-    
-    # Convert to dict and remove password
-    user_dict = dict(user)
-    user_dict.pop('password', None)
-    return user_dict
+    return get_users_by_ids([user_id]).get(int(user_id))
 
 def get_user_by_email(email):
     """Get user by email"""
@@ -161,7 +426,15 @@ def authenticate(email_or_username, password):
         return None
     
     # Check password
-    if bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+    if password_hasher.verify(password, user['password']):
+        # Upgrade hashes made at an old cost while the plaintext is at hand
+        if password_hasher.needs_rehash(user['password']):
+            threading.Thread(
+                target=rehash_password,
+                args=(user['id'], password, user['password']),
+                daemon=True
+            ).start()
+        
         # Convert to dict and remove password
         user_dict = dict(user)
         user_dict.pop('password', None)
@@ -175,7 +448,7 @@ def create_user(username, email, password, display_name=None):
     cursor = db.cursor()
     
     # Hash password
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    hashed = password_hasher.hash(password)
     
     try:
         cursor.execute(
@@ -191,11 +464,197 @@ def create_user(username, email, password, display_name=None):
         # Username or email already exists
         return None
 
+# Refresh tokens
+class InvalidRefreshToken(Exception):
+    """A refresh token that is unknown, already used or expired"""
+
+def refresh_token_hash(token):
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+def issue_refresh_token(user_id):
+    """Create and store a new refresh token for a user (commits)"""
+    token = secrets.token_urlsafe(32)
+    db = get_db()
+    db.execute(
+        'INSERT INTO refresh_tokens (token_hash, user_id, expires_at) VALUES (?, ?, ?)',
+        (refresh_token_hash(token), user_id, int(time.time()) + REFRESH_TOKEN_EXPIRATION)
+    )
+    db.commit()
+    return token
+
+def consume_refresh_token(token):
+    """Delete a refresh token and return its user id; raises InvalidRefreshToken.
+    
+    The delete is left uncommitted so it lands together with the
+    replacement token; each token can be used only once.
+    """
+    db = get_db()
+    cursor = db.cursor()
+    token_hash = refresh_token_hash(token)
+    cursor.execute('SELECT user_id, expires_at FROM refresh_tokens WHERE token_hash = ?', (token_hash,))
+    token_record = cursor.fetchone()
+    
+    if not token_record:
+        raise InvalidRefreshToken('Invalid refresh token')
+    
+    cursor.execute('DELETE FROM refresh_tokens WHERE token_hash = ?', (token_hash,))
+    if cursor.rowcount == 0:
+        # Used by a concurrent request in the meantime
+        raise InvalidRefreshToken('Invalid refresh token')
+    
+    if token_record['expires_at'] < time.time():
+        db.commit()
+        raise InvalidRefreshToken('Refresh token expired')
+    
+    return token_record['user_id']
+
+def revoke_refresh_tokens(user_id):
+    """Delete every refresh token of a user (commits)"""
+    db = get_db()
+    db.execute('DELETE FROM refresh_tokens WHERE user_id = ?', (user_id,))
+    db.commit()
+
+def issue_tokens(user):
+    """Auth payload with a new access token and refresh token for user"""
+    return {
+        'token': create_token(user),
+        'refreshToken': issue_refresh_token(user['id']),
+        'user': user
+    }
+
+def sweep_expired_refresh_tokens(db, batch_size=REFRESH_TOKEN_SWEEP_BATCH):
+    """Delete expired refresh tokens in small batches; returns the number deleted.
+    
+    Each batch is its own short write transaction on the expires_at index,
+    so logins and refreshes are never held behind one long delete.
+    """
+    return sweep_expired_rows(db, 'refresh_tokens', 'token_hash', batch_size)
+
+def sweep_expired_rows(db, table, key, batch_size=REFRESH_TOKEN_SWEEP_BATCH):
+    """Batched delete of a table's rows past expires_at (see sweep_expired_refresh_tokens)"""
+    deleted = 0
+    now = int(time.time())
+    while True:
+        cursor = db.execute(
+            f'''
+            DELETE FROM {table} WHERE {key} IN (
+                SELECT {key} FROM {table} WHERE expires_at < ? LIMIT ?
+            )
+            ''',
+            (now, batch_size)
+        )
+        db.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return deleted
+        # Let waiting writers in between batches
+        time.sleep(0.01)
+
+def start_refresh_token_sweeper(interval):
+    """Purge expired refresh tokens and revocations every interval seconds in a background thread"""
+    def run():
+        while True:
+            try:
+                with database.connection() as db:
+                    deleted = sweep_expired_refresh_tokens(db)
+                    expired_revocations = sweep_expired_rows(db, 'revoked_tokens', 'id')
+                if deleted:
+                    logger.info(f"Purged {deleted} expired refresh tokens")
+                if expired_revocations:
+                    logger.info(f"Purged {expired_revocations} expired revocations")
+            except sqlite3.Error as e:
+                logger.error(f"Error purging refresh tokens: {str(e)}")
+            time.sleep(interval)
+    
+    threading.Thread(target=run, name='refresh-token-sweeper', daemon=True).start()
+
+# Access token revocation
+# Woken whenever this process records a revocation, so long-polling feed
+# readers answer at once; other processes' revocations are seen on the next
+# poll of the table (at most a second later).
+revocation_signal = threading.Condition()
+
+def record_revocation(jti, user_id, issued_before, expires_at):
+    db = get_db()
+    db.execute(
+        'INSERT INTO revoked_tokens (jti, user_id, issued_before, expires_at) VALUES (?, ?, ?, ?)',
+        (jti, user_id, issued_before, int(expires_at))
+    )
+    db.commit()
+    with revocation_signal:
+        revocation_signal.notify_all()
+
+def revoke_access_token(payload):
+    """Revoke one access token until its exp (commits)"""
+    if payload.get('jti'):
+        record_revocation(payload['jti'], payload['id'], None, payload['exp'])
+
+def revoke_user_access_tokens(user_id):
+    """Revoke every access token issued to a user so far (commits).
+    
+    Kept for TOKEN_EXPIRATION, after which every token it covers has expired.
+    """
+    now = time.time()
+    record_revocation(None, user_id, now, now + TOKEN_EXPIRATION)
+
+def revoked_flags(payloads):
+    """Whether each verified token payload has been revoked, in two queries for the lot"""
+    if not payloads:
+        return []
+    
+    db = get_db()
+    jtis = list({payload['jti'] for payload in payloads if payload.get('jti')})
+    user_ids = list({payload['id'] for payload in payloads})
+    
+    revoked_jtis = set()
+    if jtis:
+        cursor = db.execute(
+            f'SELECT jti FROM revoked_tokens WHERE jti IN ({",".join("?" * len(jtis))})',
+            jtis
+        )
+        revoked_jtis = {row['jti'] for row in cursor.fetchall()}
+    
+    cursor = db.execute(
+        f'''
+        SELECT user_id, MAX(issued_before) AS issued_before FROM revoked_tokens
+        WHERE user_id IN ({",".join("?" * len(user_ids))}) AND jti IS NULL
+        GROUP BY user_id
+        ''',
+        user_ids
+    )
+    cutoffs = {row['user_id']: row['issued_before'] for row in cursor.fetchall()}
+    
+    return [
+        payload.get('jti') in revoked_jtis or payload.get('iat', 0) <= cutoffs.get(payload['id'], -1)
+        for payload in payloads
+    ]
+
+def revocations_since(db, since, limit=REVOCATION_FEED_LIMIT):
+    """Unexpired revocations with id > since, oldest first"""
+    cursor = db.execute(
+        '''
+        SELECT id, jti, user_id, issued_before, expires_at FROM revoked_tokens
+        WHERE id > ? AND expires_at >= ?
+        ORDER BY id
+        LIMIT ?
+        ''',
+        (since, int(time.time()), limit)
+    )
+    # Only what a gateway needs: a jti, or a user's cutoff, and when it lapses
+    return [
+        {'id': row['id'], 'jti': row['jti'], 'expiresAt': row['expires_at']}
+        if row['jti'] else
+        {'id': row['id'], 'userId': row['user_id'], 'issuedBefore': row['issued_before'], 'expiresAt': row['expires_at']}
+        for row in cursor.fetchall()
+    ]
+
 # GraphQL Schema
 type_defs = """
 type Query {
     me: User
     validateToken(token: String!): TokenValidation
+    "Validates up to VALIDATE_TOKENS_MAX tokens in order. User fields come from a cache: changes made through this service show at once, other changes to a user within USER_CACHE_TTL seconds (5 by default)."
+    validateTokens(tokens: [String!]!): [TokenValidation!]!
 }
 
 type Mutation {
@@ -262,41 +721,36 @@ def resolve_me(_, info):
     
     return get_user_by_id(context['user']['id'])
 
+def validate_tokens(tokens):
+    """TokenValidation results for tokens, in order"""
+    payloads = verify_tokens(tokens)
+    users = get_users_by_ids(payload['id'] for payload in payloads if payload)
+    return [
+        {"valid": True, "user": users.get(int(payload['id']))} if payload else {"valid": False, "user": None}
+        for payload in payloads
+    ]
+
 @query.field("validateToken")
 def resolve_validate_token(_, info, token):
-    payload = verify_token(token)
-    if not payload:
-        return {"valid": False, "user": None}
+    return validate_tokens([token])[0]
+
+@query.field("validateTokens")
+def resolve_validate_tokens(_, info, tokens):
+    if len(tokens) > VALIDATE_TOKENS_MAX:
+        raise Exception(f"At most {VALIDATE_TOKENS_MAX} tokens per call")
     
-    user = get_user_by_id(payload['id'])
-    return {
-        "valid": True,
-        "user": user
-    }
+    return validate_tokens(tokens)
 
 @mutation.field("login")
 def resolve_login(_, info, email, password):
-    user = authenticate(email, password)
+    try:
+        user = authenticate(email, password)
+    except PasswordHasherBusy:
+        raise Exception("Service busy, please try again")
     if not user:
         raise Exception("Invalid email/username or password")
     
-    token = create_token(user['id'])
-    refresh_token = create_token(user['id'], expires_in=TOKEN_EXPIRATION * 7)  # 7 days
-    
-    # Store refresh token in database
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute(
-        'INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES (?, ?, ?)',
-        (user['id'], refresh_token, datetime.utcnow() + timedelta(seconds=TOKEN_EXPIRATION * 7))
-    )
-    db.commit()
-    
-    return {
-        "token": token,
-        "refreshToken": refresh_token,
-        "user": user
-    }
+    return issue_tokens(user)
 
 @mutation.field("register")
 def resolve_register(_, info, input):
@@ -317,70 +771,30 @@ def resolve_register(_, info, input):
         raise Exception("Email already exists")
     
     # Create user
-    user = create_user(username, email, password, display_name)
+    try:
+        user = create_user(username, email, password, display_name)
+    except PasswordHasherBusy:
+        raise Exception("Service busy, please try again")
     if not user:
         raise Exception("Failed to create user")
     
-    # Create tokens
-    token = create_token(user['id'])
-    refresh_token = create_token(user['id'], expires_in=TOKEN_EXPIRATION * 7)  # 7 days
-    
-    # Store refresh token in database
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute(
-        'INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES (?, ?, ?)',
-        (user['id'], refresh_token, datetime.utcnow() + timedelta(seconds=TOKEN_EXPIRATION * 7))
-    )
-    db.commit()
-    
-    return {
-        "token": token,
-        "refreshToken": refresh_token,
-        "user": user
-    }
+    return issue_tokens(user)
 
 @mutation.field("refreshToken")
 def resolve_refresh_token(_, info, token):
-    # Verify the refresh token
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM refresh_tokens WHERE token = ?', (token,))
-    token_record = cursor.fetchone()
-    
-    if not token_record:
-        raise Exception("Invalid refresh token")
-    
-    # Check if token is expired
-    expires_at = datetime.strptime(token_record['expires_at'], '%Y-%m-%d %H:%M:%S.%f')
-    if expires_at < datetime.utcnow():
-        # Delete expired token
-        cursor.execute('DELETE FROM refresh_tokens WHERE id = ?', (token_record['id'],))
-        db.commit()
-        raise Exception("Refresh token expired")
+    # Use up the refresh token
+    try:
+        user_id = consume_refresh_token(token)
+    except InvalidRefreshToken as e:
+        raise Exception(str(e))
     
     # Get user
-    user = get_user_by_id(token_record['user_id'])
+    user = get_user_by_id(user_id)
     if not user:
         raise Exception("User not found")
     
-    # Create new tokens
-    new_token = create_token(user['id'])
-    new_refresh_token = create_token(user['id'], expires_in=TOKEN_EXPIRATION * 7)  # 7 days
-    
-    # Delete old refresh token and store new one
-    cursor.execute('DELETE FROM refresh_tokens WHERE id = ?', (token_record['id'],))
-    cursor.execute(
-        'INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES (?, ?, ?)',
-        (user['id'], new_refresh_token, datetime.utcnow() + timedelta(seconds=TOKEN_EXPIRATION * 7))
-    )
-    db.commit()
-    
-    return {
-        "token": new_token,
-        "refreshToken": new_refresh_token,
-        "user": user
-    }
+    # New access token, and a refresh token replacing the old one
+    return issue_tokens(user)
 
 @mutation.field("logout")
 def resolve_logout(_, info):
@@ -388,11 +802,9 @@ def resolve_logout(_, info):
     if not context.get('user'):
         return True
     
-    # Delete refresh tokens for user
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('DELETE FROM refresh_tokens WHERE user_id = ?', (context['user']['id'],))
-    db.commit()
+    # Delete refresh tokens for user, and revoke this access token
+    revoke_refresh_tokens(context['user']['id'])
+    revoke_access_token(context['user'])
     
     return True
 
@@ -413,26 +825,33 @@ def resolve_change_password(_, info, currentPassword, newPassword):
     if not user:
         raise Exception("User not found")
     
-    # Verify current password
-    if not bcrypt.checkpw(currentPassword.encode('utf-8'), user['password'].encode('utf-8')):
+    try:
+        # Verify current password
+        if not password_hasher.verify(currentPassword, user['password']):
+            return {
+                "success": False,
+                "message": "Current password is incorrect"
+            }
+        
+        # Hash new password
+        hashed = password_hasher.hash(newPassword)
+    except PasswordHasherBusy:
         return {
             "success": False,
-            "message": "Current password is incorrect"
+            "message": "Service busy, please try again"
         }
     
-    # Hash new password
-    hashed = bcrypt.hashpw(newPassword.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    
     # Update password
     cursor.execute(
         'UPDATE users SET password = ? WHERE id = ?',
         (hashed, user_id)
     )
     db.commit()
+    user_changed(user_id)
     
-    # Invalidate all refresh tokens for the user
-    cursor.execute('DELETE FROM refresh_tokens WHERE user_id = ?', (user_id,))
-    db.commit()
+    # Invalidate all refresh tokens and access tokens for the user
+    revoke_refresh_tokens(user_id)
+    revoke_user_access_tokens(user_id)
     
     return {
         "success": True,
@@ -488,27 +907,14 @@ def login():
     if not email or not password:
         return jsonify({'error': 'Email and password are required'}), 400
     
-    user = authenticate(email, password)
+    try:
+        user = authenticate(email, password)
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Service busy, please try again'}), 503, {'Retry-After': '1'}
     if not user:
         return jsonify({'error': 'Invalid email or password'}), 401
     
-    token = create_token(user['id'])
-    refresh_token = create_token(user['id'], expires_in=TOKEN_EXPIRATION * 7)
-    
-    # Store refresh token
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute(
-        'INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES (?, ?, ?)',
-        (user['id'], refresh_token, datetime.utcnow() + timedelta(seconds=TOKEN_EXPIRATION * 7))
-    )
-    db.commit()
-    
-    return jsonify({
-        'token': token,
-        'refreshToken': refresh_token,
-        'user': user
-    }), 200
+    return jsonify(issue_tokens(user)), 200
 
 @app.route('/auth/register', methods=['POST'])
 def register():
@@ -529,28 +935,14 @@ def register():
         return jsonify({'error': 'Email already exists'}), 409
     
     # Create user
-    user = create_user(username, email, password, display_name)
+    try:
+        user = create_user(username, email, password, display_name)
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Service busy, please try again'}), 503, {'Retry-After': '1'}
     if not user:
         return jsonify({'error': 'Failed to create user'}), 500
     
-    # Create tokens
-    token = create_token(user['id'])
-    refresh_token = create_token(user['id'], expires_in=TOKEN_EXPIRATION * 7)
-    
-    # Store refresh token
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute(
-        'INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES (?, ?, ?)',
-        (user['id'], refresh_token, datetime.utcnow() + timedelta(seconds=TOKEN_EXPIRATION * 7))
-    )
-    db.commit()
-    
-    return jsonify({
-        'token': token,
-        'refreshToken': refresh_token,
-        'user': user
-    }), 200
+    return jsonify(issue_tokens(user)), 200
 
 @app.route('/auth/token', methods=['POST'])
 def refresh_token():
@@ -560,45 +952,19 @@ def refresh_token():
     if not token:
         return jsonify({'error': 'Refresh token is required'}), 400
     
-    # Verify the refresh token
-    db = get_db()
-    cursor = db.cursor()
-    cursor.execute('SELECT * FROM refresh_tokens WHERE token = ?', (token,))
-    token_record = cursor.fetchone()
-    
-    if not token_record:
-        return jsonify({'error': 'Invalid refresh token'}), 401
-    
-    # Check if token is expired
-    expires_at = datetime.strptime(token_record['expires_at'], '%Y-%m-%d %H:%M:%S.%f')
-    if expires_at < datetime.utcnow():
-        # Delete expired token
-        cursor.execute('DELETE FROM refresh_tokens WHERE id = ?', (token_record['id'],))
-        db.commit()
-        return jsonify({'error': 'Refresh token expired'}), 401
+    # Use up the refresh token
+    try:
+        user_id = consume_refresh_token(token)
+    except InvalidRefreshToken as e:
+        return jsonify({'error': str(e)}), 401
     
     # Get user
-    user = get_user_by_id(token_record['user_id'])
+    user = get_user_by_id(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
     
-    # Create new tokens
-    new_token = create_token(user['id'])
-    new_refresh_token = create_token(user['id'], expires_in=TOKEN_EXPIRATION * 7)
-    
-    # Delete old refresh token and store new one
-    cursor.execute('DELETE FROM refresh_tokens WHERE id = ?', (token_record['id'],))
-    cursor.execute(
-        'INSERT INTO refresh_tokens (user_id, token, expires_at) VALUES (?, ?, ?)',
-        (user['id'], new_refresh_token, datetime.utcnow() + timedelta(seconds=TOKEN_EXPIRATION * 7))
-    )
-    db.commit()
-    
-    return jsonify({
-        'token': new_token,
-        'refreshToken': new_refresh_token,
-        'user': user
-    }), 200
+    # New access token, and a refresh token replacing the old one
+    return jsonify(issue_tokens(user)), 200
 
 @app.route('/auth/logout', methods=['POST'])
 def logout():
@@ -611,23 +977,75 @@ def logout():
         payload = verify_token(token)
         
         if payload:
-            # Delete refresh tokens for user
-            db = get_db()
-            cursor = db.cursor()
-            cursor.execute('DELETE FROM refresh_tokens WHERE user_id = ?', (payload['id'],))
-            db.commit()
+            # Delete refresh tokens for user, and revoke this access token
+            revoke_refresh_tokens(payload['id'])
+            revoke_access_token(payload)
     except:
         pass
     
     return jsonify({'success': True}), 200
 
+@app.route('/auth/revocations', methods=['GET'])
+def revocations():
+    """Revocation feed: revocations after cursor `since`.
+    
+    With `wait`, an empty response is held for up to that many seconds until
+    something is revoked, so readers learn of logouts as they happen.
+    Gateways only: see feed_reader_allowed().
+    """
+    if not feed_reader_allowed(request.headers, request.remote_addr, REVOCATION_FEED_TOKEN):
+        return jsonify({'error': 'Not authorized to read revocations'}), 403
+    
+    try:
+        since = int(request.args.get('since', 0))
+        wait = min(float(request.args.get('wait', 0)), REVOCATION_MAX_WAIT)
+    except ValueError:
+        return jsonify({'error': 'since must be an integer and wait a number'}), 400
+    
+    deadline = time.monotonic() + wait
+    while True:
+        # A connection only while reading, not for the whole wait
+        with database.connection() as db:
+            entries = revocations_since(db, since)
+        
+        remaining = deadline - time.monotonic()
+        if entries or remaining <= 0:
+            break
+        with revocation_signal:
+            revocation_signal.wait(min(remaining, 1.0))
+    
+    return jsonify({
+        'revocations': entries,
+        'cursor': entries[-1]['id'] if entries else since,
+        'hasMore': len(entries) >= REVOCATION_FEED_LIMIT
+    }), 200
+
+@app.route('/.well-known/jwks.json', methods=['GET'])
+def jwks():
+    # Public keys for local token verification; services refresh on their own schedule
+    response = jsonify(signing_keys.jwks())
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response, 200
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'auth'}), 200
+    return jsonify({
+        'status': 'healthy',
+        'service': 'auth',
+        'signingKey': signing_keys.current[0],
+        'userCache': user_cache.stats(),
+        'passwordHasher': password_hasher.stats()
+    }), 200
 
 if __name__ == '__main__':
-    # Initialize database
+    # Load (or create) signing keys and start hashing workers before traffic
+    # arrives, then initialize database
+    signing_keys.load()
+    password_hasher.start()
     init_db()
+    start_refresh_token_sweeper(REFRESH_TOKEN_SWEEP_INTERVAL)
+    if not REVOCATION_FEED_TOKEN:
+        logger.warning("REVOCATION_FEED_TOKEN is not set; /auth/revocations is served to loopback clients only")
     
     # Start server
     app.run(host='0.0.0.0', port=PORT)
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Coalesced token validation under the real gateway server (user-025)
+
+Starts a gateway exactly as in production (``python <gateway>/app.py``:
+monkey-patched gevent pywsgi), in front of a stub Auth service whose JWKS
+endpoint is down. Every request then takes the fallback path and asks the
+Auth service to validate its token. N clients send requests with distinct
+tokens at once; the stub counts validateTokens calls.
+
+    python bench/gateway_token_validation.py --clients 300
+"""
+
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+import jwt
+import requests
+from cryptography.hazmat.primitives.asymmetric import ed25519
+
+from harness import serve_stub, run_gateway, percentile, ms
+
+GATEWAYS = {
+    # gateway -> (method, path) of a route that authenticates its caller
+    'api-gateway': ('GET', '/api/users/me'),
+    'graphql-gateway': ('POST', '/graphql')
+}
+
+
+class StubAuth(BaseHTTPRequestHandler):
+    """Auth (and every other upstream) for the gateway under test"""
+    calls = []
+    latency = 0.02
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith('/.well-known/jwks.json'):
+            return self.reply(503, {'error': 'keys unavailable'})
+        if self.path.startswith('/auth/revocations'):
+            time.sleep(1)
+            return self.reply(200, {'revocations': [], 'cursor': 0, 'hasMore': False})
+        return self.reply(200, {})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        tokens = (body.get('variables') or {}).get('tokens')
+        if tokens is None:
+            return self.reply(200, {'data': {}})
+        with self.lock:
+            self.calls.append(len(tokens))
+        time.sleep(self.latency)
+        return self.reply(200, {'data': {'validateTokens': [
+            {'valid': True, 'user': {'id': str(i), 'username': f'user{i}', 'email': None}}
+            for i, _ in enumerate(tokens)
+        ]}})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--gateway', choices=sorted(GATEWAYS), default='api-gateway')
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--auth-latency', type=float, default=0.02, help='stub validateTokens latency, seconds')
+    args = parser.parse_args()
+
+    StubAuth.latency = args.auth_latency
+    upstream, upstream_url = serve_stub(StubAuth)
+    try:
+        with run_gateway(args.gateway, upstream_url, JWKS_MIN_REFETCH_INTERVAL=3600) as (_, port):
+            # Distinct tokens the gateway can't verify locally (its key set is empty)
+            key = ed25519.Ed25519PrivateKey.generate()
+            tokens = [
+                jwt.encode({'id': i, 'username': f'user{i}', 'exp': time.time() + 600}, key,
+                           algorithm='EdDSA', headers={'kid': 'bench'})
+                for i in range(args.clients)
+            ]
+
+            method, path = GATEWAYS[args.gateway]
+            url = f'http://127.0.0.1:{port}{path}'
+            barrier = threading.Barrier(args.clients)
+
+            def call(token):
+                session = requests.Session()
+                barrier.wait()
+                started = time.perf_counter()
+                response = session.request(method, url, headers={'Authorization': f'Bearer {token}'},
+                                           json={'query': '{ __typename }'} if method == 'POST' else None, timeout=30)
+                return response.status_code, time.perf_counter() - started
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.clients) as pool:
+                results = list(pool.map(call, tokens))
+            elapsed = time.perf_counter() - started
+
+            latencies = [latency for _, latency in results]
+            rejected = sum(1 for status, _ in results if status == 401)
+            health = requests.get(f'http://127.0.0.1:{port}/health', timeout=30).json()
+            print(f"{args.gateway}: {args.clients} concurrent cold requests in {elapsed:.2f}s, {rejected} rejected")
+            calls = StubAuth.calls
+            print(f"  validateTokens calls: {len(calls)}, tokens per call: avg {sum(calls) / len(calls):.1f}, max {max(calls)}")
+            print(f"  latency p50 {ms(percentile(latencies, 50))}, p99 {ms(percentile(latencies, 99))}")
+            print(f"  tokenValidator: {health.get('tokenValidator')}")
+    finally:
+        upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Group hug listings: per-group participant queries vs batched loading (user-007)
+
+Fills a hug service database with public group hugs of up to
+--max-participants participants each, then lists pages of 20, 100 and 500
+groups two ways: the previous loop (a participant preview query and a
+COUNT(*) per group) and get_group_hugs(), which loads every group's preview
+and count in two batched queries. Reports statements executed and the best
+time of --repeat runs.
+
+    python bench/group_hug_participants.py --groups 500 --max-participants 30
+"""
+
+import random
+import logging
+import argparse
+
+from harness import load_service, timed, ms
+
+PAGE_SIZES = (20, 100, 500)
+
+
+def per_group_queries(hugs, limit):
+    """The old listing: one preview query and one COUNT(*) per group on the page"""
+    cursor = hugs.get_db().cursor()
+    cursor.execute('SELECT * FROM group_hugs WHERE is_public = 1 ORDER BY created_at DESC, id DESC LIMIT ?', (limit,))
+    groups = []
+    for group in cursor.fetchall():
+        group_dict = dict(group)
+        cursor.execute(
+            'SELECT * FROM group_hug_participants WHERE group_id = ? ORDER BY joined_at, id LIMIT ?',
+            (group_dict['id'], hugs.GROUP_PARTICIPANT_PREVIEW)
+        )
+        group_dict['participants'] = [dict(row) for row in cursor.fetchall()]
+        cursor.execute('SELECT COUNT(*) AS count FROM group_hug_participants WHERE group_id = ?', (group_dict['id'],))
+        group_dict['participantCount'] = cursor.fetchone()['count']
+        groups.append(group_dict)
+    return groups
+
+
+def seed(hugs, groups, max_participants):
+    random.seed(7)
+    with hugs.app.app_context():
+        db = hugs.get_db()
+        db.executemany(
+            'INSERT INTO group_hugs (id, creator_id, title, hug_type, is_public, created_at) VALUES (?, ?, ?, ?, 1, ?)',
+            [(f'group-{i}', i % 100 + 1, f'Group {i}', 'comfort', f'2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}')
+             for i in range(groups)]
+        )
+        db.executemany(
+            'INSERT INTO group_hug_participants (group_id, user_id) VALUES (?, ?)',
+            [(f'group-{i}', user_id)
+             for i in range(groups)
+             for user_id in random.sample(range(1, 1000), random.randint(0, max_participants))]
+        )
+        db.commit()
+
+
+def statements(hugs, fn):
+    """Statements fn() executes"""
+    executed = []
+    db = hugs.get_db()
+    db.set_trace_callback(executed.append)
+    try:
+        fn()
+    finally:
+        db.set_trace_callback(None)
+    return len(executed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--groups', type=int, default=max(PAGE_SIZES))
+    parser.add_argument('--max-participants', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # migration progress
+    hugs = load_service('hug-service', MAX_PAGE_SIZE=max(PAGE_SIZES))
+    hugs.init_db()
+    seed(hugs, args.groups, args.max_participants)
+
+    with hugs.app.test_request_context():
+        for size in PAGE_SIZES:
+            old = lambda: per_group_queries(hugs, size)
+            new = lambda: hugs.get_group_hugs(size).items
+            assert [(g['id'], g['participantCount'], g['participants']) for g in old()] == \
+                [(g['id'], g['participantCount'], g['participants']) for g in new()]
+
+            print(f"{size:>4} groups: per-group {statements(hugs, old):>5} statements {ms(timed(old, args.repeat)):>10}"
+                  f" | batched {statements(hugs, new):>2} statements {ms(timed(new, args.repeat)):>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Helpers shared by the benchmark scripts in this directory
+
+Scripts are run from the services directory, e.g.
+``python bench/public_feed.py``; each prints the numbers quoted in the commit that
+introduced the optimization it measures.
+"""
+
+import os
+import sys
+import time
+import socket
+import tempfile
+import threading
+import subprocess
+import contextlib
+import importlib.util
+from http.server import ThreadingHTTPServer
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICES_DIR)
+
+
+def load_service(name, database_path=None, **env):
+    """Import a service's app.py as a fresh module, against database_path (a temp file by default)"""
+    import ariadne.constants
+    # ariadne 0.19 dropped PLAYGROUND_HTML, which the services import for GET /graphql
+    if not hasattr(ariadne.constants, 'PLAYGROUND_HTML'):
+        ariadne.constants.PLAYGROUND_HTML = ''
+
+    os.environ['DATABASE_PATH'] = database_path or os.path.join(tempfile.mkdtemp(), f'{name}.db')
+    os.environ.update({key: str(value) for key, value in env.items()})
+    spec = importlib.util.spec_from_file_location(
+        name.replace('-', '_'), os.path.join(SERVICES_DIR, name, 'app.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+def serve_stub(handler):
+    """Serve handler (a BaseHTTPRequestHandler class) on a free port in the background; returns (server, url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', free_port()), handler)
+    server.daemon_threads = True
+    server.handle_error = lambda request, client_address: None  # clients hanging up at shutdown
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+@contextlib.contextmanager
+def run_gateway(name, upstream_url, **env):
+    """Run ``python <name>/app.py`` as in production, every upstream pointed at upstream_url.
+
+    Yields (process, port); the process is terminated on exit.
+    """
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), **{key: str(value) for key, value in env.items()})
+    for service in ('AUTH', 'USER', 'MOOD', 'HUG', 'SOCIAL', 'STREAK'):
+        env[f'{service}_SERVICE_URL'] = upstream_url
+    env['GRAPHQL_GATEWAY_URL'] = upstream_url
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SERVICES_DIR, name, 'app.py')],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        try:
+            wait_for_port(port)
+        except RuntimeError:
+            process.kill()
+            sys.exit(f"{name} did not start:\n{process.communicate()[1].decode()[-2000:]}")
+        yield process, port
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def memory_kb(pid):
+    """(current, peak) resident set size of a process in KiB, from /proc"""
+    with open(f'/proc/{pid}/status') as status:
+        fields = dict(line.split(':', 1) for line in status)
+    return int(fields['VmRSS'].split()[0]), int(fields['VmHWM'].split()[0])
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def timed(fn, repeat=1):
+    """Seconds per call of fn(), best of repeat runs"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def ms(seconds):
+    return f"{seconds * 1000:.2f} ms"
@@ -0,0 +1,86 @@
+"""
+Mood analytics aggregation: per-mood Python loop vs NumPy columns (user-011)
+
+Times generate_mood_analytics() over 10k, 100k and 1M random moods spread
+over a year, with the vectorized path off (ANALYTICS_VECTOR_MIN above the
+list size) and on, and checks both produce identical output. --baseline REV
+also times the function as it was at git revision REV (for example the
+parent of the commit that vectorized it).
+
+    python bench/mood_analytics.py --sizes 10000 100000 1000000 --baseline b2422f9^
+"""
+
+import os
+import json
+import random
+import tempfile
+import logging
+import argparse
+import subprocess
+import importlib.util
+from datetime import datetime, timedelta
+
+from harness import SERVICES_DIR, load_service, timed
+
+MOODS = ['happy', 'sad', 'calm', 'anxious', 'excited', 'stressed', 'angry', 'joyful']
+
+
+def random_moods(count, days=365):
+    now = datetime.utcnow()
+    return [
+        {
+            'mood': random.choice(MOODS),
+            'score': random.randint(1, 10),
+            'created_at': (now - timedelta(seconds=random.randint(0, days * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+        }
+        for _ in range(count)
+    ]
+
+
+def baseline_function(revision):
+    """generate_mood_analytics from the mood service as it was at a git revision"""
+    source = subprocess.run(
+        ['git', 'show', f'{revision}:./mood-service/app.py'],
+        cwd=SERVICES_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    path = os.path.join(tempfile.mkdtemp(), 'app.py')
+    with open(path, 'w') as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location('mood_service_baseline', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.generate_mood_analytics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--baseline', metavar='REV', help='also time generate_mood_analytics at this git revision')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    moods = load_service('mood-service')
+    if moods.np is None:
+        parser.error('NumPy is not installed; the vectorized path would not run')
+    baseline = baseline_function(args.baseline) if args.baseline else None
+
+    random.seed(3)
+    for size in args.sizes:
+        data = random_moods(size)
+        timings = {}
+        outputs = {}
+        for mode, vector_min in (('python', size + 1), ('numpy', 256)):
+            moods.ANALYTICS_VECTOR_MIN = vector_min
+            outputs[mode] = json.dumps(moods.generate_mood_analytics(1, data, 365))
+            timings[mode] = timed(lambda: moods.generate_mood_analytics(1, data, 365), args.repeat)
+        assert outputs['python'] == outputs['numpy']
+
+        line = f"{size:>9} moods: python {timings['python']:.3f}s, numpy {timings['numpy']:.3f}s"
+        if baseline:
+            line += f", {args.baseline} {timed(lambda: baseline(1, data, 365), 1):.3f}s"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Login throughput and health check latency vs PASSWORD_HASH_WORKERS (user-021)
+
+Loads the auth service once per --workers value (0 hashes on the request
+thread) and has --clients threads log in as the sample user for --seconds
+through the Flask test client, pausing --backoff after a 503, while another
+thread polls /health. Reports successful logins per second, logins refused
+with 503 (hasher busy) and /health latency during the storm. Scaling beyond
+one worker needs that many free cores.
+
+    python bench/password_hashing.py --workers 0 1 2 4 --rounds 10
+"""
+
+import os
+import time
+import logging
+import tempfile
+import argparse
+import threading
+
+from harness import load_service, percentile, ms
+
+CREDENTIALS = {'email': 'testuser', 'password': 'password123'}
+
+
+def measure(workers, args):
+    auth = load_service(
+        'auth-service',
+        PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_QUEUE=args.queue, BCRYPT_ROUNDS=args.rounds,
+        JWT_KEY_DIR=tempfile.mkdtemp()
+    )
+    executor = auth.password_hasher.start()
+    auth.signing_keys.load()
+    auth.init_db()
+
+    statuses = []
+    health = []
+    stop = time.monotonic() + args.seconds
+
+    def login():
+        client = auth.app.test_client()
+        while time.monotonic() < stop:
+            status = client.post('/auth/login', json=CREDENTIALS).status_code
+            statuses.append(status)
+            if status == 503:
+                time.sleep(args.backoff)
+
+    def poll_health():
+        client = auth.app.test_client()
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            client.get('/health')
+            health.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=login) for _ in range(args.clients)] + [threading.Thread(target=poll_health)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if executor:
+        executor.shutdown()
+
+    ok = statuses.count(200)
+    print(f"{workers:>7} workers: {ok / args.seconds:6.1f} logins/s, {statuses.count(503)} refused (503), "
+          f"/health p50 {ms(percentile(health, 50))} p99 {ms(percentile(health, 99))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, os.cpu_count() or 1])
+    parser.add_argument('--rounds', type=int, default=10, help='bcrypt cost')
+    parser.add_argument('--queue', type=int, default=2, help='PASSWORD_HASH_QUEUE')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--backoff', type=float, default=0.05, help='seconds a client waits after a 503')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    print(f"{args.clients} clients for {args.seconds:g}s, bcrypt cost {args.rounds}, {os.cpu_count()} CPUs")
+    for workers in dict.fromkeys(args.workers):
+        measure(workers, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+API gateway proxy modes: pass-through streaming vs JSON re-encoding (user-003)
+
+Runs the API gateway as in production once per PROXY_PASSTHROUGH setting,
+in front of a stub Mood service whose /users/<id>/moods returns a JSON list
+of --moods moods. Clients fetch it through /api/users/1/moods; the script
+reports latency, throughput and the gateway's resident memory per mode.
+
+    python bench/proxy_passthrough.py --moods 20000 --requests 200 --clients 8
+"""
+
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+import requests
+
+from harness import serve_stub, run_gateway, memory_kb, percentile, ms
+
+
+class StubMoods(BaseHTTPRequestHandler):
+    """Mood service (and every other upstream) for the gateway under test"""
+    body = b'[]'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, data):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith('/users/'):
+            return self.reply(200, self.body)
+        if self.path.startswith('/auth/revocations'):
+            time.sleep(1)
+            return self.reply(200, b'{"revocations": [], "cursor": 0, "hasMore": false}')
+        return self.reply(503, b'{"error": "unavailable"}')
+
+
+def mood_list(count):
+    return json.dumps([
+        {
+            'id': i, 'user_id': 1, 'mood': 'calm', 'score': i % 10 + 1,
+            'note': f'Walked by the river, entry {i}', 'activities': ['walk', 'read'],
+            'is_public': bool(i % 2), 'created_at': f'2024-01-{i % 28 + 1:02d} 08:00:00'
+        }
+        for i in range(count)
+    ]).encode()
+
+
+def measure(upstream_url, passthrough, requests_count, clients):
+    with run_gateway('api-gateway', upstream_url, PROXY_PASSTHROUGH=passthrough) as (gateway, port):
+        url = f'http://127.0.0.1:{port}/api/users/1/moods'
+        local = threading.local()
+
+        def call(_):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            started = time.perf_counter()
+            response = local.session.get(url, timeout=60)
+            size = len(response.content)
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - started, size
+
+        call(None)  # warm up the gateway's upstream connection
+        started = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            results = list(pool.map(call, range(requests_count)))
+        elapsed = time.perf_counter() - started
+        rss, peak = memory_kb(gateway.pid)
+
+    latencies = [latency for latency, _ in results]
+    mode = 'pass-through' if passthrough else 'json'
+    print(f"{mode:>12}: {requests_count / elapsed:7.1f} req/s, p50 {ms(percentile(latencies, 50))}, "
+          f"p99 {ms(percentile(latencies, 99))}, gateway RSS {rss // 1024} MiB (peak {peak // 1024} MiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--moods', type=int, default=20000, help='moods in each upstream response')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=8)
+    args = parser.parse_args()
+
+    StubMoods.body = mood_list(args.moods)
+    upstream, upstream_url = serve_stub(StubMoods)
+    try:
+        print(f"{args.requests} requests, {args.clients} clients, {len(StubMoods.body) / 1e6:.1f} MB per response")
+        for passthrough in (False, True):
+            measure(upstream_url, passthrough, args.requests, args.clients)
+    finally:
+        upstream.shutdown()
+
+
+if __name__ == '__main__':
+    main()
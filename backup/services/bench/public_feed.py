@@ -0,0 +1,78 @@
+"""
+Public mood feed: SQLite query per request vs the in-memory ring buffer (user-015)
+
+Fills a mood service database with --moods moods (about half public, from
+500 authors whose profiles are already cached), then times pages of the
+feed read from SQLite (get_public_moods_from_db, the query the feed falls
+back to past its buffer) and from the ring buffer (get_public_moods), at
+the head of the feed and --depth moods in. Reports p50/p99 per call.
+
+    python bench/public_feed.py --moods 200000 --calls 3000
+"""
+
+import time
+import random
+import logging
+import argparse
+
+from harness import load_service, percentile
+
+AUTHORS = 500
+
+
+def latencies(fn, calls):
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def us(seconds):
+    return f"{seconds * 1e6:7.0f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--moods', type=int, default=200_000)
+    parser.add_argument('--page', type=int, default=20)
+    parser.add_argument('--depth', type=int, default=800, help='moods skipped before the deep page')
+    parser.add_argument('--calls', type=int, default=3000)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    moods = load_service('mood-service', USER_SERVICE_URL='http://127.0.0.1:9')
+    moods.init_db()
+
+    random.seed(5)
+    with moods.app.app_context():
+        db = moods.get_db()
+        db.executemany(
+            'INSERT INTO moods (user_id, mood, score, note, activities, is_public) VALUES (?, ?, ?, ?, ?, ?)',
+            [(random.randint(1, AUTHORS), 'calm', 5, 'note', '[]', random.random() < 0.5) for _ in range(args.moods)]
+        )
+        db.commit()
+    for user_id in range(1, AUTHORS + 1):
+        moods.user_profiles.cache.set(
+            str(user_id), {'id': str(user_id), 'username': f'user{user_id}', 'display_name': None, 'avatar_url': None}
+        )
+
+    with moods.app.app_context():
+        moods.ensure_public_feed_loaded()
+        deep = moods.get_public_moods(args.depth)[-1]['id']
+        assert moods.get_public_moods(args.page, deep) == moods.get_public_moods_from_db(args.page, deep)
+
+        print(f"{args.moods} moods, pages of {args.page}, feed buffer {moods.PUBLIC_FEED_SIZE}")
+        for label, fn in (
+            ('sqlite, head', lambda: moods.get_public_moods_from_db(args.page)),
+            ('buffer, head', lambda: moods.get_public_moods(args.page)),
+            (f'sqlite, {args.depth} in', lambda: moods.get_public_moods_from_db(args.page, deep)),
+            (f'buffer, {args.depth} in', lambda: moods.get_public_moods(args.page, deep))
+        ):
+            timings = latencies(fn, args.calls)
+            print(f"{label:>16}: p50 {us(percentile(timings, 50))}  p99 {us(percentile(timings, 99))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Pooled, tuned SQLite connections vs a new connection per get_db() call (user-005)
+
+Drives the mood service in-process (Flask test clients on --clients threads)
+with a mix of history reads and mood writes, once with the shared
+SQLiteDatabase pool and once with get_db() replaced by the previous
+behaviour: a fresh, untuned sqlite3 connection on every call. Each mode gets
+its own database file, so the per-call run keeps SQLite's default rollback
+journal as before.
+
+    python bench/sqlite_connections.py --requests 4000 --clients 8
+"""
+
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import load_service, percentile, ms
+
+USERS = 50
+
+
+def per_call_connections(moods):
+    """get_db() as it was: open a new connection every time, never reuse it"""
+    def get_db():
+        db = sqlite3.connect(moods.DATABASE_PATH)
+        db.row_factory = sqlite3.Row
+        return db
+    return get_db
+
+
+def seed(moods, per_user):
+    with moods.app.app_context():
+        db = moods.get_db()
+        db.executemany(
+            'INSERT INTO moods (user_id, mood, score, note, activities, is_public) VALUES (?, ?, ?, ?, ?, ?)',
+            [(user_id, 'calm', i % 10 + 1, f'note {i}', '[]', i % 2)
+             for user_id in range(1, USERS + 1) for i in range(per_user)]
+        )
+        db.commit()
+
+
+def measure(pooled, requests_count, clients, write_every):
+    moods = load_service('mood-service')
+    if not pooled:
+        moods.get_db = per_call_connections(moods)
+    moods.init_db()
+    seed(moods, 100)
+
+    local = threading.local()
+
+    def call(i):
+        if not hasattr(local, 'client'):
+            local.client = moods.app.test_client()
+        user_id = str(i % USERS + 1)
+        started = time.perf_counter()
+        if i % write_every == 0:
+            response = local.client.post('/moods', json={'mood': 'happy', 'score': 7}, headers={'X-User-ID': user_id})
+        else:
+            response = local.client.get(f'/users/{user_id}/moods?first=20')
+        assert response.status_code in (200, 201), response.status_code
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        latencies = list(pool.map(call, range(requests_count)))
+    elapsed = time.perf_counter() - started
+
+    mode = 'pooled' if pooled else 'per-call'
+    print(f"{mode:>9}: {requests_count / elapsed:7.1f} req/s, p50 {ms(percentile(latencies, 50))}, "
+          f"p99 {ms(percentile(latencies, 99))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=4000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--write-every', type=int, default=10, help='every Nth request creates a mood')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # migration progress
+    print(f"{args.requests} requests, {args.clients} clients, 1 in {args.write_every} a write")
+    for pooled in (False, True):
+        measure(pooled, args.requests, args.clients, args.write_every)
+
+
+if __name__ == '__main__':
+    main()
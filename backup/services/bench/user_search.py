@@ -0,0 +1,66 @@
+"""
+User search: FTS5 index vs LIKE '%q%' scans (user-019)
+
+Fills a user service database with --profiles random profiles and times
+find_users() on its full-text index against the LIKE query it replaced,
+for short prefixes, full names, multi-word queries and rare terms. The
+in-memory prefix index and the result cache are left out: both are only
+started by the running service.
+
+    python bench/user_search.py --profiles 1000000
+"""
+
+import time
+import random
+import string
+import logging
+import argparse
+
+from harness import load_service, timed, ms
+
+FIRST_NAMES = ['anna', 'ben', 'carla', 'dmitri', 'émile', 'fatima', 'george', 'hana', 'ivan', 'josé',
+               'kai', 'lena', 'olga', 'oliver', 'zoe']
+LAST_NAMES = ['Smith', 'Ng', 'Olsen', 'García']
+QUERIES = ['o', 'ol', 'olg', 'olga', 'olga smi', 'emile', 'garc', 'x9q', 'nobody']
+
+LIKE_QUERY = 'SELECT * FROM user_profiles WHERE username LIKE ? OR display_name LIKE ? ORDER BY username LIMIT ?'
+
+
+def profiles(count):
+    for user_id in range(1, count + 1):
+        first = random.choice(FIRST_NAMES)
+        suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
+        yield user_id, f'{first}_{suffix}', f'{random.choice(FIRST_NAMES).title()} {random.choice(LAST_NAMES)}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=200_000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    users = load_service('user-service')
+    users.init_db()
+
+    random.seed(5)
+    with users.app.app_context():
+        db = users.get_db()
+        if not users.user_search_index_exists(db.cursor()):
+            parser.error('this SQLite build has no FTS5; search uses LIKE either way')
+
+        started = time.perf_counter()
+        db.executemany('INSERT INTO user_profiles (id, username, display_name) VALUES (?, ?, ?)', profiles(args.profiles))
+        db.commit()
+        print(f"{args.profiles} profiles inserted (and indexed) in {time.perf_counter() - started:.1f}s")
+
+        for query in QUERIES:
+            fts = timed(lambda: users.find_users(query, args.limit), args.repeat)
+            like = timed(lambda: db.execute(LIKE_QUERY, (f'%{query}%', f'%{query}%', args.limit)).fetchall(), args.repeat)
+            top = [user['username'] for user in users.find_users(query, args.limit)[:3]]
+            print(f"{query!r:>11}: fts {ms(fts):>10}  like {ms(like):>10}  top {top}")
+
+
+if __name__ == '__main__':
+    main()
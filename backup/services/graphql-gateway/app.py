@@ -5,22 +5,39 @@ A unified GraphQL API gateway that orchestrates requests across microservices.
 Implements a GraphQL mesh pattern for federated queries across service boundaries.
 """
 
+if __name__ == '__main__':
+    # pywsgi serves every request on a greenlet of one thread: make sockets,
+    # sleeps and threading primitives (the token validator's batch locks and
+    # events, outbound requests calls) cooperative before anything imports them
+    from gevent import monkey
+    monkey.patch_all()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from flask_sockets import Sockets
 import os
+import sys
 import jwt
 import json
 import logging
 import requests
+import threading
+import time
 from ariadne import load_schema_from_path, make_executable_schema, graphql_sync
 from ariadne import ObjectType, QueryType, MutationType, SubscriptionType
 from ariadne.constants import PLAYGROUND_HTML
 from ariadne.asgi.graphql_ws import GraphQLWSConsumer
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from uuid import uuid4
 from datetime import datetime, timedelta
 
+# Shared service utilities
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.jwks import KeySet, KeySetUnavailable, JWT_LEGACY_HS256
+from shared.revocation import RevocationList
+from shared.dataloader import CoalescingLoader
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -43,6 +60,22 @@ HUG_SERVICE_URL = os.environ.get('HUG_SERVICE_URL', 'http://localhost:5004')
 SOCIAL_SERVICE_URL = os.environ.get('SOCIAL_SERVICE_URL', 'http://localhost:5005')
 STREAK_SERVICE_URL = os.environ.get('STREAK_SERVICE_URL', 'http://localhost:5006')
 
+# Token verification keys, published by the Auth service
+JWKS_URL = os.environ.get('JWKS_URL', f'{AUTH_SERVICE_URL}/.well-known/jwks.json')
+REVOCATIONS_URL = os.environ.get('REVOCATIONS_URL', f'{AUTH_SERVICE_URL}/auth/revocations')
+
+# Tokens the Auth service is asked about are sent in batches (validateTokens)
+VALIDATE_BATCH_SIZE = int(os.environ.get('VALIDATE_BATCH_SIZE', 100))
+VALIDATE_BATCH_WAIT = float(os.environ.get('VALIDATE_BATCH_WAIT', 0.005))  # seconds to gather a batch
+
+# Auth service calls (validateTokens) run behind a shared batch: never let one hang
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 2))
+HTTP_READ_TIMEOUT = float(os.environ.get('HTTP_READ_TIMEOUT', 10))
+
+# Health check configuration
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', 2))
+HEALTH_CACHE_TTL = float(os.environ.get('HEALTH_CACHE_TTL', 5))  # seconds
+
 # WebSocket clients
 ws_clients = {}
 
@@ -58,20 +91,22 @@ def get_token_from_request():
     except (IndexError, AttributeError):
         return None
 
-def authenticate():
-    """Verify JWT token and return payload"""
-    token = get_token_from_request()
-    if not token:
-        return None
+key_set = KeySet(JWKS_URL, legacy_secret=SECRET_KEY if JWT_LEGACY_HS256 else None)
+revocation_list = RevocationList()
+
+def validate_tokens_with_auth_service(tokens):
+    """Validate a batch of tokens with one Auth service call; returns {token: user or None}
     
+    If the Auth service can't be reached or times out, every token in the
+    batch is treated as invalid, as when no verification keys are available.
+    """
     try:
-        # Verify token with Auth service
         response = requests.post(
             f"{AUTH_SERVICE_URL}/graphql",
             json={
                 "query": """
-                query ValidateToken($token: String!) {
-                    validateToken(token: $token) {
+                query ValidateTokens($tokens: [String!]!) {
+                    validateTokens(tokens: $tokens) {
                         valid
                         user {
                             id
@@ -80,20 +115,53 @@ def authenticate():
                     }
                 }
                 """,
-                "variables": {"token": token}
-            }
+                "variables": {"tokens": tokens}
+            },
+            timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
         )
-        
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('data') and result['data'].get('validateToken'):
-                validation = result['data']['validateToken']
-                if validation.get('valid') and validation.get('user'):
-                    return validation['user']
-        
-        # Fallback to local validation if Auth service is unavailable
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        return {'id': payload.get('id')}
+        result = response.json() if response.status_code == 200 else {}
+    except (requests.RequestException, ValueError) as e:
+        logger.error(f"Error validating {len(tokens)} tokens with Auth service: {str(e)}")
+        return {}
+    
+    users = {}
+    if result.get('data') and result['data'].get('validateTokens'):
+        for token, validation in zip(tokens, result['data']['validateTokens']):
+            if validation.get('valid') and validation.get('user'):
+                users[token] = validation['user']
+    
+    return users
+
+# Concurrent validations (e.g. WebSocket clients reconnecting together) share a call
+token_validator = CoalescingLoader(validate_tokens_with_auth_service, VALIDATE_BATCH_SIZE, VALIDATE_BATCH_WAIT)
+
+def validate_token_with_auth_service(token):
+    """Ask the Auth service to validate a token; returns the user or None"""
+    return token_validator.load(token)
+
+def verify_token(token):
+    """Verify a JWT locally against the Auth service's published keys and return its user"""
+    try:
+        claims = key_set.decode(token)
+    except KeySetUnavailable:
+        # No keys yet (Auth service unreachable since startup): ask it directly
+        return validate_token_with_auth_service(token)
+    except jwt.InvalidTokenError:
+        return None
+    
+    if revocation_list.is_revoked(claims):
+        return None
+    
+    return {'id': claims.get('id'), 'username': claims.get('username')}
+
+def authenticate():
+    """Verify JWT token and return its user"""
+    token = get_token_from_request()
+    if not token:
+        return None
+    
+    try:
+        return verify_token(token)
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
         return None
@@ -633,46 +701,23 @@ def handle_graphql_ws_message(ws, data, client_id):
         
         if token:
             try:
-                # Verify token with Auth service
-                response = requests.post(
-                    f"{AUTH_SERVICE_URL}/graphql",
-                    json={
-                        "query": """
-                        query ValidateToken($token: String!) {
-                            validateToken(token: $token) {
-                                valid
-                                user {
-                                    id
-                                    username
-                                }
-                            }
-                        }
-                        """,
-                        "variables": {"token": token}
-                    }
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    if result.get('data') and result['data'].get('validateToken'):
-                        validation = result['data']['validateToken']
-                        if validation.get('valid') and validation.get('user'):
-                            user = validation['user']
-                            ws_clients[client_id]['authenticated'] = True
-                            ws_clients[client_id]['user_id'] = user['id']
-                            
-                            # Set user online in User service
-                            try:
-                                requests.put(
-                                    f"{USER_SERVICE_URL}/users/{user['id']}/online",
-                                    json={'isOnline': True},
-                                    headers={'X-User-ID': str(user['id'])}
-                                )
-                            except Exception as e:
-                                logger.error(f"Error setting user online: {str(e)}")
-                            
-                            # Broadcast to other clients
-                            broadcast_user_status(user['id'], True)
+                user = verify_token(token)
+                if user:
+                    ws_clients[client_id]['authenticated'] = True
+                    ws_clients[client_id]['user_id'] = user['id']
+                    
+                    # Set user online in User service
+                    try:
+                        requests.put(
+                            f"{USER_SERVICE_URL}/users/{user['id']}/online",
+                            json={'isOnline': True},
+                            headers={'X-User-ID': str(user['id'])}
+                        )
+                    except Exception as e:
+                        logger.error(f"Error setting user online: {str(e)}")
+                    
+                    # Broadcast to other clients
+                    broadcast_user_status(user['id'], True)
             except Exception as e:
                 logger.error(f"Error during WebSocket authentication: {str(e)}")
         
@@ -735,56 +780,81 @@ def broadcast_user_status(user_id, is_online):
             except Exception as e:
                 logger.error(f"Error broadcasting user status: {str(e)}")
 
+# Health probes run in parallel; the last result is shared by callers for HEALTH_CACHE_TTL
+health_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='health-probe')
+health_cache = {'checked_at': 0, 'services': None}
+health_lock = threading.Lock()
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Health check endpoint; ?deep=true bypasses the cached probe result"""
+    deep = request.args.get('deep', 'false').lower() == 'true'
+    
     # Check health of all services
-    services_health = check_services_health()
+    services_health, cached = check_services_health(deep)
     
     all_healthy = all(service['status'] == 'healthy' for service in services_health.values())
     status_code = 200 if all_healthy else 503
     
     return jsonify({
         'status': 'healthy' if all_healthy else 'degraded',
-        'services': services_health
+        'services': services_health,
+        'cached': cached,
+        'jwks': key_set.stats(),
+        'revocations': revocation_list.stats(),
+        'tokenValidator': token_validator.stats()
     }), status_code
 
-def check_services_health():
-    """Check health of all microservices"""
+def probe_service(url):
+    """Probe a single service's /health endpoint"""
+    if url == 'self':
+        return {
+            'status': 'healthy',
+            'url': 'self'
+        }
+    
+    try:
+        response = requests.get(f"{url}/health", timeout=HEALTH_CHECK_TIMEOUT)
+        return {
+            'status': 'healthy' if response.status_code == 200 else 'unhealthy',
+            'url': url
+        }
+    except requests.RequestException:
+        return {
+            'status': 'unhealthy',
+            'url': url
+        }
+
+def check_services_health(deep=False):
+    """Check health of all microservices concurrently, reusing a recent result unless deep is set"""
     services = {
         'auth': AUTH_SERVICE_URL,
         'user': USER_SERVICE_URL,
         'gateway': 'self'
     }
     
-    health_status = {}
-    
-    for name, url in services.items():
-        if url == 'self':
-            health_status[name] = {
-                'status': 'healthy',
-                'url': 'self'
-            }
-            continue
+    # Concurrent callers wait for the in-progress probe and reuse its result
+    with health_lock:
+        age = time.monotonic() - health_cache['checked_at']
+        if not deep and health_cache['services'] is not None and age < HEALTH_CACHE_TTL:
+            return health_cache['services'], True
         
-        try:
-            response = requests.get(f"{url}/health", timeout=2)
-            health_status[name] = {
-                'status': 'healthy' if response.status_code == 200 else 'unhealthy',
-                'url': url
-            }
-        except requests.RequestException:
-            health_status[name] = {
-                'status': 'unhealthy',
-                'url': url
-            }
-    
-    return health_status
+        futures = {name: health_executor.submit(probe_service, url) for name, url in services.items()}
+        health_status = {name: future.result() for name, future in futures.items()}
+        
+        health_cache['services'] = health_status
+        health_cache['checked_at'] = time.monotonic()
+        return health_status, False
 
 if __name__ == '__main__':
     from gevent import pywsgi
     from geventwebsocket.handler import WebSocketHandler
     
+    # Fetch token verification keys, then keep them fresh in the background,
+    # and follow the Auth service's revocation feed
+    key_set.start()
+    revocation_list.start(REVOCATIONS_URL)
+    
     server = pywsgi.WSGIServer(('0.0.0.0', PORT), app, handler_class=WebSocketHandler)
     logger.info(f"Starting GraphQL Gateway on port {PORT}")
     server.serve_forever()
\ No newline at end of file
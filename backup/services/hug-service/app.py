@@ -12,13 +12,23 @@ import jwt
 from datetime import datetime, timedelta
 import logging
 from ariadne import load_schema_from_path, make_executable_schema, graphql_sync
-from ariadne import ObjectType, QueryType, MutationType
+from ariadne import ObjectType, QueryType, MutationType, snake_case_fallback_resolvers
 from ariadne.constants import PLAYGROUND_HTML
 import json
 import sqlite3  # Using SQLite for simplicity; in production, use PostgreSQL with SQLAlchemy
 from functools import wraps
 import requests
 import uuid
+import sys
+
+# Shared service utilities live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import SQLiteDatabase
+from shared.migrations import apply_migrations
+from shared.dataloader import BatchLoader
+from shared.profiles import UserProfiles
+from shared.export import EXPORT_MIMETYPES, export_response, iter_rows, merge_rows
+from shared.pagination import EMPTY_PAGE, InvalidCursor, build_page, connection, decode_cursor, page_headers, page_size
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -36,11 +46,27 @@ PORT = int(os.environ.get('PORT', 5004))
 AUTH_SERVICE_URL = os.environ.get('AUTH_SERVICE_URL', 'http://localhost:5001')
 USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://localhost:5002')
 
+# User profile lookups against the User service
+USER_SERVICE_TIMEOUT = float(os.environ.get('USER_SERVICE_TIMEOUT', 2))
+USER_PROFILE_CACHE_TTL = int(os.environ.get('USER_PROFILE_CACHE_TTL', 60))  # seconds
+USER_PROFILE_CACHE_SIZE = int(os.environ.get('USER_PROFILE_CACHE_SIZE', 10000))
+
+# Group hug listings show this many participants per group
+GROUP_PARTICIPANT_PREVIEW = 10
+
+# Default page size of a single group's full participant list
+GROUP_PARTICIPANT_PAGE_SIZE = 50
+
+# Stay below SQLite's default bound-parameter limit in IN (...) lists
+SQLITE_MAX_PARAMS = 500
+
 # Database setup - would typically use SQLAlchemy in production
+DATABASE_PATH = os.environ.get('DATABASE_PATH', 'hug.db')
+database = SQLiteDatabase(DATABASE_PATH, app)
+
 def get_db():
-    db = sqlite3.connect('hug.db')
-    db.row_factory = sqlite3.Row
-    return db
+    """Connection for the current request (pooled, released at teardown)"""
+    return database.get()
 
 def init_db():
     with app.app_context():
@@ -132,6 +158,43 @@ def init_db():
             db.commit()
         except sqlite3.Error as e:
             logger.error(f"Error creating hug types: {str(e)}")
+        
+        apply_migrations(db, MIGRATIONS)
+
+# Schema migrations, applied in order by init_db()
+MIGRATIONS = [
+    (1, 'hug hot-path indexes', [
+        # Sent/received hug lists: WHERE sender_id|recipient_id = ? ORDER BY created_at DESC
+        'CREATE INDEX IF NOT EXISTS idx_hugs_sender_created ON hugs (sender_id, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_hugs_recipient_created ON hugs (recipient_id, created_at)',
+        # Hug requests: recipient_id = ? OR (is_public = 1 AND status = 'pending'), one index per OR branch
+        'CREATE INDEX IF NOT EXISTS idx_hug_requests_recipient_status ON hug_requests (recipient_id, status, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_hug_requests_public_status ON hug_requests (is_public, status, created_at)',
+        # Public group hug list
+        'CREATE INDEX IF NOT EXISTS idx_group_hugs_public_created ON group_hugs (is_public, created_at)',
+        # Participants of a group in join order, and groups of a user
+        'CREATE INDEX IF NOT EXISTS idx_group_participants_group_joined ON group_hug_participants (group_id, joined_at)',
+        'CREATE INDEX IF NOT EXISTS idx_group_participants_user ON group_hug_participants (user_id, group_id)'
+    ]),
+    (2, 'keyset pagination indexes', [
+        # List pages are cut with (created_at, id) < (?, ?); ids are TEXT, so they have to be in the index
+        'DROP INDEX IF EXISTS idx_hugs_sender_created',
+        'CREATE INDEX IF NOT EXISTS idx_hugs_sender_created_id ON hugs (sender_id, created_at, id)',
+        'DROP INDEX IF EXISTS idx_hugs_recipient_created',
+        'CREATE INDEX IF NOT EXISTS idx_hugs_recipient_created_id ON hugs (recipient_id, created_at, id)',
+        # Hug requests page each OR branch separately; the recipient branch does not filter on status
+        'CREATE INDEX IF NOT EXISTS idx_hug_requests_recipient_created_id ON hug_requests (recipient_id, created_at, id)',
+        'DROP INDEX IF EXISTS idx_hug_requests_public_status',
+        'CREATE INDEX IF NOT EXISTS idx_hug_requests_public_status_created_id ON hug_requests (is_public, status, created_at, id)',
+        'DROP INDEX IF EXISTS idx_group_hugs_public_created',
+        'CREATE INDEX IF NOT EXISTS idx_group_hugs_public_created_id ON group_hugs (is_public, created_at, id)'
+    ])
+]
+
+# Keep-alive session and short-lived profile cache for User service lookups
+user_profiles = UserProfiles(
+    USER_SERVICE_URL, USER_SERVICE_TIMEOUT, USER_PROFILE_CACHE_SIZE, USER_PROFILE_CACHE_TTL, placeholders=True
+)
 
 # Authentication utilities
 def get_user_from_header():
@@ -415,8 +478,64 @@ def join_group_hug(user_id, group_id):
             'message': f'Error: {str(e)}'
         }
 
-def get_group_hug(group_id):
-    """Get a group hug with its participants"""
+def _chunks(values, size=SQLITE_MAX_PARAMS):
+    """Split a list of query parameters into IN (...) sized chunks"""
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def load_group_participants(cursor, group_ids, per_group_limit=GROUP_PARTICIPANT_PREVIEW):
+    """Load participants for many groups at once, in join order.
+    
+    A single query returns the first per_group_limit participants of every
+    group (all of them when per_group_limit is None). Each group's rows come
+    from a LIMITed walk of the (group_id, joined_at) index, so participants
+    beyond the preview are never read.
+    """
+    participants = {group_id: [] for group_id in group_ids}
+
+    for chunk in _chunks(list(participants)):
+        values = ', '.join('(?)' for _ in chunk)
+        cursor.execute(
+            f'''
+            WITH page(group_id) AS (VALUES {values})
+            SELECT p.id, p.group_id, p.user_id, p.joined_at
+            FROM page
+            JOIN group_hug_participants p ON p.id IN (
+                SELECT id FROM group_hug_participants
+                WHERE group_id = page.group_id
+                ORDER BY joined_at, id
+                LIMIT ?
+            )
+            ORDER BY p.group_id, p.joined_at, p.id
+            ''',
+            (*chunk, -1 if per_group_limit is None else per_group_limit)
+        )
+        for participant in cursor.fetchall():
+            participants[participant['group_id']].append(dict(participant))
+    
+    return participants
+
+def count_group_participants(cursor, group_ids):
+    """Participant count per group, in one grouped query"""
+    counts = {}
+    
+    for chunk in _chunks(list(dict.fromkeys(group_ids))):
+        placeholders = ', '.join('?' for _ in chunk)
+        cursor.execute(
+            f'''
+            SELECT group_id, COUNT(*) AS count FROM group_hug_participants
+            WHERE group_id IN ({placeholders})
+            GROUP BY group_id
+            ''',
+            chunk
+        )
+        for row in cursor.fetchall():
+            counts[row['group_id']] = row['count']
+    
+    return counts
+
+def get_group_hug(group_id, participants_first=None, participants_after=None):
+    """Get a group hug with a page of its participants"""
     db = get_db()
     cursor = db.cursor()
     
@@ -433,99 +552,125 @@ def get_group_hug(group_id):
     # Convert is_public to boolean
     group_dict['is_public'] = bool(group_dict['is_public'])
     
-    # Get participants
-    cursor.execute(
-        '''
-        SELECT p.*, u.username, u.display_name, u.avatar_url
-        FROM group_hug_participants p
-        LEFT JOIN user_profiles u ON p.user_id = u.id
-        WHERE p.group_id = ?
-        ORDER BY p.joined_at
-        ''',
-        (group_id,)
-    )
-    participants = cursor.fetchall()
+    # Get participants, one page at a time
+    page = get_group_participants(group_id, participants_first, participants_after)
     
-    # Convert to list of dicts
-    participant_list = []
-    for participant in participants:
-        participant_dict = dict(participant)
-        participant_list.append(participant_dict)
-    
-    group_dict['participants'] = participant_list
+    group_dict['participants'] = page.items
+    group_dict['participantCount'] = count_group_participants(cursor, [group_id]).get(group_id, 0)
+    group_dict['participantsPageInfo'] = {'hasNextPage': page.has_next_page, 'endCursor': page.end_cursor}
     
     return group_dict
 
-def get_user_sent_hugs(user_id, limit=50):
-    """Get hugs sent by a user"""
+def get_group_participants(group_id, first=None, after=None):
+    """A page of a group's participants in join order, starting after the cursor after"""
+    size = page_size(first, GROUP_PARTICIPANT_PAGE_SIZE)
+    cursor_key = decode_cursor(after) if after else None
+    keyset = 'AND (joined_at, id) > (?, ?)' if cursor_key else ''
+    
+    cursor = get_db().cursor()
+    cursor.execute(
+        f'''
+        SELECT id, group_id, user_id, joined_at FROM group_hug_participants
+        WHERE group_id = ? {keyset}
+        ORDER BY joined_at, id
+        LIMIT ?
+        ''',
+        (group_id, *(cursor_key or ()), size + 1)
+    )
+    return build_page([dict(row) for row in cursor.fetchall()], size, key=participant_key)
+
+def participant_key(participant):
+    return (participant['joined_at'], participant['id'])
+
+def get_user_sent_hugs(user_id, limit=50, after=None):
+    """Get a page of hugs sent by a user, newest first"""
+    size = page_size(limit, 50)
+    cursor_key = decode_cursor(after) if after else None
+    keyset = 'AND (created_at, id) < (?, ?)' if cursor_key else ''
+    
     db = get_db()
     cursor = db.cursor()
     
     try:
         cursor.execute(
-            '''
+            f'''
             SELECT * FROM hugs 
-            WHERE sender_id = ? 
-            ORDER BY created_at DESC
+            WHERE sender_id = ? {keyset}
+            ORDER BY created_at DESC, id DESC
             LIMIT ?
             ''',
-            (user_id, limit)
+            (user_id, *(cursor_key or ()), size + 1)
         )
         hugs = cursor.fetchall()
         
         # Convert to list of dicts
-        hug_list = []
-        for hug in hugs:
-            hug_dict = dict(hug)
-            hug_list.append(hug_dict)
+        hug_list = [dict(hug) for hug in hugs]
         
-        return hug_list
+        return build_page(hug_list, size)
     except Exception as e:
         logger.error(f"Error getting sent hugs: {str(e)}")
-        return []
+        return EMPTY_PAGE
 
-def get_user_received_hugs(user_id, limit=50):
-    """Get hugs received by a user"""
+def get_user_received_hugs(user_id, limit=50, after=None):
+    """Get a page of hugs received by a user, newest first"""
+    size = page_size(limit, 50)
+    cursor_key = decode_cursor(after) if after else None
+    keyset = 'AND (created_at, id) < (?, ?)' if cursor_key else ''
+    
     db = get_db()
     cursor = db.cursor()
     
     try:
         cursor.execute(
-            '''
+            f'''
             SELECT * FROM hugs 
-            WHERE recipient_id = ? 
-            ORDER BY created_at DESC
+            WHERE recipient_id = ? {keyset}
+            ORDER BY created_at DESC, id DESC
             LIMIT ?
             ''',
-            (user_id, limit)
+            (user_id, *(cursor_key or ()), size + 1)
         )
         hugs = cursor.fetchall()
         
         # Convert to list of dicts
-        hug_list = []
-        for hug in hugs:
-            hug_dict = dict(hug)
-            hug_list.append(hug_dict)
+        hug_list = [dict(hug) for hug in hugs]
         
-        return hug_list
+        return build_page(hug_list, size)
     except Exception as e:
         logger.error(f"Error getting received hugs: {str(e)}")
-        return []
+        return EMPTY_PAGE
 
-def get_user_hug_requests(user_id, limit=50):
-    """Get hug requests for a user"""
+def get_user_hug_requests(user_id, limit=50, after=None):
+    """Get a page of hug requests for a user, newest first"""
+    size = page_size(limit, 50)
+    cursor_key = decode_cursor(after) if after else None
+    keyset = 'AND (created_at, id) < (?, ?)' if cursor_key else ''
+    keyset_params = cursor_key or ()
+    
     db = get_db()
     cursor = db.cursor()
     
     try:
+        # Each branch of the OR is its own index range scan, merged by the outer ORDER BY
         cursor.execute(
-            '''
-            SELECT * FROM hug_requests 
-            WHERE recipient_id = ? OR (is_public = 1 AND status = 'pending') 
-            ORDER BY created_at DESC
+            f'''
+            SELECT * FROM (
+                SELECT * FROM hug_requests
+                WHERE recipient_id = ? {keyset}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            )
+            UNION
+            SELECT * FROM (
+                SELECT * FROM hug_requests
+                WHERE is_public = 1 AND status = 'pending' {keyset}
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            )
+            ORDER BY created_at DESC, id DESC
             LIMIT ?
             ''',
-            (user_id, limit)
+            (user_id, *keyset_params, size + 1, *keyset_params, size + 1, size + 1)
         )
         requests = cursor.fetchall()
         
@@ -539,10 +684,10 @@ def get_user_hug_requests(user_id, limit=50):
             
             request_list.append(req_dict)
         
-        return request_list
+        return build_page(request_list, size)
     except Exception as e:
         logger.error(f"Error getting hug requests: {str(e)}")
-        return []
+        return EMPTY_PAGE
 
 def get_hug_types():
     """Get all available hug types"""
@@ -561,92 +706,97 @@ def get_hug_types():
         logger.error(f"Error getting hug types: {str(e)}")
         return []
 
-def get_group_hugs(limit=20, user_id=None):
-    """Get group hugs, optionally filtered by user participation"""
+def get_group_hugs(limit=20, user_id=None, after=None):
+    """Get a page of group hugs, newest first, optionally filtered by user participation"""
+    size = page_size(limit, 20)
+    cursor_key = decode_cursor(after) if after else None
+    
     db = get_db()
     cursor = db.cursor()
     
     try:
         if user_id:
             # Get groups the user is part of
+            keyset = 'AND (g.created_at, g.id) < (?, ?)' if cursor_key else ''
             cursor.execute(
-                '''
+                f'''
                 SELECT g.* 
                 FROM group_hugs g
                 JOIN group_hug_participants p ON g.id = p.group_id
-                WHERE p.user_id = ?
-                ORDER BY g.created_at DESC
+                WHERE p.user_id = ? {keyset}
+                ORDER BY g.created_at DESC, g.id DESC
                 LIMIT ?
                 ''',
-                (user_id, limit)
+                (user_id, *(cursor_key or ()), size + 1)
             )
         else:
             # Get public groups
+            keyset = 'AND (created_at, id) < (?, ?)' if cursor_key else ''
             cursor.execute(
-                '''
+                f'''
                 SELECT * FROM group_hugs 
-                WHERE is_public = 1
-                ORDER BY created_at DESC
+                WHERE is_public = 1 {keyset}
+                ORDER BY created_at DESC, id DESC
                 LIMIT ?
                 ''',
-                (limit,)
+                (*(cursor_key or ()), size + 1)
             )
         
-        groups = cursor.fetchall()
+        page = build_page(cursor.fetchall(), size)
+        
+        # Load participant previews and counts for the whole page in two batched queries
+        group_ids = [group['id'] for group in page.items]
+        participants = load_group_participants(cursor, group_ids)
+        counts = count_group_participants(cursor, group_ids)
         
-        # Convert to list of dicts and get participants
+        # Convert to list of dicts
         group_list = []
-        for group in groups:
+        for group in page.items:
             group_dict = dict(group)
             
             # Convert is_public to boolean
             group_dict['is_public'] = bool(group_dict['is_public'])
             
-            # Get participants
-            cursor.execute(
-                '''
-                SELECT p.*, u.username, u.display_name, u.avatar_url
-                FROM group_hug_participants p
-                LEFT JOIN user_profiles u ON p.user_id = u.id
-                WHERE p.group_id = ?
-                ORDER BY p.joined_at
-                LIMIT 10
-                ''',
-                (group_dict['id'],)
-            )
-            participants = cursor.fetchall()
-            
-            # Convert to list of dicts
-            participant_list = []
-            for participant in participants:
-                participant_dict = dict(participant)
-                participant_list.append(participant_dict)
-            
-            group_dict['participants'] = participant_list
-            
-            # Get participant count
-            cursor.execute(
-                'SELECT COUNT(*) as count FROM group_hug_participants WHERE group_id = ?',
-                (group_dict['id'],)
-            )
-            count = cursor.fetchone()
-            group_dict['participantCount'] = count['count']
+            group_dict['participants'] = participants[group_dict['id']]
+            group_dict['participantCount'] = counts.get(group_dict['id'], 0)
             
             group_list.append(group_dict)
         
-        return group_list
+        return page._replace(items=group_list)
     except Exception as e:
         logger.error(f"Error getting group hugs: {str(e)}")
-        return []
+        return EMPTY_PAGE
+
+def create_loaders():
+    """Per-request batch loaders for GraphQL execution"""
+    return {'users': BatchLoader(user_profiles.fetch)}
+
+def queue_users(info, rows, *fields):
+    """Queue every user id a result will need so nested user fields resolve in one batch"""
+    info.context['loaders']['users'].enqueue(
+        row.get(field) for row in rows if row for field in fields
+    )
+    return rows
+
+def queue_group_users(info, groups):
+    """Queue the creators and listed participants of group hugs"""
+    queue_users(info, groups, 'creator_id')
+    queue_users(info, [p for group in groups if group for p in group.get('participants') or []], 'user_id')
+    return groups
 
 # GraphQL Schema
 type_defs = """
 type Query {
-    sentHugs(userId: ID!, limit: Int): [Hug]
-    receivedHugs(userId: ID!, limit: Int): [Hug]
-    hugRequests(userId: ID!, limit: Int): [HugRequest]
-    groupHugs(limit: Int): [GroupHug]
-    userGroupHugs(userId: ID!, limit: Int): [GroupHug]
+    sentHugs(userId: ID!, limit: Int, after: String): [Hug]
+    receivedHugs(userId: ID!, limit: Int, after: String): [Hug]
+    hugRequests(userId: ID!, limit: Int, after: String): [HugRequest]
+    groupHugs(limit: Int, after: String): [GroupHug]
+    userGroupHugs(userId: ID!, limit: Int, after: String): [GroupHug]
+    sentHugsConnection(userId: ID!, first: Int, after: String): HugConnection
+    receivedHugsConnection(userId: ID!, first: Int, after: String): HugConnection
+    hugRequestsConnection(userId: ID!, first: Int, after: String): HugRequestConnection
+    groupHugsConnection(first: Int, after: String): GroupHugConnection
+    userGroupHugsConnection(userId: ID!, first: Int, after: String): GroupHugConnection
     groupHug(id: ID!): GroupHug
     hugTypes: [HugType]
     hug(id: ID!): Hug
@@ -698,6 +848,7 @@ type GroupHug {
     hugType: String!
     isPublic: Boolean!
     participants: [GroupHugParticipant]
+    participantsConnection(first: Int, after: String): GroupHugParticipantConnection
     participantCount: Int
     createdAt: String!
     creator: User
@@ -714,6 +865,51 @@ type GroupHugParticipant {
     avatarUrl: String
 }
 
+type PageInfo {
+    hasNextPage: Boolean!
+    endCursor: String
+}
+
+type HugConnection {
+    edges: [HugEdge]
+    pageInfo: PageInfo!
+}
+
+type HugEdge {
+    cursor: String!
+    node: Hug
+}
+
+type HugRequestConnection {
+    edges: [HugRequestEdge]
+    pageInfo: PageInfo!
+}
+
+type HugRequestEdge {
+    cursor: String!
+    node: HugRequest
+}
+
+type GroupHugConnection {
+    edges: [GroupHugEdge]
+    pageInfo: PageInfo!
+}
+
+type GroupHugEdge {
+    cursor: String!
+    node: GroupHug
+}
+
+type GroupHugParticipantConnection {
+    edges: [GroupHugParticipantEdge]
+    pageInfo: PageInfo!
+}
+
+type GroupHugParticipantEdge {
+    cursor: String!
+    node: GroupHugParticipant
+}
+
 type GroupHugJoinResult {
     success: Boolean!
     message: String
@@ -768,30 +964,61 @@ mutation = MutationType()
 hug_type = ObjectType("Hug")
 request_type = ObjectType("HugRequest")
 group_type = ObjectType("GroupHug")
+participant_type = ObjectType("GroupHugParticipant")
 
 @query.field("sentHugs")
-def resolve_sent_hugs(_, info, userId, limit=50):
-    return get_user_sent_hugs(userId, limit)
+def resolve_sent_hugs(_, info, userId, limit=50, after=None):
+    return queue_users(info, get_user_sent_hugs(userId, limit, after).items, 'sender_id', 'recipient_id')
 
 @query.field("receivedHugs")
-def resolve_received_hugs(_, info, userId, limit=50):
-    return get_user_received_hugs(userId, limit)
+def resolve_received_hugs(_, info, userId, limit=50, after=None):
+    return queue_users(info, get_user_received_hugs(userId, limit, after).items, 'sender_id', 'recipient_id')
 
 @query.field("hugRequests")
-def resolve_hug_requests(_, info, userId, limit=50):
-    return get_user_hug_requests(userId, limit)
+def resolve_hug_requests(_, info, userId, limit=50, after=None):
+    return queue_users(info, get_user_hug_requests(userId, limit, after).items, 'requester_id', 'recipient_id')
 
 @query.field("groupHugs")
-def resolve_group_hugs(_, info, limit=20):
-    return get_group_hugs(limit)
+def resolve_group_hugs(_, info, limit=20, after=None):
+    return queue_group_users(info, get_group_hugs(limit, after=after).items)
 
 @query.field("userGroupHugs")
-def resolve_user_group_hugs(_, info, userId, limit=20):
-    return get_group_hugs(limit, userId)
+def resolve_user_group_hugs(_, info, userId, limit=20, after=None):
+    return queue_group_users(info, get_group_hugs(limit, userId, after).items)
+
+@query.field("sentHugsConnection")
+def resolve_sent_hugs_connection(_, info, userId, first=50, after=None):
+    page = get_user_sent_hugs(userId, first, after)
+    queue_users(info, page.items, 'sender_id', 'recipient_id')
+    return connection(page)
+
+@query.field("receivedHugsConnection")
+def resolve_received_hugs_connection(_, info, userId, first=50, after=None):
+    page = get_user_received_hugs(userId, first, after)
+    queue_users(info, page.items, 'sender_id', 'recipient_id')
+    return connection(page)
+
+@query.field("hugRequestsConnection")
+def resolve_hug_requests_connection(_, info, userId, first=50, after=None):
+    page = get_user_hug_requests(userId, first, after)
+    queue_users(info, page.items, 'requester_id', 'recipient_id')
+    return connection(page)
+
+@query.field("groupHugsConnection")
+def resolve_group_hugs_connection(_, info, first=20, after=None):
+    page = get_group_hugs(first, after=after)
+    queue_group_users(info, page.items)
+    return connection(page)
+
+@query.field("userGroupHugsConnection")
+def resolve_user_group_hugs_connection(_, info, userId, first=20, after=None):
+    page = get_group_hugs(first, userId, after)
+    queue_group_users(info, page.items)
+    return connection(page)
 
 @query.field("groupHug")
 def resolve_group_hug(_, info, id):
-    return get_group_hug(id)
+    return queue_group_users(info, [get_group_hug(id)])[0]
 
 @query.field("hugTypes")
 def resolve_hug_types(_, info):
@@ -852,7 +1079,7 @@ def resolve_create_group_hug(_, info, input):
     if not user:
         raise Exception("Authentication required")
     
-    return create_group_hug(user['id'], input)
+    return queue_group_users(info, [create_group_hug(user['id'], input)])[0]
 
 @mutation.field("joinGroupHug")
 def resolve_join_group_hug(_, info, groupId):
@@ -887,45 +1114,18 @@ def resolve_leave_group_hug(_, info, groupId):
         logger.error(f"Error leaving group hug: {str(e)}")
         raise Exception(f"Error leaving group hug: {str(e)}")
 
-# User field resolvers
+# User field resolvers (batched through the per-request user loader)
 @hug_type.field("sender")
 def resolve_hug_sender(obj, info):
-    sender_id = obj.get('sender_id')
-    
-    # In a real implementation, fetch user data from User service
-    # This is a placeholder
-    return {
-        'id': sender_id,
-        'username': f'user{sender_id}',
-        'displayName': f'User {sender_id}',
-        'avatarUrl': None
-    }
+    return info.context['loaders']['users'].load(obj.get('sender_id'))
 
 @hug_type.field("recipient")
 def resolve_hug_recipient(obj, info):
-    recipient_id = obj.get('recipient_id')
-    
-    # In a real implementation, fetch user data from User service
-    # This is a placeholder
-    return {
-        'id': recipient_id,
-        'username': f'user{recipient_id}',
-        'displayName': f'User {recipient_id}',
-        'avatarUrl': None
-    }
+    return info.context['loaders']['users'].load(obj.get('recipient_id'))
 
 @request_type.field("requester")
 def resolve_request_requester(obj, info):
-    requester_id = obj.get('requester_id')
-    
-    # In a real implementation, fetch user data from User service
-    # This is a placeholder
-    return {
-        'id': requester_id,
-        'username': f'user{requester_id}',
-        'displayName': f'User {requester_id}',
-        'avatarUrl': None
-    }
+    return info.context['loaders']['users'].load(obj.get('requester_id'))
 
 @request_type.field("recipient")
 def resolve_request_recipient(obj, info):
@@ -934,34 +1134,51 @@ def resolve_request_recipient(obj, info):
     if not recipient_id:
         return None
     
-    # In a real implementation, fetch user data from User service
-    # This is a placeholder
-    return {
-        'id': recipient_id,
-        'username': f'user{recipient_id}',
-        'displayName': f'User {recipient_id}',
-        'avatarUrl': None
-    }
+    return info.context['loaders']['users'].load(recipient_id)
+
+@group_type.field("participantsConnection")
+def resolve_group_participants_connection(obj, info, first=None, after=None):
+    page = get_group_participants(obj['id'], first, after)
+    queue_users(info, page.items, 'user_id')
+    return connection(page, key=participant_key)
+
+@group_type.field("participantCount")
+def resolve_group_participant_count(obj, info):
+    # Kept camelCase on the dict because the REST responses expose it as-is
+    return obj.get('participantCount')
 
 @group_type.field("creator")
 def resolve_group_creator(obj, info):
-    creator_id = obj.get('creator_id')
-    
-    # In a real implementation, fetch user data from User service
-    # This is a placeholder
-    return {
-        'id': creator_id,
-        'username': f'user{creator_id}',
-        'displayName': f'User {creator_id}',
-        'avatarUrl': None
-    }
+    return info.context['loaders']['users'].load(obj.get('creator_id'))
+
+@participant_type.field("user")
+def resolve_participant_user(obj, info):
+    return info.context['loaders']['users'].load(obj.get('user_id'))
+
+@participant_type.field("username")
+def resolve_participant_username(obj, info):
+    profile = resolve_participant_user(obj, info)
+    return profile.get('username') if profile else None
+
+@participant_type.field("displayName")
+def resolve_participant_display_name(obj, info):
+    profile = resolve_participant_user(obj, info)
+    return profile.get('display_name') if profile else None
+
+@participant_type.field("avatarUrl")
+def resolve_participant_avatar_url(obj, info):
+    profile = resolve_participant_user(obj, info)
+    return profile.get('avatar_url') if profile else None
 
 # Create executable schema
-schema = make_executable_schema(type_defs, query, mutation, hug_type, request_type, group_type)
+schema = make_executable_schema(
+    type_defs, query, mutation, hug_type, request_type, group_type, participant_type,
+    snake_case_fallback_resolvers
+)
 
 # Authentication middleware for GraphQL
 def get_context_value():
-    return {'user': get_user_from_header()}
+    return {'user': get_user_from_header(), 'loaders': create_loaders()}
 
 # GraphQL endpoint
 @app.route('/graphql', methods=['GET', 'POST'])
@@ -1086,47 +1303,130 @@ def leave_group_hug_api(group_id):
 @app.route('/users/<int:user_id>/sent-hugs', methods=['GET'])
 def get_sent_hugs_api(user_id):
     """Get hugs sent by a user"""
-    limit = request.args.get('limit', 50, type=int)
-    hugs = get_user_sent_hugs(user_id, limit)
-    return jsonify(hugs), 200
+    first = request.args.get('first', request.args.get('limit', 50, type=int), type=int)
+    try:
+        page = get_user_sent_hugs(user_id, first, request.args.get('after'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page.items), 200, page_headers(page)
 
 @app.route('/users/<int:user_id>/received-hugs', methods=['GET'])
 def get_received_hugs_api(user_id):
     """Get hugs received by a user"""
-    limit = request.args.get('limit', 50, type=int)
-    hugs = get_user_received_hugs(user_id, limit)
-    return jsonify(hugs), 200
+    first = request.args.get('first', request.args.get('limit', 50, type=int), type=int)
+    try:
+        page = get_user_received_hugs(user_id, first, request.args.get('after'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page.items), 200, page_headers(page)
+
+HUG_EXPORT_COLUMNS = ['id', 'direction', 'sender_id', 'recipient_id', 'hug_type', 'message', 'created_at']
+
+HUG_EXPORT_DIRECTIONS = {
+    'sent': 'sender_id',
+    'received': 'recipient_id'
+}
+
+def export_user_hugs(user_id, directions):
+    """Records generator over a user's sent and/or received hugs, oldest first, for export_response"""
+    def records(db):
+        # Each direction is an ordered index scan; merging them keeps memory flat
+        streams = []
+        for direction in directions:
+            cursor = db.execute(
+                f'''
+                SELECT id, ? AS direction, sender_id, recipient_id, hug_type, message, created_at
+                FROM hugs WHERE {HUG_EXPORT_DIRECTIONS[direction]} = ?
+                ORDER BY created_at, id
+                ''',
+                (direction, user_id)
+            )
+            streams.append(iter_rows(cursor))
+        
+        for row in merge_rows(*streams, key=lambda row: (row['created_at'], row['id'])):
+            yield dict(row)
+    
+    return records
+
+@app.route('/users/<int:user_id>/hugs/export', methods=['GET'])
+def export_user_hugs_api(user_id):
+    """Stream a user's full hug history as NDJSON (default) or CSV"""
+    user = get_user_from_header()
+    if not user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    if user['id'] != user_id:
+        return jsonify({'error': 'Not authorized to export this history'}), 403
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+    
+    direction = request.args.get('direction', 'all')
+    if direction == 'all':
+        directions = list(HUG_EXPORT_DIRECTIONS)
+    elif direction in HUG_EXPORT_DIRECTIONS:
+        directions = [direction]
+    else:
+        return jsonify({'error': f'Unsupported direction: {direction}'}), 400
+    
+    return export_response(
+        database,
+        export_user_hugs(user_id, directions),
+        export_format,
+        HUG_EXPORT_COLUMNS,
+        f'hugs-{user_id}'
+    )
 
 @app.route('/users/<int:user_id>/hug-requests', methods=['GET'])
 def get_hug_requests_api(user_id):
     """Get hug requests for a user"""
-    limit = request.args.get('limit', 50, type=int)
-    requests = get_user_hug_requests(user_id, limit)
-    return jsonify(requests), 200
+    first = request.args.get('first', request.args.get('limit', 50, type=int), type=int)
+    try:
+        page = get_user_hug_requests(user_id, first, request.args.get('after'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page.items), 200, page_headers(page)
 
 @app.route('/group-hugs', methods=['GET'])
 def get_group_hugs_api():
     """Get public group hugs"""
-    limit = request.args.get('limit', 20, type=int)
-    groups = get_group_hugs(limit)
-    return jsonify(groups), 200
+    first = request.args.get('first', request.args.get('limit', 20, type=int), type=int)
+    try:
+        page = get_group_hugs(first, after=request.args.get('after'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page.items), 200, page_headers(page)
 
 @app.route('/users/<int:user_id>/group-hugs', methods=['GET'])
 def get_user_group_hugs_api(user_id):
     """Get group hugs for a user"""
-    limit = request.args.get('limit', 20, type=int)
-    groups = get_group_hugs(limit, user_id)
-    return jsonify(groups), 200
+    first = request.args.get('first', request.args.get('limit', 20, type=int), type=int)
+    try:
+        page = get_group_hugs(first, user_id, request.args.get('after'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page.items), 200, page_headers(page)
 
 @app.route('/group-hugs/<group_id>', methods=['GET'])
 def get_group_hug_api(group_id):
     """Get a specific group hug"""
-    group = get_group_hug(group_id)
+    first = request.args.get('first', type=int)
+    try:
+        group = get_group_hug(group_id, first, request.args.get('after'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
     
     if not group:
         return jsonify({'error': 'Group hug not found'}), 404
     
-    return jsonify(group), 200
+    # Pagination headers describe the participant list
+    page_info = group['participantsPageInfo']
+    headers = {'X-Has-Next-Page': 'true' if page_info['hasNextPage'] else 'false'}
+    if page_info['hasNextPage']:
+        headers['X-Next-Cursor'] = page_info['endCursor']
+    
+    return jsonify(group), 200, headers
 
 @app.route('/data/hug-types', methods=['GET'])
 def get_hug_types_api():
@@ -1136,7 +1436,11 @@ def get_hug_types_api():
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'hug'}), 200
+    return jsonify({
+        'status': 'healthy',
+        'service': 'hug',
+        'profileCache': user_profiles.stats()
+    }), 200
 
 if __name__ == '__main__':
     # Initialize database
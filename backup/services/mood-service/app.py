@@ -9,16 +9,36 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
 import jwt
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import logging
 from ariadne import load_schema_from_path, make_executable_schema, graphql_sync
-from ariadne import ObjectType, QueryType, MutationType
+from ariadne import ObjectType, QueryType, MutationType, snake_case_fallback_resolvers
 from ariadne.constants import PLAYGROUND_HTML
 import json
 import sqlite3  # Using SQLite for simplicity; in production, use PostgreSQL with SQLAlchemy
 from functools import wraps
 import math
 import random
+import sys
+import time
+import threading
+import multiprocessing
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; analytics fall back to pure Python
+    np = None
+
+# Shared service utilities live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import SQLiteDatabase
+from shared.migrations import apply_migrations
+from shared.cache import SingleFlight, TTLCache
+from shared.export import EXPORT_MIMETYPES, export_response, iter_rows
+from shared.pagination import EMPTY_PAGE, InvalidCursor, build_page, connection, decode_cursor, page_headers, page_size
+from shared.profiles import UserProfiles
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -36,11 +56,55 @@ PORT = int(os.environ.get('PORT', 5003))
 AUTH_SERVICE_URL = os.environ.get('AUTH_SERVICE_URL', 'http://localhost:5001')
 USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://localhost:5002')
 
+# User service lookups for feed author data
+USER_SERVICE_TIMEOUT = float(os.environ.get('USER_SERVICE_TIMEOUT', 2))
+USER_PROFILE_CACHE_TTL = int(os.environ.get('USER_PROFILE_CACHE_TTL', 60))  # seconds
+USER_PROFILE_CACHE_SIZE = int(os.environ.get('USER_PROFILE_CACHE_SIZE', 10000))
+
+# Newest public moods kept in memory for /moods/feed and publicMoods
+PUBLIC_FEED_SIZE = int(os.environ.get('PUBLIC_FEED_SIZE', 1000))
+
+# Most moods accepted by one POST /moods/batch or createMoods call
+MAX_MOOD_BATCH = int(os.environ.get('MAX_MOOD_BATCH', 100))
+
 # Database setup - would typically use SQLAlchemy in production
+DATABASE_PATH = os.environ.get('DATABASE_PATH', 'mood.db')
+database = SQLiteDatabase(DATABASE_PATH, app)
+
+user_profiles = UserProfiles(USER_SERVICE_URL, USER_SERVICE_TIMEOUT, USER_PROFILE_CACHE_SIZE, USER_PROFILE_CACHE_TTL)
+
+# Analytics cache: decoded results in memory in front of the mood_analytics_cache
+# table. Entries are dropped when the user's moods change; otherwise they are
+# refreshed in the background as the time window slides (see analytics_expiry).
+ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 4096))
+ANALYTICS_REFRESH_INTERVAL = int(os.environ.get('ANALYTICS_REFRESH_INTERVAL', 3600))  # seconds
+ANALYTICS_STALE_SECONDS = int(os.environ.get('ANALYTICS_STALE_SECONDS', 60))  # served stale while refreshing
+ANALYTICS_EARLY_REFRESH_BETA = float(os.environ.get('ANALYTICS_EARLY_REFRESH_BETA', 1.0))
+ANALYTICS_REFRESH_THREADS = int(os.environ.get('ANALYTICS_REFRESH_THREADS', 2))
+analytics_cache = TTLCache(max_size=ANALYTICS_CACHE_SIZE)
+analytics_lock = threading.Lock()
+analytics_generations = {}  # user_id -> count of mood writes seen by this process
+analytics_ranges = {}       # user_id -> time ranges cached in memory
+analytics_db_stats = {'hits': 0, 'misses': 0, 'stale': 0}
+analytics_flight = SingleFlight()
+analytics_refresh_executor = ThreadPoolExecutor(max_workers=ANALYTICS_REFRESH_THREADS, thread_name_prefix='analytics-refresh')
+
+# Memory-tier entry; compute_time (seconds) drives probabilistic early refresh
+CachedAnalytics = namedtuple('CachedAnalytics', ['analytics', 'expires_at', 'compute_time'])
+
+# Background precompute of analytics for recently active users
+ANALYTICS_PRECOMPUTE = os.environ.get('ANALYTICS_PRECOMPUTE', 'true').lower() == 'true'
+ANALYTICS_PRECOMPUTE_RANGES = [int(r) for r in os.environ.get('ANALYTICS_PRECOMPUTE_RANGES', '7,30,90').split(',')]
+ANALYTICS_WORKERS = int(os.environ.get('ANALYTICS_WORKERS', 2))  # 0 computes in the scheduler thread
+ANALYTICS_CPU_BUDGET = float(os.environ.get('ANALYTICS_CPU_BUDGET', 0.5))  # busy share of wall time
+ANALYTICS_QUEUE_SIZE = int(os.environ.get('ANALYTICS_QUEUE_SIZE', 10000))
+
+# Mood lists at least this long are aggregated with NumPy when it is installed
+ANALYTICS_VECTOR_MIN = int(os.environ.get('ANALYTICS_VECTOR_MIN', 256))
+
 def get_db():
-    db = sqlite3.connect('mood.db')
-    db.row_factory = sqlite3.Row
-    return db
+    """Connection for the current request (pooled, released at teardown)"""
+    return database.get()
 
 def init_db():
     with app.app_context():
@@ -74,6 +138,78 @@ def init_db():
         ''')
         
         db.commit()
+        
+        apply_migrations(db, MIGRATIONS)
+
+# Analytics buckets
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+TIME_PERIODS = {
+    'Morning': (5, 11),   # 5:00 AM - 11:59 AM
+    'Afternoon': (12, 16), # 12:00 PM - 4:59 PM
+    'Evening': (17, 20),   # 5:00 PM - 8:59 PM
+    'Night': (21, 4)       # 9:00 PM - 4:59 AM
+}
+
+# Time-of-day period for each hour 0-23
+HOUR_PERIODS = [
+    next(
+        period for period, (start, end) in TIME_PERIODS.items()
+        if (start <= hour <= end if start <= end else hour >= start or hour <= end)
+    )
+    for hour in range(24)
+]
+
+PERIOD_NAMES = list(TIME_PERIODS)
+HOUR_PERIOD_INDEX = [PERIOD_NAMES.index(period) for period in HOUR_PERIODS]
+
+# Character layout of a 'YYYY-MM-DD HH:MM:SS' timestamp, for vectorized parsing
+TIMESTAMP_DIGITS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]
+TIMESTAMP_SEPARATORS = [4, 7, 10, 13, 16, 19]
+TIMESTAMP_SEPARATOR_CODES = [ord(c) for c in '-- ::'] + [0]
+
+# The same mapping as a SQL expression over a created_at column
+PERIOD_SQL = "CASE " + " ".join(
+    f"WHEN CAST(substr(created_at, 12, 2) AS INTEGER) BETWEEN {start} AND {end} THEN '{period}'"
+    for period, (start, end) in TIME_PERIODS.items() if start <= end
+) + " ELSE 'Night' END"
+
+# Schema migrations, applied in order by init_db()
+MIGRATIONS = [
+    (1, 'mood hot-path indexes', [
+        # Mood history and analytics: WHERE user_id = ? ORDER BY / range on created_at
+        'CREATE INDEX IF NOT EXISTS idx_moods_user_created ON moods (user_id, created_at)',
+        # Public feed: WHERE is_public = 1 ORDER BY created_at DESC
+        'CREATE INDEX IF NOT EXISTS idx_moods_public_created ON moods (is_public, created_at)'
+    ]),
+    (2, 'daily mood rollups', [
+        # One row per (user, UTC day, time-of-day period, mood); analytics read these instead of raw moods
+        '''
+        CREATE TABLE IF NOT EXISTS mood_rollups (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            period TEXT NOT NULL,
+            mood TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            score_sum INTEGER NOT NULL,
+            first_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (user_id, day, period, mood)
+        ) WITHOUT ROWID
+        ''',
+        # Backfill from existing moods
+        f'''
+        INSERT OR REPLACE INTO mood_rollups (user_id, day, period, mood, count, score_sum, first_at)
+        SELECT user_id, substr(created_at, 1, 10), {PERIOD_SQL}, mood, COUNT(*), SUM(score), MIN(created_at)
+        FROM moods
+        GROUP BY user_id, substr(created_at, 1, 10), {PERIOD_SQL}, mood
+        '''
+    ]),
+    (3, 'public moods by id', [
+        # The feed's SQLite fallback pages public moods by id, not created_at
+        'DROP INDEX IF EXISTS idx_moods_public_created',
+        'CREATE INDEX IF NOT EXISTS idx_moods_public_id ON moods (is_public, id)'
+    ])
+]
 
 # Authentication utilities
 def get_user_from_header():
@@ -104,7 +240,6 @@ def create_mood(user_id, mood_data):
             ''',
             (user_id, mood, score, note, activities, is_public)
         )
-        db.commit()
         
         # Get the created mood
         cursor.execute(
@@ -113,169 +248,593 @@ def create_mood(user_id, mood_data):
         )
         mood = cursor.fetchone()
         
-        # Convert to dict
-        mood_dict = dict(mood)
+        # Update the daily rollup in the same transaction
+        add_to_rollup(cursor, user_id, mood['created_at'], mood['mood'], mood['score'])
+        db.commit()
+        invalidate_mood_analytics(user_id)
         
-        # Parse activities from JSON string
-        try:
-            mood_dict['activities'] = json.loads(mood_dict['activities'])
-        except:
-            mood_dict['activities'] = []
+        mood_dict = mood_to_dict(mood)
         
-        # Convert is_public to boolean
-        mood_dict['is_public'] = bool(mood_dict['is_public'])
+        # Keep the in-memory public feed in step
+        sync_public_feed(mood_dict)
         
         return mood_dict
     except Exception as e:
         logger.error(f"Error creating mood: {str(e)}")
         return None
 
-def get_user_moods(user_id, limit=50):
-    """Get mood history for a user"""
+def validate_mood_input(mood_data):
+    """Error message for an unusable mood input, or None if it can be inserted"""
+    if not isinstance(mood_data, dict):
+        return 'Mood must be an object'
+    
+    mood = mood_data.get('mood')
+    if not isinstance(mood, str) or not mood:
+        return 'mood is required'
+    
+    score = mood_data.get('score')
+    if not isinstance(score, int) or isinstance(score, bool):
+        return 'score must be an integer'
+    
+    note = mood_data.get('note')
+    if note is not None and not isinstance(note, str):
+        return 'note must be a string'
+    
+    activities = mood_data.get('activities')
+    if activities is not None and not (
+        isinstance(activities, list) and all(isinstance(a, str) for a in activities)
+    ):
+        return 'activities must be a list of strings'
+    
+    return None
+
+def create_moods(user_id, inputs):
+    """Create a batch of mood entries in one transaction.
+    
+    Returns one result per input, in input order: {'index', 'mood'} for a
+    created mood or {'index', 'error'} for one that was rejected. Invalid
+    inputs don't stop the rest of the batch; a database error fails every
+    valid input, since none of them is committed.
+    """
+    results = [{'index': index, 'mood': None, 'error': None} for index in range(len(inputs))]
+    
+    rows = []
+    valid = []
+    for index, mood_data in enumerate(inputs):
+        error = validate_mood_input(mood_data)
+        if error:
+            results[index]['error'] = error
+            continue
+        rows.append((
+            user_id,
+            mood_data['mood'],
+            mood_data['score'],
+            mood_data.get('note'),
+            json.dumps(mood_data.get('activities') or []),
+            1 if mood_data.get('isPublic', False) else 0
+        ))
+        valid.append(index)
+    
+    if not rows:
+        return results
+    
     db = get_db()
     cursor = db.cursor()
     
     try:
-        cursor.execute(
+        cursor.executemany(
             '''
-            SELECT * FROM moods 
-            WHERE user_id = ? 
-            ORDER BY created_at DESC
-            LIMIT ?
+            INSERT INTO moods (user_id, mood, score, note, activities, is_public)
+            VALUES (?, ?, ?, ?, ?, ?)
             ''',
-            (user_id, limit)
+            rows
         )
-        moods = cursor.fetchall()
         
-        # Convert to list of dicts
-        mood_list = []
-        for mood in moods:
-            mood_dict = dict(mood)
-            
-            # Parse activities from JSON string
-            try:
-                mood_dict['activities'] = json.loads(mood_dict['activities'])
-            except:
-                mood_dict['activities'] = []
-            
-            # Convert is_public to boolean
-            mood_dict['is_public'] = bool(mood_dict['is_public'])
-            
-            mood_list.append(mood_dict)
+        # This transaction holds the write lock and ids only grow
+        # (AUTOINCREMENT), so the newest len(rows) moods are this batch
+        cursor.execute(
+            'SELECT * FROM moods WHERE user_id = ? ORDER BY id DESC LIMIT ?',
+            (user_id, len(rows))
+        )
+        moods = cursor.fetchall()
+        moods.reverse()
         
-        return mood_list
+        # Update the daily rollups in the same transaction
+        add_to_rollups(cursor, [
+            (user_id, mood['created_at'], mood['mood'], mood['score']) for mood in moods
+        ])
+        db.commit()
     except Exception as e:
-        logger.error(f"Error getting user moods: {str(e)}")
-        return []
+        db.rollback()
+        logger.error(f"Error creating mood batch: {str(e)}")
+        for index in valid:
+            results[index]['error'] = 'Failed to create mood'
+        return results
+    
+    invalidate_mood_analytics(user_id)
+    
+    for index, mood in zip(valid, moods):
+        results[index]['mood'] = mood_to_dict(mood)
+    
+    # Keep the in-memory public feed in step
+    sync_public_feed(*(results[index]['mood'] for index in valid))
+    
+    return results
 
-def get_public_moods(limit=20):
-    """Get public moods feed"""
+def get_user_moods(user_id, limit=50, after=None):
+    """Get a page of a user's mood history, newest first, starting after the cursor after"""
+    size = page_size(limit, 50)
+    cursor_key = decode_cursor(after) if after else None
+    
     db = get_db()
     cursor = db.cursor()
     
     try:
-        cursor.execute(
-            '''
-            SELECT m.*, u.username, u.display_name, u.avatar_url 
-            FROM moods m
-            LEFT JOIN user_profiles u ON m.user_id = u.id
-            WHERE m.is_public = 1
-            ORDER BY m.created_at DESC
-            LIMIT ?
-            ''',
-            (limit,)
-        )
-        moods = cursor.fetchall()
+        if cursor_key:
+            cursor.execute(
+                '''
+                SELECT * FROM moods
+                WHERE user_id = ? AND (created_at, id) < (?, ?)
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                ''',
+                (user_id, *cursor_key, size + 1)
+            )
+        else:
+            cursor.execute(
+                '''
+                SELECT * FROM moods
+                WHERE user_id = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                ''',
+                (user_id, size + 1)
+            )
         
-        # Convert to list of dicts
-        mood_list = []
-        for mood in moods:
-            mood_dict = dict(mood)
-            
-            # Parse activities from JSON string
-            try:
-                mood_dict['activities'] = json.loads(mood_dict['activities'])
-            except:
-                mood_dict['activities'] = []
-            
-            # Convert is_public to boolean
-            mood_dict['is_public'] = bool(mood_dict['is_public'])
-            
-            mood_list.append(mood_dict)
+        return build_page([mood_to_dict(mood) for mood in cursor.fetchall()], size)
+    except Exception as e:
+        logger.error(f"Error getting user moods: {str(e)}")
+        return EMPTY_PAGE
+
+def get_public_moods(limit=20, before=None):
+    """Get public moods feed, newest first, optionally only moods older than the id before"""
+    if limit <= 0:
+        return []
+    
+    try:
+        ensure_public_feed_loaded()
+        moods, more, older_than = public_feed.page(limit, before)
         
-        return mood_list
+        # Past the oldest buffered mood; the rest of the page comes from SQLite
+        if more:
+            moods += get_public_moods_from_db(limit - len(moods), older_than)
+        
+        return moods
     except Exception as e:
         logger.error(f"Error getting public moods: {str(e)}")
         return []
 
-def get_mood_analytics(user_id, time_range=30):
-    """Generate mood analytics for a user"""
-    # Check for cached analytics
+def get_public_moods_from_db(limit, before=None):
+    """Public moods older than the id before, read from SQLite with authors attached"""
     db = get_db()
     cursor = db.cursor()
     
-    try:
+    if before is None:
         cursor.execute(
-            '''
-            SELECT data, updated_at FROM mood_analytics_cache
-            WHERE user_id = ? AND time_range = ?
-            ''',
-            (user_id, time_range)
+            'SELECT * FROM moods WHERE is_public = 1 ORDER BY id DESC LIMIT ?',
+            (limit,)
         )
-        cached = cursor.fetchone()
-        
-        # Check if cache is fresh (less than 1 hour old)
-        if cached:
-            cache_time = datetime.strptime(cached['updated_at'], '%Y-%m-%d %H:%M:%S')
-            if datetime.utcnow() - cache_time < timedelta(hours=1):
-                return json.loads(cached['data'])
-        
-        # Get mood history for the time range
-        now = datetime.utcnow()
-        start_date = now - timedelta(days=time_range)
-        
+    else:
         cursor.execute(
-            '''
-            SELECT * FROM moods
-            WHERE user_id = ? AND created_at >= ?
-            ORDER BY created_at
-            ''',
-            (user_id, start_date.strftime('%Y-%m-%d %H:%M:%S'))
+            'SELECT * FROM moods WHERE is_public = 1 AND id < ? ORDER BY id DESC LIMIT ?',
+            (before, limit)
         )
-        moods = cursor.fetchall()
-        
-        # Convert to list of dicts
-        mood_list = []
-        for mood in moods:
-            mood_dict = dict(mood)
+    
+    moods = [mood_to_dict(row) for row in cursor.fetchall()]
+    attach_authors(moods)
+    return moods
+
+def mood_to_dict(row):
+    """Convert a moods row to the dict shape the APIs return"""
+    mood_dict = dict(row)
+    
+    # Parse activities from JSON string
+    try:
+        mood_dict['activities'] = json.loads(mood_dict['activities'])
+    except:
+        mood_dict['activities'] = []
+    
+    # Convert is_public to boolean
+    mood_dict['is_public'] = bool(mood_dict['is_public'])
+    
+    return mood_dict
+
+def attach_authors(moods):
+    """Denormalize author username, display_name and avatar_url into mood dicts"""
+    profiles = user_profiles.fetch(mood['user_id'] for mood in moods)
+    for mood in moods:
+        profile = profiles.get(str(mood['user_id'])) or {}
+        mood['username'] = profile.get('username')
+        mood['display_name'] = profile.get('display_name')
+        mood['avatar_url'] = profile.get('avatar_url')
+
+class PublicFeed:
+    """The newest public moods, kept in memory for the feed.
+
+    A fixed-capacity ring buffer of mood dicts (authors attached) in id
+    order; the oldest entry is overwritten when a new one arrives. Pages are
+    cut with a binary search on id, so a read costs O(log n + limit).
+    Removed moods leave an empty slot that reads skip.
+    """
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.loaded = False
+        self._slots = [None] * capacity
+        self._ids = [0] * capacity
+        self._start = 0
+        self._size = 0
+        # True when older public moods may exist in SQLite beyond the oldest buffered one
+        self._truncated = False
+        self._lock = threading.Lock()
+    
+    def load(self, moods):
+        """Replace the contents with moods (oldest first)"""
+        with self._lock:
+            self._fill(moods[-self.capacity:], truncated=len(moods) >= self.capacity)
+            self.loaded = True
+    
+    def _fill(self, moods, truncated):
+        self._slots = [None] * self.capacity
+        self._ids = [0] * self.capacity
+        for i, mood in enumerate(moods):
+            self._slots[i] = mood
+            self._ids[i] = mood['id']
+        self._start = 0
+        self._size = len(moods)
+        self._truncated = truncated
+    
+    def _index(self, position):
+        return (self._start + position) % self.capacity
+    
+    def _position(self, mood_id):
+        """First logical position whose id is >= mood_id"""
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._ids[self._index(mid)] < mood_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+    
+    def put(self, mood):
+        """Add a public mood, or replace the buffered copy with the same id"""
+        mood_id = mood['id']
+        if not self.capacity:
+            return
+        with self._lock:
+            if self._size == 0 or mood_id > self._ids[self._index(self._size - 1)]:
+                # Newest mood: the common case
+                index = self._index(self._size)
+                self._slots[index] = mood
+                self._ids[index] = mood_id
+                if self._size == self.capacity:
+                    self._start = self._index(1)
+                    self._truncated = True
+                else:
+                    self._size += 1
+                return
             
-            # Parse activities from JSON string
-            try:
-                mood_dict['activities'] = json.loads(mood_dict['activities'])
-            except:
-                mood_dict['activities'] = []
+            position = self._position(mood_id)
+            if position < self._size and self._ids[self._index(position)] == mood_id:
+                self._slots[self._index(position)] = mood
+                return
+            if position == 0 and self._truncated:
+                # Older than everything buffered; reads past the buffer go to SQLite anyway
+                return
             
-            # Convert is_public to boolean
-            mood_dict['is_public'] = bool(mood_dict['is_public'])
+            # An older mood made public again: rebuild in order (rare)
+            moods = [self._slots[self._index(i)] for i in range(self._size)]
+            moods = [m for m in moods[:position] + [mood] + moods[position:] if m is not None]
+            self._fill(moods[-self.capacity:], truncated=self._truncated or len(moods) > self.capacity)
+    
+    def remove(self, mood_id):
+        with self._lock:
+            position = self._position(mood_id)
+            if position < self._size and self._ids[self._index(position)] == mood_id:
+                self._slots[self._index(position)] = None
+    
+    def page(self, limit, before=None):
+        """Up to limit moods newest first (ids below before, if given).
+
+        Returns (moods, more, older_than): more is True when the page ran past
+        the oldest buffered mood and older ones may be in SQLite, where the
+        page continues with ids below older_than (None: from the newest).
+        """
+        moods = []
+        with self._lock:
+            position = self._size if before is None else self._position(before)
+            while position > 0 and len(moods) < limit:
+                position -= 1
+                mood = self._slots[self._index(position)]
+                if mood is not None:
+                    moods.append(mood)
             
-            mood_list.append(mood_dict)
+            if len(moods) < limit and self._truncated:
+                older_than = before
+                if self._size:
+                    oldest = self._ids[self._index(0)]
+                    older_than = oldest if before is None else min(before, oldest)
+                return moods, True, older_than
+            return moods, False, None
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self._size,
+                'capacity': self.capacity,
+                'loaded': self.loaded,
+                'truncated': self._truncated
+            }
+
+public_feed = PublicFeed(PUBLIC_FEED_SIZE)
+public_feed_load_lock = threading.Lock()
+
+def ensure_public_feed_loaded():
+    """Fill the feed from SQLite on first use (startup calls this too)"""
+    if public_feed.loaded:
+        return
+    with public_feed_load_lock:
+        if not public_feed.loaded:
+            moods = get_public_moods_from_db(PUBLIC_FEED_SIZE)
+            moods.reverse()
+            public_feed.load(moods)
+            logger.info(f"Loaded {len(moods)} public moods into the feed")
+
+def sync_public_feed(*mood_dicts):
+    """Reflect created or updated moods in the in-memory feed (call after commit)"""
+    entries = []
+    for mood_dict in mood_dicts:
+        if mood_dict['is_public']:
+            entries.append(dict(mood_dict))
+        else:
+            public_feed.remove(mood_dict['id'])
+    
+    if not entries:
+        return
+    
+    # One user service lookup covers the whole batch
+    attach_authors(entries)
+    # Before loading, the feed will read committed moods from SQLite itself
+    with public_feed_load_lock:
+        if public_feed.loaded:
+            for entry in entries:
+                public_feed.put(entry)
+
+def rollup_bucket(created_at):
+    """(day, period) rollup bucket for a 'YYYY-MM-DD HH:MM:SS' timestamp"""
+    return created_at[:10], HOUR_PERIODS[int(created_at[11:13])]
+
+def add_to_rollup(cursor, user_id, created_at, mood, score):
+    """Count one mood entry into its daily rollup row"""
+    add_to_rollups(cursor, [(user_id, created_at, mood, score)])
+
+def add_to_rollups(cursor, entries):
+    """Count (user_id, created_at, mood, score) entries into their daily rollup rows"""
+    cursor.executemany(
+        '''
+        INSERT INTO mood_rollups (user_id, day, period, mood, count, score_sum, first_at)
+        VALUES (?, ?, ?, ?, 1, ?, ?)
+        ON CONFLICT (user_id, day, period, mood) DO UPDATE SET
+            count = count + 1,
+            score_sum = score_sum + excluded.score_sum,
+            first_at = MIN(first_at, excluded.first_at)
+        ''',
+        [
+            (user_id,) + rollup_bucket(created_at) + (mood, score, created_at)
+            for user_id, created_at, mood, score in entries
+        ]
+    )
+
+def remove_from_rollup(cursor, user_id, created_at, mood, score):
+    """Take one mood entry back out of its daily rollup row.
+
+    Must run after the moods row itself has been changed or deleted, since
+    first_at is recomputed from the entries left in the bucket.
+    """
+    day, period = rollup_bucket(created_at)
+    key = (user_id, day, period, mood)
+    cursor.execute(
+        '''
+        UPDATE mood_rollups SET count = count - 1, score_sum = score_sum - ?
+        WHERE user_id = ? AND day = ? AND period = ? AND mood = ?
+        ''',
+        (score,) + key
+    )
+    cursor.execute(
+        '''
+        DELETE FROM mood_rollups
+        WHERE user_id = ? AND day = ? AND period = ? AND mood = ? AND count <= 0
+        ''',
+        key
+    )
+    cursor.execute(
+        f'''
+        UPDATE mood_rollups SET first_at = (
+            SELECT MIN(created_at) FROM moods
+            WHERE user_id = ? AND mood = ?
+            AND created_at >= ? AND created_at < ?
+            AND {PERIOD_SQL} = ?
+        )
+        WHERE user_id = ? AND day = ? AND period = ? AND mood = ? AND first_at = ?
+        ''',
+        (user_id, mood, day, next_day(day), period) + key + (created_at,)
+    )
+
+def next_day(day):
+    """The 'YYYY-MM-DD' day after the given one"""
+    return (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+class MoodAggregate:
+    """Running per-bucket totals that mood analytics are computed from.
+
+    Fed one mood at a time (add_mood), as parsed columns of many moods
+    (add_columns) or with pre-summed rollup rows (add); all produce the same
+    analytics for the same entries.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self.score_sum = 0
+        self.frequency = {}
+        self.by_day = {day: {'count': 0, 'score_sum': 0, 'moods': {}} for day in DAYS_OF_WEEK}
+        self.by_time = {period: {'count': 0, 'score_sum': 0, 'moods': {}} for period in TIME_PERIODS}
+        self.entries_per_date = {}
+        self._weekdays = {}
+    
+    @classmethod
+    def from_moods(cls, moods):
+        """Aggregate a list of moods, vectorized when NumPy is available"""
+        aggregate = cls()
+        if np is not None and len(moods) >= ANALYTICS_VECTOR_MIN:
+            columns = mood_columns(moods)
+            if columns is not None:
+                aggregate.add_columns(*columns)
+                return aggregate
         
-        # Generate analytics
-        analytics = generate_mood_analytics(user_id, mood_list, time_range)
+        for mood in moods:
+            aggregate.add_mood(mood)
+        return aggregate
+    
+    def weekday(self, day):
+        """Day-of-week name for a 'YYYY-MM-DD' day"""
+        weekday = self._weekdays.get(day)
+        if weekday is None:
+            weekday = self._weekdays[day] = DAYS_OF_WEEK[datetime.strptime(day, '%Y-%m-%d').weekday()]
+        return weekday
+    
+    def add(self, mood, count, score_sum, day, period, weekday=None):
+        """Add count entries of one mood from the same day and time-of-day period"""
+        weekday = weekday or self.weekday(day)
+        self.count += count
+        self.score_sum += score_sum
+        self.frequency[mood] = self.frequency.get(mood, 0) + count
+        self.entries_per_date[day] = self.entries_per_date.get(day, 0) + count
         
-        # Cache the analytics
-        analytics_json = json.dumps(analytics)
-        cursor.execute(
-            '''
-            INSERT OR REPLACE INTO mood_analytics_cache
-            (user_id, time_range, data, updated_at)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-            ''',
-            (user_id, time_range, analytics_json)
-        )
-        db.commit()
+        for data in (self.by_day[weekday], self.by_time[period]):
+            data['count'] += count
+            data['score_sum'] += score_sum
+            data['moods'][mood] = data['moods'].get(mood, 0) + count
+    
+    def add_mood(self, mood):
+        """Add a single mood entry (dict or row with mood, score, created_at)"""
+        try:
+            day, period = rollup_bucket(mood['created_at'])
+            weekday = self.weekday(day)
+        except Exception as e:
+            logger.error(f"Error processing mood date: {str(e)}")
+            self.count += 1
+            self.score_sum += mood['score']
+            self.frequency[mood['mood']] = self.frequency.get(mood['mood'], 0) + 1
+            return
+        self.add(mood['mood'], 1, mood['score'], day, period, weekday)
+    
+    def add_columns(self, names, codes, scores, days, day_index, weekdays, periods):
+        """Add many moods at once from the columns built by mood_columns()"""
+        self.count += len(codes)
+        self.score_sum += int(scores.sum())
         
-        return analytics
+        for name, count in zip(names, np.bincount(codes, minlength=len(names)).tolist()):
+            self.frequency[name] = self.frequency.get(name, 0) + count
+        for day, count in zip(days, np.bincount(day_index, minlength=len(days)).tolist()):
+            self.entries_per_date[day] = self.entries_per_date.get(day, 0) + count
+        
+        self._add_grouped(self.by_day, DAYS_OF_WEEK, weekdays, names, codes, scores)
+        self._add_grouped(self.by_time, PERIOD_NAMES, periods, names, codes, scores)
+    
+    def _add_grouped(self, buckets, bucket_names, groups, names, codes, scores):
+        """Count (bucket, mood) pairs with one bincount over combined keys"""
+        width = len(names)
+        keys = groups * width + codes
+        size = len(bucket_names) * width
+        counts = np.bincount(keys, minlength=size)
+        score_sums = np.zeros(size, dtype=np.int64)
+        np.add.at(score_sums, keys, scores)
+        
+        # Visit pairs in first-seen order so each bucket's mood dict matches a sequential pass
+        present, first_seen = np.unique(keys, return_index=True)
+        for key in present[np.argsort(first_seen, kind='stable')].tolist():
+            group, code = divmod(key, width)
+            data = buckets[bucket_names[group]]
+            data['count'] += int(counts[key])
+            data['score_sum'] += int(score_sums[key])
+            name = names[code]
+            data['moods'][name] = data['moods'].get(name, 0) + int(counts[key])
+
+def mood_columns(moods):
+    """Parse moods once into NumPy columns for MoodAggregate.add_columns.
+
+    Moods are numbered in first-seen order; timestamps are decoded from
+    their character codes rather than with strptime. Returns None when the
+    input is irregular (non-integer scores, timestamps that are not plain
+    'YYYY-MM-DD HH:MM:SS'), leaving it to the per-mood path to report.
+    """
+    count = len(moods)
+    names = {}
+    codes = np.fromiter((names.setdefault(mood['mood'], len(names)) for mood in moods), dtype=np.int64, count=count)
+    scores = np.array([mood['score'] for mood in moods])
+    if scores.dtype.kind != 'i':
+        return None
+    
+    try:
+        stamps = np.array([mood['created_at'] for mood in moods], dtype='U20')
+    except (TypeError, ValueError):
+        return None
+    chars = stamps.view(np.uint32).reshape(count, 20).astype(np.int64)
+    digits = chars[:, TIMESTAMP_DIGITS] - ord('0')
+    if ((digits < 0) | (digits > 9)).any() or (chars[:, TIMESTAMP_SEPARATORS] != TIMESTAMP_SEPARATOR_CODES).any():
+        return None
+    
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    day_keys = year * 10000 + (digits[:, 4] * 10 + digits[:, 5]) * 100 + digits[:, 6] * 10 + digits[:, 7]
+    hours = digits[:, 8] * 10 + digits[:, 9]
+    if (hours > 23).any():
+        return None
+    
+    # Calendar work only for the distinct days
+    unique_days, day_index = np.unique(day_keys, return_inverse=True)
+    try:
+        dates = [date(key // 10000, key // 100 % 100, key % 100) for key in unique_days.tolist()]
+    except ValueError:
+        return None
+    weekdays = np.array([d.weekday() for d in dates], dtype=np.int64)[day_index]
+    periods = np.asarray(HOUR_PERIOD_INDEX, dtype=np.int64)[hours]
+    
+    return list(names), codes, scores.astype(np.int64), [d.isoformat() for d in dates], day_index, weekdays, periods
+
+def get_mood_analytics(user_id, time_range=30):
+    """Generate mood analytics for a user"""
+    key = (user_id, time_range)
+    
+    try:
+        # Tier 1: decoded analytics in memory
+        entry = analytics_cache.get(key)
+        if entry is not None:
+            now = time.time()
+            if now >= entry.expires_at:
+                # Past its expiry but inside the stale window: serve it while one refresh runs
+                analytics_db_stats['stale'] += 1
+                refresh_mood_analytics_in_background(user_id, time_range)
+            elif should_refresh_early(entry, now):
+                refresh_mood_analytics_in_background(user_id, time_range)
+            return entry.analytics
+        
+        # Tier 2 or a fresh computation, once however many requests are waiting for this key
+        return analytics_flight.do(
+            analytics_flight_key(user_id, time_range),
+            lambda: load_or_refresh_mood_analytics(user_id, time_range)
+        )
     except Exception as e:
         logger.error(f"Error generating mood analytics: {str(e)}")
         return {
@@ -284,8 +843,324 @@ def get_mood_analytics(user_id, time_range=30):
             'error': str(e)
         }
 
+def load_cached_mood_analytics(user_id, time_range):
+    """Analytics from mood_analytics_cache if still fresh (promoted to memory), else None"""
+    generation = analytics_generations.get(user_id, 0)
+    cursor = get_db().cursor()
+    cursor.execute(
+        '''
+        SELECT data, updated_at FROM mood_analytics_cache
+        WHERE user_id = ? AND time_range = ?
+        ''',
+        (user_id, time_range)
+    )
+    cached = cursor.fetchone()
+    
+    if cached:
+        computed_at = (datetime.strptime(cached['updated_at'], '%Y-%m-%d %H:%M:%S') - datetime(1970, 1, 1)).total_seconds()
+        if analytics_expiry(computed_at) > time.time():
+            analytics_db_stats['hits'] += 1
+            analytics = json.loads(cached['data'])
+            store_mood_analytics(user_id, time_range, analytics, generation, persist=False, computed_at=computed_at)
+            return analytics
+    analytics_db_stats['misses'] += 1
+    return None
+
+def refresh_mood_analytics(user_id, time_range):
+    """Compute analytics from the rollups and cache them in both tiers"""
+    generation = analytics_generations.get(user_id, 0)
+    started = time.monotonic()
+    
+    aggregate = load_mood_aggregate(get_db().cursor(), user_id, time_range)
+    analytics = build_mood_analytics(user_id, time_range, aggregate)
+    
+    store_mood_analytics(user_id, time_range, analytics, generation, compute_time=time.monotonic() - started)
+    return analytics
+
+def load_or_refresh_mood_analytics(user_id, time_range):
+    """Analytics for a memory-tier miss: from mood_analytics_cache, else freshly computed"""
+    # A computation that finished just before this call may already have cached a result
+    entry = analytics_cache.peek((user_id, time_range))
+    if entry is not None and entry.expires_at > time.time():
+        return entry.analytics
+    
+    analytics = load_cached_mood_analytics(user_id, time_range)
+    if analytics is not None:
+        return analytics
+    return refresh_mood_analytics(user_id, time_range)
+
+def analytics_flight_key(user_id, time_range):
+    # The generation is part of the key so callers arriving after a write never join a pre-write computation
+    return (user_id, time_range, analytics_generations.get(user_id, 0))
+
+def refresh_mood_analytics_in_background(user_id, time_range):
+    """Start a background refresh unless one is already running for the key"""
+    flight_key = analytics_flight_key(user_id, time_range)
+    if analytics_flight.in_flight(flight_key):
+        return
+    
+    def refresh():
+        try:
+            analytics_flight.do(flight_key, lambda: refresh_mood_analytics(user_id, time_range))
+        except Exception as e:
+            logger.error(f"Error refreshing mood analytics for user {user_id}: {str(e)}")
+    
+    analytics_refresh_executor.submit(refresh)
+
+def should_refresh_early(entry, now):
+    """Probabilistic early expiration (XFetch): likelier as expiry nears, and for slower computations"""
+    if not entry.compute_time:
+        return False
+    return now - entry.compute_time * ANALYTICS_EARLY_REFRESH_BETA * math.log(1.0 - random.random()) >= entry.expires_at
+
+def analytics_expiry(computed_at):
+    """When analytics computed at computed_at (epoch seconds) stop being fresh.
+
+    The time window slides with the clock, so results are refreshed every
+    ANALYTICS_REFRESH_INTERVAL, and never outlive the UTC day ('today' drives
+    the streak) they were computed on.
+    """
+    midnight = (computed_at // 86400 + 1) * 86400
+    return min(computed_at + ANALYTICS_REFRESH_INTERVAL, midnight)
+
+def store_mood_analytics(user_id, time_range, analytics, generation, persist=True, computed_at=None, compute_time=0.0):
+    """Cache analytics in memory and, if persist, in mood_analytics_cache.
+
+    Skipped when the user's moods changed after generation was read, so a
+    computation that raced with a write cannot cache pre-write results.
+    """
+    now = time.time()
+    expires_at = analytics_expiry(now if computed_at is None else computed_at)
+    entry = CachedAnalytics(analytics, expires_at, compute_time)
+    
+    with analytics_lock:
+        if analytics_generations.get(user_id, 0) != generation:
+            return False
+        
+        # Kept past expiry for the stale-while-revalidate window
+        analytics_cache.set((user_id, time_range), entry, ttl=expires_at - now + ANALYTICS_STALE_SECONDS)
+        analytics_ranges.setdefault(user_id, set()).add(time_range)
+        
+        if persist:
+            db = get_db()
+            db.execute(
+                '''
+                INSERT OR REPLACE INTO mood_analytics_cache
+                (user_id, time_range, data, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ''',
+                (user_id, time_range, json.dumps(analytics))
+            )
+            db.commit()
+    return True
+
+def invalidate_mood_analytics(user_id):
+    """Drop a user's cached analytics after their moods changed (call after commit)"""
+    with analytics_lock:
+        analytics_generations[user_id] = analytics_generations.get(user_id, 0) + 1
+        for time_range in analytics_ranges.pop(user_id, ()):
+            analytics_cache.delete((user_id, time_range))
+    
+    db = get_db()
+    db.execute('DELETE FROM mood_analytics_cache WHERE user_id = ?', (user_id,))
+    db.commit()
+    
+    # Writers are the users most likely to look at their analytics next
+    analytics_scheduler.touch(user_id)
+
+def compute_analytics_job(user_id, time_ranges):
+    """Compute a user's analytics for several time ranges (runs in a worker process)"""
+    with database.connection() as db:
+        cursor = db.cursor()
+        return {
+            time_range: build_mood_analytics(user_id, time_range, load_mood_aggregate(cursor, user_id, time_range))
+            for time_range in time_ranges
+        }
+
+class AnalyticsScheduler:
+    """Precomputes analytics for recently active users off the request path.
+
+    Mood writes touch() the user. A background thread hands the most recently
+    active pending user to a process pool (or computes inline when there are
+    no workers) and caches the results through store_mood_analytics(), so the
+    next dashboard read is a cache hit. After each job the scheduler rests long
+    enough to keep its busy share of wall time within cpu_budget.
+    """
+    
+    def __init__(self, time_ranges, workers=2, cpu_budget=0.5, max_pending=10000):
+        self.time_ranges = tuple(time_ranges)
+        self.workers = workers
+        self.cpu_budget = min(max(cpu_budget, 0.01), 1.0)
+        self.max_pending = max_pending
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._pending = OrderedDict()  # user_id -> first touch time, most recently active last
+        self._in_flight = set()
+        self._resume_at = 0.0
+        self._cond = threading.Condition()
+        self._executor = None
+        self._thread = None
+    
+    def start(self):
+        if self._thread is not None:
+            return
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        self._thread = threading.Thread(target=self._run, name='analytics-scheduler', daemon=True)
+        self._thread.start()
+        logger.info(f"Analytics scheduler started ({self.workers} workers, ranges {self.time_ranges})")
+    
+    def touch(self, user_id):
+        """Queue a user for recomputation, ahead of less recently active users"""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._pending[user_id] = self._pending.get(user_id, time.time())
+            self._pending.move_to_end(user_id)
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+                self.dropped += 1
+            self._cond.notify()
+    
+    def _next(self):
+        """Block until a worker slot is free, then take the most recently active user"""
+        slots = max(self.workers, 1)
+        with self._cond:
+            while True:
+                rest = self._resume_at - time.monotonic()
+                if rest > 0:
+                    self._cond.wait(rest)
+                    continue
+                if len(self._in_flight) < slots:
+                    # Users already being computed stay queued until their job finishes
+                    for user_id in reversed(self._pending):
+                        if user_id not in self._in_flight:
+                            self._in_flight.add(user_id)
+                            return user_id, self._pending.pop(user_id)
+                self._cond.wait()
+    
+    def _run(self):
+        while True:
+            user_id, touched = self._next()
+            generation = analytics_generations.get(user_id, 0)
+            started = time.monotonic()
+            
+            if self._executor is None:
+                try:
+                    results = compute_analytics_job(user_id, self.time_ranges)
+                except Exception as e:
+                    results = e
+                self._finish(user_id, touched, generation, started, results)
+                continue
+            
+            try:
+                future = self._executor.submit(compute_analytics_job, user_id, self.time_ranges)
+            except Exception as e:
+                self._finish(user_id, touched, generation, started, e)
+                continue
+            future.add_done_callback(
+                lambda f, user_id=user_id, touched=touched, generation=generation, started=started:
+                    self._finish(user_id, touched, generation, started, f.exception() or f.result())
+            )
+    
+    def _finish(self, user_id, touched, generation, started, results):
+        elapsed = time.monotonic() - started
+        
+        if isinstance(results, Exception):
+            logger.error(f"Error precomputing analytics for user {user_id}: {str(results)}")
+        else:
+            # A write since dispatch bumps the generation and requeues the user, so stale results are dropped
+            for time_range, analytics in results.items():
+                try:
+                    store_mood_analytics(user_id, time_range, analytics, generation, compute_time=elapsed / len(results))
+                except Exception as e:
+                    results = e
+                    logger.error(f"Error storing precomputed analytics for user {user_id}: {str(e)}")
+                    break
+        
+        lag = time.time() - touched
+        with self._cond:
+            self._in_flight.discard(user_id)
+            if isinstance(results, Exception):
+                self.failed += 1
+            else:
+                self.completed += 1
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+            self._resume_at = max(self._resume_at, time.monotonic() + elapsed * (1 - self.cpu_budget) / self.cpu_budget)
+            self._cond.notify_all()
+    
+    def stats(self):
+        with self._cond:
+            oldest = min(self._pending.values(), default=None)
+            return {
+                'running': self._thread is not None,
+                'workers': self.workers,
+                'queueDepth': len(self._pending),
+                'inFlight': len(self._in_flight),
+                'oldestPendingSeconds': round(time.time() - oldest, 3) if oldest is not None else 0,
+                'lastLagSeconds': round(self.last_lag, 3),
+                'maxLagSeconds': round(self.max_lag, 3),
+                'completed': self.completed,
+                'failed': self.failed,
+                'dropped': self.dropped
+            }
+
+analytics_scheduler = AnalyticsScheduler(
+    ANALYTICS_PRECOMPUTE_RANGES,
+    workers=ANALYTICS_WORKERS,
+    cpu_budget=ANALYTICS_CPU_BUDGET,
+    max_pending=ANALYTICS_QUEUE_SIZE
+)
+
+def load_mood_aggregate(cursor, user_id, time_range):
+    """Aggregate a user's moods over the last time_range days.
+
+    Whole days come from mood_rollups (a handful of rows per day). The first
+    day of the window is only partly inside it, so its entries are read from
+    moods directly, which the (user_id, created_at) index keeps cheap.
+    """
+    start = (datetime.utcnow() - timedelta(days=time_range)).strftime('%Y-%m-%d %H:%M:%S')
+    start_day = start[:10]
+    aggregate = MoodAggregate()
+    
+    cursor.execute(
+        '''
+        SELECT mood, score, created_at FROM moods
+        WHERE user_id = ? AND created_at >= ? AND created_at < ?
+        ORDER BY created_at
+        ''',
+        (user_id, start, next_day(start_day))
+    )
+    for row in cursor.fetchall():
+        aggregate.add_mood(row)
+    
+    # Ordered by first entry so mood frequency keeps first-seen order
+    cursor.execute(
+        '''
+        SELECT day, period, mood, count, score_sum FROM mood_rollups
+        WHERE user_id = ? AND day > ?
+        ORDER BY first_at
+        ''',
+        (user_id, start_day)
+    )
+    for row in cursor.fetchall():
+        aggregate.add(row['mood'], row['count'], row['score_sum'], row['day'], row['period'])
+    
+    return aggregate
+
 def generate_mood_analytics(user_id, moods, time_range):
-    """Generate detailed mood analytics"""
+    """Generate detailed mood analytics from a list of moods"""
+    return build_mood_analytics(user_id, time_range, MoodAggregate.from_moods(moods))
+
+def build_mood_analytics(user_id, time_range, aggregate):
+    """Generate detailed mood analytics from a MoodAggregate"""
     # Prepare result object
     analytics = {
         'userId': user_id,
@@ -294,32 +1169,23 @@ def generate_mood_analytics(user_id, moods, time_range):
         'moodByDayOfWeek': {},
         'moodByTimeOfDay': {},
         'averageScore': 0,
-        'streak': calculate_mood_streak(moods),
+        'streak': calculate_mood_streak(aggregate.entries_per_date),
         'insights': [],
         'recommendations': []
     }
     
     # If no moods, return empty analytics
-    if not moods:
+    if not aggregate.count:
         return analytics
     
-    # Calculate mood frequency
-    analytics['moodFrequency'] = calculate_mood_frequency(moods)
-    
-    # Calculate mood by day of week
-    analytics['moodByDayOfWeek'] = calculate_mood_by_day_of_week(moods)
-    
-    # Calculate mood by time of day
-    analytics['moodByTimeOfDay'] = calculate_mood_by_time_of_day(moods)
-    
-    # Calculate average score
-    if moods:
-        total_score = sum(mood['score'] for mood in moods)
-        analytics['averageScore'] = round(total_score / len(moods), 1)
+    analytics['moodFrequency'] = dict(aggregate.frequency)
+    analytics['moodByDayOfWeek'] = with_average_scores(aggregate.by_day)
+    analytics['moodByTimeOfDay'] = with_average_scores(aggregate.by_time)
+    analytics['averageScore'] = round(aggregate.score_sum / aggregate.count, 1)
     
     # Generate insights
     analytics['insights'] = generate_insights(
-        moods,
+        aggregate,
         analytics['moodFrequency'],
         analytics['moodByDayOfWeek'],
         analytics['moodByTimeOfDay'],
@@ -328,7 +1194,7 @@ def generate_mood_analytics(user_id, moods, time_range):
     
     # Generate recommendations
     analytics['recommendations'] = generate_recommendations(
-        moods,
+        aggregate,
         analytics['moodFrequency'],
         analytics['moodByDayOfWeek'],
         analytics['moodByTimeOfDay'],
@@ -337,155 +1203,52 @@ def generate_mood_analytics(user_id, moods, time_range):
     
     return analytics
 
-def calculate_mood_frequency(moods):
-    """Calculate frequency of each mood"""
-    frequency = {}
-    
-    for mood in moods:
-        mood_name = mood['mood']
-        if mood_name in frequency:
-            frequency[mood_name] += 1
-        else:
-            frequency[mood_name] = 1
-    
-    return frequency
-
-def calculate_mood_by_day_of_week(moods):
-    """Calculate mood patterns by day of week"""
-    days = {
-        0: 'Monday',
-        1: 'Tuesday',
-        2: 'Wednesday',
-        3: 'Thursday',
-        4: 'Friday',
-        5: 'Saturday',
-        6: 'Sunday'
-    }
-    
-    # Initialize data structure
-    day_data = {day: {'count': 0, 'score_sum': 0, 'moods': {}} for day in days.values()}
-    
-    # Process moods
-    for mood in moods:
-        try:
-            date = datetime.strptime(mood['created_at'], '%Y-%m-%d %H:%M:%S')
-            day_name = days[date.weekday()]
-            
-            # Update counts and scores
-            day_data[day_name]['count'] += 1
-            day_data[day_name]['score_sum'] += mood['score']
-            
-            # Update mood frequency for this day
-            mood_name = mood['mood']
-            if mood_name in day_data[day_name]['moods']:
-                day_data[day_name]['moods'][mood_name] += 1
-            else:
-                day_data[day_name]['moods'][mood_name] = 1
-        except Exception as e:
-            logger.error(f"Error processing mood date: {str(e)}")
-    
-    # Calculate averages
-    for day, data in day_data.items():
-        if data['count'] > 0:
-            data['average_score'] = round(data['score_sum'] / data['count'], 1)
-        else:
-            data['average_score'] = 0
-    
-    return day_data
-
-def calculate_mood_by_time_of_day(moods):
-    """Calculate mood patterns by time of day"""
-    time_periods = {
-        'Morning': (5, 11),   # 5:00 AM - 11:59 AM
-        'Afternoon': (12, 16), # 12:00 PM - 4:59 PM
-        'Evening': (17, 20),   # 5:00 PM - 8:59 PM
-        'Night': (21, 4)       # 9:00 PM - 4:59 AM
-    }
-    
-    # Initialize data structure
-    time_data = {period: {'count': 0, 'score_sum': 0, 'moods': {}} for period in time_periods.keys()}
-    
-    # Process moods
-    for mood in moods:
-        try:
-            date = datetime.strptime(mood['created_at'], '%Y-%m-%d %H:%M:%S')
-            hour = date.hour
-            
-            # Determine time period
-            period = None
-            for p, (start, end) in time_periods.items():
-                if start <= end:
-                    if start <= hour <= end:
-                        period = p
-                        break
-                else:  # Handle night (wraps around from 21 to 4)
-                    if hour >= start or hour <= end:
-                        period = p
-                        break
-            
-            if not period:
-                continue
-            
-            # Update counts and scores
-            time_data[period]['count'] += 1
-            time_data[period]['score_sum'] += mood['score']
-            
-            # Update mood frequency for this time period
-            mood_name = mood['mood']
-            if mood_name in time_data[period]['moods']:
-                time_data[period]['moods'][mood_name] += 1
-            else:
-                time_data[period]['moods'][mood_name] = 1
-        except Exception as e:
-            logger.error(f"Error processing mood time: {str(e)}")
-    
-    # Calculate averages
-    for period, data in time_data.items():
-        if data['count'] > 0:
-            data['average_score'] = round(data['score_sum'] / data['count'], 1)
-        else:
-            data['average_score'] = 0
-    
-    return time_data
+def with_average_scores(buckets):
+    """Copy of day/time buckets with average_score filled in"""
+    result = {}
+    for name, data in buckets.items():
+        result[name] = {
+            'count': data['count'],
+            'score_sum': data['score_sum'],
+            'moods': dict(data['moods']),
+            'average_score': round(data['score_sum'] / data['count'], 1) if data['count'] > 0 else 0
+        }
+    return result
 
-def calculate_mood_streak(moods):
-    """Calculate the current mood tracking streak"""
-    if not moods:
+def calculate_mood_streak(dates):
+    """Calculate the current mood tracking streak from the 'YYYY-MM-DD' dates with entries"""
+    if not dates:
         return 0
     
-    # Sort moods by date (newest first)
-    sorted_moods = sorted(moods, key=lambda m: m['created_at'], reverse=True)
+    # Distinct days, newest first
+    days = sorted({datetime.strptime(day, '%Y-%m-%d').date() for day in dates}, reverse=True)
     
     today = datetime.utcnow().date()
     
     # Check if there's a mood entry for today
-    latest_mood_date = datetime.strptime(sorted_moods[0]['created_at'], '%Y-%m-%d %H:%M:%S').date()
-    if latest_mood_date < today:
+    if days[0] < today:
         # No entry for today, streak broken
         return 0
     
     # Calculate streak
     streak = 1
-    last_date = latest_mood_date
+    last_date = days[0]
     
-    for mood in sorted_moods[1:]:
-        mood_date = datetime.strptime(mood['created_at'], '%Y-%m-%d %H:%M:%S').date()
-        
-        # Check if this mood is from the previous day
-        if (last_date - mood_date).days == 1:
-            streak += 1
-            last_date = mood_date
-        elif (last_date - mood_date).days > 1:
+    for day in days[1:]:
+        # Check if this day is the previous one
+        if (last_date - day).days != 1:
             # Gap in streak
             break
+        streak += 1
+        last_date = day
     
     return streak
 
-def generate_insights(moods, mood_frequency, mood_by_day, mood_by_time, streak):
-    """Generate insights based on mood data"""
+def generate_insights(aggregate, mood_frequency, mood_by_day, mood_by_time, streak):
+    """Generate insights based on aggregated mood data"""
     insights = []
     
-    if not moods:
+    if not aggregate.count:
         insights.append("You haven't tracked any moods in this time period. Start tracking to get insights!")
         return insights
     
@@ -527,13 +1290,7 @@ def generate_insights(moods, mood_frequency, mood_by_day, mood_by_time, streak):
         insights.append(f"You've recorded {len(mood_frequency)} different moods, showing good emotional awareness.")
     
     # Consistency
-    date_count = {}
-    for mood in moods:
-        date = mood['created_at'].split(' ')[0]
-        if date in date_count:
-            date_count[date] += 1
-        else:
-            date_count[date] = 1
+    date_count = aggregate.entries_per_date
     
     if len(date_count) > 0:
         avg_entries_per_day = sum(date_count.values()) / len(date_count)
@@ -542,11 +1299,11 @@ def generate_insights(moods, mood_frequency, mood_by_day, mood_by_time, streak):
     
     return insights
 
-def generate_recommendations(moods, mood_frequency, mood_by_day, mood_by_time, streak):
-    """Generate recommendations based on mood data"""
+def generate_recommendations(aggregate, mood_frequency, mood_by_day, mood_by_time, streak):
+    """Generate recommendations based on aggregated mood data"""
     recommendations = []
     
-    if not moods:
+    if not aggregate.count:
         recommendations.append("Start tracking your mood daily to get personalized recommendations.")
         return recommendations
     
@@ -557,7 +1314,7 @@ def generate_recommendations(moods, mood_frequency, mood_by_day, mood_by_time, s
         recommendations.append("Keep your streak going! Track your mood for at least 7 consecutive days for better patterns.")
     
     # Frequency recommendations
-    if len(moods) < 7:
+    if aggregate.count < 7:
         recommendations.append("Track your mood more frequently to get more accurate insights and recommendations.")
     
     # Worst day recommendations
@@ -607,14 +1364,16 @@ def generate_recommendations(moods, mood_frequency, mood_by_day, mood_by_time, s
 # GraphQL Schema
 type_defs = """
 type Query {
-    moodHistory(userId: ID!, limit: Int): [Mood]
-    publicMoods(limit: Int): [MoodWithUser]
+    moodHistory(userId: ID!, limit: Int, after: String): [Mood]
+    moodHistoryConnection(userId: ID!, first: Int, after: String): MoodConnection
+    publicMoods(limit: Int, before: ID): [MoodWithUser]
     moodAnalytics(userId: ID!, timeRange: Int): MoodAnalytics
     mood(id: ID!): Mood
 }
 
 type Mutation {
     createMood(input: MoodInput!): Mood
+    createMoods(inputs: [MoodInput!]!): [MoodResult!]!
     updateMood(id: ID!, input: MoodInput!): Mood
     deleteMood(id: ID!): Boolean
 }
@@ -630,6 +1389,27 @@ type Mood {
     createdAt: String!
 }
 
+type MoodResult {
+    index: Int!
+    mood: Mood
+    error: String
+}
+
+type MoodConnection {
+    edges: [MoodEdge]
+    pageInfo: PageInfo!
+}
+
+type MoodEdge {
+    cursor: String!
+    node: Mood
+}
+
+type PageInfo {
+    hasNextPage: Boolean!
+    endCursor: String
+}
+
 type MoodWithUser {
     id: ID!
     userId: ID!
@@ -672,17 +1452,27 @@ query = QueryType()
 mutation = MutationType()
 mood = ObjectType("Mood")
 
+# Analytics dicts keep the camelCase keys of the REST response and of the
+# rows persisted in mood_analytics_cache, so these fields are mapped explicitly
+analytics_type = ObjectType("MoodAnalytics")
+for field in ('userId', 'timeRange', 'moodFrequency', 'moodByDayOfWeek', 'moodByTimeOfDay', 'averageScore'):
+    analytics_type.set_alias(field, field)
+
 @query.field("moodHistory")
-def resolve_mood_history(_, info, userId, limit=50):
-    return get_user_moods(userId, limit)
+def resolve_mood_history(_, info, userId, limit=50, after=None):
+    return get_user_moods(userId, limit, after).items
+
+@query.field("moodHistoryConnection")
+def resolve_mood_history_connection(_, info, userId, first=50, after=None):
+    return connection(get_user_moods(userId, first, after))
 
 @query.field("publicMoods")
-def resolve_public_moods(_, info, limit=20):
-    return get_public_moods(limit)
+def resolve_public_moods(_, info, limit=20, before=None):
+    return get_public_moods(limit, int(before) if before is not None else None)
 
 @query.field("moodAnalytics")
 def resolve_mood_analytics(_, info, userId, timeRange=30):
-    return get_mood_analytics(userId, timeRange)
+    return get_mood_analytics(int(userId), timeRange)
 
 @query.field("mood")
 def resolve_mood(_, info, id):
@@ -723,6 +1513,19 @@ def resolve_create_mood(_, info, input):
     
     return create_mood(user['id'], input)
 
+@mutation.field("createMoods")
+def resolve_create_moods(_, info, inputs):
+    context = info.context
+    user = context.get('user')
+    
+    if not user:
+        raise Exception("Authentication required")
+    
+    if len(inputs) > MAX_MOOD_BATCH:
+        raise Exception(f"At most {MAX_MOOD_BATCH} moods per batch")
+    
+    return create_moods(user['id'], inputs)
+
 @mutation.field("updateMood")
 def resolve_update_mood(_, info, id, input):
     context = info.context
@@ -735,7 +1538,7 @@ def resolve_update_mood(_, info, id, input):
     cursor = db.cursor()
     
     # Check if the mood exists and belongs to the user
-    cursor.execute('SELECT user_id FROM moods WHERE id = ?', (id,))
+    cursor.execute('SELECT user_id, mood, score, created_at FROM moods WHERE id = ?', (id,))
     mood = cursor.fetchone()
     
     if not mood:
@@ -760,7 +1563,12 @@ def resolve_update_mood(_, info, id, input):
             ''',
             (mood_value, score, note, activities, is_public, id)
         )
+        
+        # Move the entry between rollup buckets in the same transaction
+        remove_from_rollup(cursor, mood['user_id'], mood['created_at'], mood['mood'], mood['score'])
+        add_to_rollup(cursor, mood['user_id'], mood['created_at'], mood_value, score)
         db.commit()
+        invalidate_mood_analytics(mood['user_id'])
         
         # Get the updated mood
         cursor.execute('SELECT * FROM moods WHERE id = ?', (id,))
@@ -778,6 +1586,9 @@ def resolve_update_mood(_, info, id, input):
         # Convert is_public to boolean
         mood_dict['is_public'] = bool(mood_dict['is_public'])
         
+        # Keep the in-memory public feed in step
+        sync_public_feed(mood_dict)
+        
         return mood_dict
     except Exception as e:
         logger.error(f"Error updating mood: {str(e)}")
@@ -795,7 +1606,7 @@ def resolve_delete_mood(_, info, id):
     cursor = db.cursor()
     
     # Check if the mood exists and belongs to the user
-    cursor.execute('SELECT user_id FROM moods WHERE id = ?', (id,))
+    cursor.execute('SELECT user_id, mood, score, created_at FROM moods WHERE id = ?', (id,))
     mood = cursor.fetchone()
     
     if not mood:
@@ -806,14 +1617,17 @@ def resolve_delete_mood(_, info, id):
     
     try:
         cursor.execute('DELETE FROM moods WHERE id = ?', (id,))
+        remove_from_rollup(cursor, mood['user_id'], mood['created_at'], mood['mood'], mood['score'])
         db.commit()
+        invalidate_mood_analytics(mood['user_id'])
+        public_feed.remove(id)
         return True
     except Exception as e:
         logger.error(f"Error deleting mood: {str(e)}")
         raise Exception(f"Error deleting mood: {str(e)}")
 
 # Create executable schema
-schema = make_executable_schema(type_defs, query, mutation, mood)
+schema = make_executable_schema(type_defs, query, mutation, mood, analytics_type, snake_case_fallback_resolvers)
 
 # Authentication middleware for GraphQL
 def get_context_value():
@@ -855,18 +1669,85 @@ def create_mood_api():
     
     return jsonify(mood), 201
 
+@app.route('/moods/batch', methods=['POST'])
+def create_moods_api():
+    """Create a batch of mood entries (e.g. moods queued by an offline client)"""
+    user = get_user_from_header()
+    if not user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    data = request.get_json(silent=True)
+    inputs = data.get('moods') if isinstance(data, dict) else data
+    if not isinstance(inputs, list):
+        return jsonify({'error': 'Expected a list of moods'}), 400
+    if len(inputs) > MAX_MOOD_BATCH:
+        return jsonify({'error': f'At most {MAX_MOOD_BATCH} moods per batch'}), 413
+    
+    results = create_moods(user['id'], inputs)
+    created = sum(1 for result in results if result['mood'])
+    
+    # 201 when every mood was created, 207 when only some were
+    if created == len(results):
+        status_code = 201
+    elif created:
+        status_code = 207
+    else:
+        status_code = 400
+    
+    return jsonify({'results': results, 'created': created, 'failed': len(results) - created}), status_code
+
 @app.route('/users/<int:user_id>/moods', methods=['GET'])
 def get_user_moods_api(user_id):
     """Get mood history for a user"""
-    limit = request.args.get('limit', 50, type=int)
-    moods = get_user_moods(user_id, limit)
-    return jsonify(moods), 200
+    first = request.args.get('first', request.args.get('limit', 50, type=int), type=int)
+    try:
+        page = get_user_moods(user_id, first, request.args.get('after'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page.items), 200, page_headers(page)
+
+MOOD_EXPORT_COLUMNS = ['id', 'user_id', 'mood', 'score', 'note', 'activities', 'is_public', 'created_at']
+
+def export_user_moods(user_id):
+    """Records generator over a user's full mood history, oldest first, for export_response"""
+    def records(db):
+        cursor = db.execute(
+            'SELECT * FROM moods WHERE user_id = ? ORDER BY created_at, id',
+            (user_id,)
+        )
+        for row in iter_rows(cursor):
+            yield mood_to_dict(row)
+    
+    return records
+
+@app.route('/users/<int:user_id>/moods/export', methods=['GET'])
+def export_user_moods_api(user_id):
+    """Stream a user's full mood history as NDJSON (default) or CSV"""
+    user = get_user_from_header()
+    if not user:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    if user['id'] != user_id:
+        return jsonify({'error': 'Not authorized to export this history'}), 403
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+    
+    return export_response(
+        database,
+        export_user_moods(user_id),
+        export_format,
+        MOOD_EXPORT_COLUMNS,
+        f'moods-{user_id}'
+    )
 
 @app.route('/moods/feed', methods=['GET'])
 def get_public_moods_api():
     """Get public moods feed"""
     limit = request.args.get('limit', 20, type=int)
-    moods = get_public_moods(limit)
+    before = request.args.get('before', type=int)
+    moods = get_public_moods(limit, before)
     return jsonify(moods), 200
 
 @app.route('/users/<int:user_id>/mood-analytics', methods=['GET'])
@@ -917,7 +1798,7 @@ def update_mood_api(mood_id):
     cursor = db.cursor()
     
     # Check if the mood exists and belongs to the user
-    cursor.execute('SELECT user_id FROM moods WHERE id = ?', (mood_id,))
+    cursor.execute('SELECT user_id, mood, score, created_at FROM moods WHERE id = ?', (mood_id,))
     mood = cursor.fetchone()
     
     if not mood:
@@ -943,7 +1824,12 @@ def update_mood_api(mood_id):
             ''',
             (mood_value, score, note, activities, is_public, mood_id)
         )
+        
+        # Move the entry between rollup buckets in the same transaction
+        remove_from_rollup(cursor, mood['user_id'], mood['created_at'], mood['mood'], mood['score'])
+        add_to_rollup(cursor, mood['user_id'], mood['created_at'], mood_value, score)
         db.commit()
+        invalidate_mood_analytics(mood['user_id'])
         
         # Get the updated mood
         cursor.execute('SELECT * FROM moods WHERE id = ?', (mood_id,))
@@ -961,6 +1847,9 @@ def update_mood_api(mood_id):
         # Convert is_public to boolean
         mood_dict['is_public'] = bool(mood_dict['is_public'])
         
+        # Keep the in-memory public feed in step
+        sync_public_feed(mood_dict)
+        
         return jsonify(mood_dict), 200
     except Exception as e:
         logger.error(f"Error updating mood: {str(e)}")
@@ -977,7 +1866,7 @@ def delete_mood_api(mood_id):
     cursor = db.cursor()
     
     # Check if the mood exists and belongs to the user
-    cursor.execute('SELECT user_id FROM moods WHERE id = ?', (mood_id,))
+    cursor.execute('SELECT user_id, mood, score, created_at FROM moods WHERE id = ?', (mood_id,))
     mood = cursor.fetchone()
     
     if not mood:
@@ -988,7 +1877,10 @@ def delete_mood_api(mood_id):
     
     try:
         cursor.execute('DELETE FROM moods WHERE id = ?', (mood_id,))
+        remove_from_rollup(cursor, mood['user_id'], mood['created_at'], mood['mood'], mood['score'])
         db.commit()
+        invalidate_mood_analytics(mood['user_id'])
+        public_feed.remove(mood_id)
         return jsonify({'success': True}), 200
     except Exception as e:
         logger.error(f"Error deleting mood: {str(e)}")
@@ -996,11 +1888,36 @@ def delete_mood_api(mood_id):
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'mood'}), 200
+    lookups = analytics_db_stats['hits'] + analytics_db_stats['misses']
+    return jsonify({
+        'status': 'healthy',
+        'service': 'mood',
+        'analyticsCache': {
+            'memory': analytics_cache.stats(),
+            'sqlite': {
+                'hits': analytics_db_stats['hits'],
+                'misses': analytics_db_stats['misses'],
+                'hitRatio': round(analytics_db_stats['hits'] / lookups, 3) if lookups else 0
+            },
+            'staleServed': analytics_db_stats['stale'],
+            'computations': analytics_flight.stats()
+        },
+        'analyticsScheduler': analytics_scheduler.stats(),
+        'publicFeed': public_feed.stats(),
+        'profileCache': user_profiles.stats()
+    }), 200
 
 if __name__ == '__main__':
     # Initialize database
     init_db()
     
+    # Serve the public feed from memory
+    with app.app_context():
+        ensure_public_feed_loaded()
+    
+    # Precompute analytics for active users in the background
+    if ANALYTICS_PRECOMPUTE:
+        analytics_scheduler.start()
+    
     # Start server
     app.run(host='0.0.0.0', port=PORT)
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""
+HugMood shared service utilities
+
+Small helpers used by more than one service. Services add the parent
+``services`` directory to ``sys.path`` and import from ``shared``.
+"""
@@ -0,0 +1,145 @@
+"""
+HugMood shared batch loaders
+
+BatchLoader is a synchronous, per-request take on the DataLoader pattern
+for graphql_sync resolvers. Keys are queued as soon as they are known (for
+example, every user id in a list result) and the first load() that needs an
+unfetched key resolves all queued keys with a single batch call.
+
+CoalescingLoader works across threads instead: concurrent load() calls from
+different requests are gathered for a few milliseconds and answered by one
+batch call, so a burst of lookups (every WebSocket reconnecting after a
+gateway restart, say) costs a handful of upstream requests. Under gevent
+(the gateways' pywsgi server) the process must be monkey-patched before
+this module is imported, so its locks and events yield to other greenlets
+instead of blocking the hub.
+"""
+
+import threading
+
+
+class BatchLoader:
+    """Collects keys and resolves them in batches, memoizing results for its lifetime.
+
+    batch_fn receives a list of unique keys and returns a dict mapping each key
+    it found to its value; keys missing from the dict resolve to None.
+    """
+
+    def __init__(self, batch_fn, key_fn=str, max_batch_size=500):
+        self.batch_fn = batch_fn
+        self.key_fn = key_fn
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self._cache = {}
+        self._pending = {}
+
+    def enqueue(self, keys):
+        """Queue keys for the next batch without fetching them yet"""
+        for key in keys:
+            if key is None:
+                continue
+            key = self.key_fn(key)
+            if key not in self._cache:
+                self._pending[key] = True
+
+    def load(self, key):
+        if key is None:
+            return None
+        key = self.key_fn(key)
+        if key not in self._cache:
+            self.enqueue([key])
+            self._dispatch()
+        return self._cache.get(key)
+
+    def load_many(self, keys):
+        """Load keys in order, dropping duplicates"""
+        keys = list(dict.fromkeys(self.key_fn(key) for key in keys if key is not None))
+        self.enqueue(keys)
+        self._dispatch()
+        return [self._cache.get(key) for key in keys]
+
+    def prime(self, key, value):
+        self._cache[self.key_fn(key)] = value
+
+    def clear(self, key):
+        self._cache.pop(self.key_fn(key), None)
+
+    def _dispatch(self):
+        pending = list(self._pending)
+        self._pending = {}
+
+        for i in range(0, len(pending), self.max_batch_size):
+            batch = pending[i:i + self.max_batch_size]
+            results = self.batch_fn(batch)
+            self.batches += 1
+            for key in batch:
+                self._cache[key] = results.get(key)
+
+
+class _Batch:
+    def __init__(self):
+        self.keys = {}
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = {}
+        self.error = None
+
+
+class CoalescingLoader:
+    """Coalesces load() calls from many threads into batch calls.
+
+    The first caller with no batch open becomes its leader: it waits up to
+    max_wait for others to join (less if the batch fills), then runs batch_fn
+    for everyone. Calls arriving while a batch runs open the next one.
+    batch_fn receives a list of unique keys and returns a dict mapping keys
+    to values (missing keys resolve to None); if it raises, every caller in
+    the batch gets the exception. Results are not cached.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=100, max_wait=0.005):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.loads = 0
+        self._open = None
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        with self._lock:
+            self.loads += 1
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.keys[key] = True
+            if len(batch.keys) >= self.max_batch_size:
+                # Full: later callers start a new batch, and the leader goes now
+                self._open = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.max_wait)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+                self.batches += 1
+            try:
+                batch.results = self.batch_fn(list(batch.keys))
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results.get(key)
+
+    def stats(self):
+        return {
+            'loads': self.loads,
+            'batches': self.batches,
+            'averageBatch': round(self.loads / self.batches, 1) if self.batches else 0
+        }
@@ -0,0 +1,115 @@
+"""
+HugMood shared SQLite access
+
+Connection management behind every service's get_db(). Connections are
+tuned once (WAL journal, synchronous=NORMAL, busy timeout, page cache),
+checked out for the duration of a request and returned to a small pool at
+teardown, so their prepared-statement cache survives across requests.
+"""
+
+import os
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -16000))  # negative values are KiB
+SQLITE_STATEMENT_CACHE = int(os.environ.get('SQLITE_STATEMENT_CACHE', 256))
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 8))
+
+
+class SQLiteDatabase:
+    """Pooled, request-scoped SQLite connections for a Flask service"""
+
+    def __init__(self, path, app=None, pool_size=SQLITE_POOL_SIZE):
+        self.path = path
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._local = threading.local()
+        self._g_key = f'sqlite_db_{id(self)}'
+        self._journal_mode_set = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Release the request's connection when the app context tears down"""
+        app.teardown_appcontext(self.release_request_connection)
+
+    def connect(self):
+        """Open a new tuned connection"""
+        db = sqlite3.connect(
+            self.path,
+            timeout=SQLITE_BUSY_TIMEOUT / 1000,
+            cached_statements=SQLITE_STATEMENT_CACHE,
+            check_same_thread=False
+        )
+        db.row_factory = sqlite3.Row
+
+        # WAL is persistent in the database file, so it only needs setting once
+        if not self._journal_mode_set:
+            db.execute('PRAGMA journal_mode = WAL')
+            self._journal_mode_set = True
+
+        db.execute(f'PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}')
+        db.execute('PRAGMA synchronous = NORMAL')
+        db.execute(f'PRAGMA cache_size = {SQLITE_CACHE_SIZE}')
+        db.execute('PRAGMA temp_store = MEMORY')
+        return db
+
+    def acquire(self):
+        """Check a connection out of the pool, opening one if the pool is empty"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+    def release(self, db):
+        """Return a connection to the pool, discarding any uncommitted work"""
+        try:
+            if db.in_transaction:
+                db.rollback()
+            self._pool.put_nowait(db)
+        except (queue.Full, sqlite3.Error):
+            db.close()
+
+    def get(self):
+        """Connection for the current request, or for the current thread outside a request"""
+        if has_app_context():
+            db = g.get(self._g_key)
+            if db is None:
+                db = self.acquire()
+                setattr(g, self._g_key, db)
+            return db
+
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = self.connect()
+        return db
+
+    def release_request_connection(self, exception=None):
+        db = g.pop(self._g_key, None)
+        if db is not None:
+            self.release(db)
+
+    def close_thread_connection(self):
+        """Close the connection opened by get() outside a request (background threads)"""
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection outside the request cycle"""
+        db = self.acquire()
+        try:
+            yield db
+        finally:
+            self.release(db)
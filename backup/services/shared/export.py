@@ -0,0 +1,100 @@
+"""
+HugMood shared streaming exports
+
+Full-history exports are streamed rather than built in memory: rows are
+read from an open SQLite cursor with fetchmany() and encoded a batch at a
+time into NDJSON or CSV chunks of a generator response, so memory stays flat
+however many years of history a user has. The export runs on its own pooled
+connection inside a single read statement, which under WAL gives it a
+consistent snapshot while writes continue.
+"""
+
+import io
+import os
+import csv
+import json
+import heapq
+
+from flask import Response
+
+# Configuration
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))  # rows per fetchmany()
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def iter_rows(cursor, batch_size=EXPORT_BATCH_SIZE):
+    """Rows of an executed cursor, fetched batch_size at a time"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def merge_rows(*iterables, key):
+    """Merge row iterators that are each sorted by key, lazily"""
+    return heapq.merge(*iterables, key=key)
+
+
+def batched(rows, batch_size=EXPORT_BATCH_SIZE):
+    """Lists of up to batch_size items from rows"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_chunks(records):
+    """One JSON document per line, a batch of lines per chunk"""
+    for batch in batched(records):
+        yield ''.join(json.dumps(record, default=str) + '\n' for record in batch)
+
+
+def csv_chunks(records, columns):
+    """A header line, then a batch of CSV rows per chunk; list values are ';'-joined"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for batch in batched(records):
+        for record in batch:
+            writer.writerow([
+                ';'.join(map(str, value)) if isinstance(value, list) else value
+                for value in (record.get(column) for column in columns)
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_response(database, records, export_format, columns, filename):
+    """Streaming response for an export.
+
+    records(db) is a generator of dicts read from db, a connection borrowed
+    from database for as long as the response streams; it goes back to the
+    pool when the stream ends or the client disconnects.
+    """
+    def generate():
+        with database.connection() as db:
+            if export_format == 'csv':
+                yield from csv_chunks(records(db), columns)
+            else:
+                yield from ndjson_chunks(records(db))
+
+    return Response(
+        generate(),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'}
+    )
@@ -0,0 +1,260 @@
+"""
+HugMood shared JWT signing keys and key sets
+
+The auth service signs access tokens with an asymmetric private key
+(EdDSA by default, RS256 supported) and publishes the public halves as a
+JWKS document at /.well-known/jwks.json. Every other service keeps a
+KeySet: the JWKS fetched once, refreshed in the background and looked up
+by the token's ``kid``, so verifying a token is a local signature check
+with no call to the auth service.
+
+Rotation: drop a new PEM into JWT_KEY_DIR and restart the auth service.
+The newest key signs, older ones stay published (and so verifiable) until
+their files are removed. Key sets pick a new kid up on their next refresh,
+or immediately when a token arrives signed with a kid they haven't seen.
+"""
+
+import os
+import json
+import time
+import base64
+import hashlib
+import logging
+import threading
+
+import jwt
+import requests
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'EdDSA')  # algorithm for newly generated keys: EdDSA or RS256
+JWKS_REFRESH_INTERVAL = float(os.environ.get('JWKS_REFRESH_INTERVAL', 300))  # seconds
+JWKS_MIN_REFETCH_INTERVAL = float(os.environ.get('JWKS_MIN_REFETCH_INTERVAL', 30))  # seconds between fetches for unknown kids
+JWKS_TIMEOUT = float(os.environ.get('JWKS_TIMEOUT', 2))  # seconds
+JWT_LEGACY_HS256 = os.environ.get('JWT_LEGACY_HS256', 'false').lower() == 'true'  # also accept JWT_SECRET tokens
+
+# Key type -> JWS algorithm. The algorithm used to verify is always taken
+# from the key, never from the token header.
+KEY_ALGORITHMS = {
+    'OKP': 'EdDSA',
+    'RSA': 'RS256'
+}
+
+# iat is sub-second (revocation cutoffs compare against it) and PyJWT would
+# reject it as "not yet valid" for the rest of its issuing second; exp and
+# nbf are still checked.
+DECODE_OPTIONS = {'verify_iat': False}
+
+
+class KeySetUnavailable(Exception):
+    """No verification keys have been loaded yet"""
+
+
+def key_id(public_key):
+    """Stable kid for a public key: a truncated SHA-256 of its DER encoding"""
+    der = public_key.public_bytes(
+        serialization.Encoding.DER,
+        serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return base64.urlsafe_b64encode(hashlib.sha256(der).digest()[:12]).decode('ascii')
+
+
+def key_algorithm(key):
+    """JWS algorithm for a private or public key object"""
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return 'EdDSA'
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return 'RS256'
+    raise ValueError(f"Unsupported key type: {type(key).__name__}")
+
+
+def generate_private_key(algorithm=JWT_ALGORITHM):
+    if algorithm == 'EdDSA':
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == 'RS256':
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+
+
+def public_jwk(public_key):
+    """JWK dict for a public key, with kid, alg and use"""
+    algorithm = key_algorithm(public_key)
+    encoder = OKPAlgorithm if algorithm == 'EdDSA' else RSAAlgorithm
+    jwk = json.loads(encoder.to_jwk(public_key))
+    jwk.update({'kid': key_id(public_key), 'alg': algorithm, 'use': 'sig'})
+    return jwk
+
+
+def decode_token(token, keys, legacy_secret=None):
+    """Verify a token against keys ({kid: (public_key, algorithm)}) and return its claims.
+
+    Raises jwt.InvalidTokenError for a bad, expired or unknown-kid token.
+    HS256 tokens are accepted only when legacy_secret is given.
+    """
+    header = jwt.get_unverified_header(token)
+    if header.get('alg') == 'HS256' and legacy_secret:
+        return jwt.decode(token, legacy_secret, algorithms=['HS256'], options=DECODE_OPTIONS)
+
+    entry = keys.get(header.get('kid'))
+    if not entry:
+        raise jwt.InvalidTokenError('Unknown signing key')
+    public_key, algorithm = entry
+    return jwt.decode(token, public_key, algorithms=[algorithm], options=DECODE_OPTIONS)
+
+
+class SigningKeys:
+    """The auth service's private keys: the newest signs, all are published"""
+
+    def __init__(self, key_dir, algorithm=JWT_ALGORITHM):
+        self.key_dir = key_dir
+        self.algorithm = algorithm
+        self._keys = []  # (kid, private_key, algorithm), oldest first
+        self._verification_keys = {}
+
+    def load(self):
+        """Load every PEM in key_dir, generating a first key if there is none"""
+        os.makedirs(self.key_dir, exist_ok=True)
+        paths = sorted(
+            (os.path.join(self.key_dir, name) for name in os.listdir(self.key_dir) if name.endswith('.pem')),
+            key=os.path.getmtime
+        )
+
+        keys = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                private_key = serialization.load_pem_private_key(f.read(), password=None)
+            keys.append((key_id(private_key.public_key()), private_key, key_algorithm(private_key)))
+
+        if not keys:
+            private_key = generate_private_key(self.algorithm)
+            kid = key_id(private_key.public_key())
+            pem = private_key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption()
+            )
+            fd = os.open(os.path.join(self.key_dir, f'{kid}.pem'), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pem)
+            logger.info(f"Generated {self.algorithm} signing key {kid}")
+            keys.append((kid, private_key, key_algorithm(private_key)))
+
+        self._keys = keys
+        self._verification_keys = {
+            kid: (private_key.public_key(), algorithm) for kid, private_key, algorithm in keys
+        }
+        return self
+
+    @property
+    def current(self):
+        return self._keys[-1]
+
+    def sign(self, payload):
+        kid, private_key, algorithm = self.current
+        return jwt.encode(payload, private_key, algorithm=algorithm, headers={'kid': kid})
+
+    def verification_keys(self):
+        """{kid: (public_key, algorithm)} for decode_token()"""
+        return self._verification_keys
+
+    def jwks(self):
+        """The public JWKS document, newest key first"""
+        return {'keys': [public_jwk(private_key.public_key()) for _, private_key, _ in reversed(self._keys)]}
+
+
+class KeySet:
+    """Verification keys fetched from a JWKS URL and refreshed in the background"""
+
+    def __init__(self, jwks_url, refresh_interval=JWKS_REFRESH_INTERVAL,
+                 min_refetch_interval=JWKS_MIN_REFETCH_INTERVAL, legacy_secret=None):
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self.legacy_secret = legacy_secret
+        self.fetches = 0
+        self.errors = 0
+        self._keys = {}  # kid -> (public_key, algorithm); replaced wholesale, never mutated
+        self._fetched_at = 0
+        self._lock = threading.RLock()
+        self._started = False
+
+    def refresh(self):
+        """Fetch the JWKS now; returns False (keeping the current keys) on failure"""
+        with self._lock:
+            self._fetched_at = time.time()
+            self.fetches += 1
+            try:
+                response = requests.get(self.jwks_url, timeout=JWKS_TIMEOUT)
+                response.raise_for_status()
+                documents = response.json().get('keys', [])
+            except (requests.RequestException, ValueError) as e:
+                self.errors += 1
+                logger.error(f"Error fetching JWKS from {self.jwks_url}: {str(e)}")
+                return False
+
+            keys = {}
+            for document in documents:
+                algorithm = KEY_ALGORITHMS.get(document.get('kty'))
+                if not algorithm or not document.get('kid'):
+                    continue
+                try:
+                    keys[document['kid']] = (jwt.PyJWK(document, algorithm).key, algorithm)
+                except jwt.PyJWKError as e:
+                    logger.error(f"Skipping unusable JWK {document.get('kid')}: {str(e)}")
+
+            self._keys = keys
+            return True
+
+    def start(self):
+        """Load the keys, then keep them fresh from a daemon thread"""
+        if self._started:
+            return
+        self._started = True
+        self.refresh()
+
+        def run():
+            while True:
+                # Retry sooner while no keys could be loaded
+                time.sleep(self.refresh_interval if self._keys else min(self.refresh_interval, 5))
+                self.refresh()
+
+        threading.Thread(target=run, name='jwks-refresh', daemon=True).start()
+
+    def _refetch_for(self, kid):
+        """Fetch again for a kid we don't know (e.g. just rotated), at most every min_refetch_interval"""
+        if kid in self._keys:
+            return
+        with self._lock:
+            # A concurrent request may have just fetched it
+            if kid in self._keys or time.time() - self._fetched_at < self.min_refetch_interval:
+                return
+            self.refresh()
+
+    def decode(self, token):
+        """Claims of a valid token; raises jwt.InvalidTokenError, or KeySetUnavailable
+        when no keys have been loaded (the caller decides how to fall back)"""
+        header = jwt.get_unverified_header(token)
+        if header.get('alg') != 'HS256':
+            self._refetch_for(header.get('kid'))
+            if not self._keys:
+                raise KeySetUnavailable(f"No keys loaded from {self.jwks_url}")
+        return decode_token(token, self._keys, self.legacy_secret)
+
+    def verify(self, token):
+        """Claims of a valid token, or None"""
+        try:
+            return self.decode(token)
+        except jwt.InvalidTokenError:
+            return None
+
+    def stats(self):
+        return {
+            'keys': sorted(self._keys),
+            'age': round(time.time() - self._fetched_at, 1) if self._fetched_at else None,
+            'fetches': self.fetches,
+            'errors': self.errors
+        }
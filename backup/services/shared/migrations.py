@@ -0,0 +1,60 @@
+"""
+HugMood shared schema migrations
+
+Versioned, forward-only migrations for the services' SQLite databases.
+Each service declares an ordered list of ``(version, name, steps)`` where a
+step is either a SQL string or a callable taking a cursor. Applied versions
+are recorded in ``schema_migrations``; each migration runs in its own
+transaction.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def apply_migrations(db, migrations):
+    """Apply every migration whose version has not been recorded yet"""
+    cursor = db.cursor()
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    db.commit()
+
+    cursor.execute('SELECT version FROM schema_migrations')
+    applied = {row[0] for row in cursor.fetchall()}
+
+    for version, name, steps in sorted(migrations, key=lambda migration: migration[0]):
+        if version in applied:
+            continue
+
+        try:
+            # DDL does not open an implicit transaction, so start one explicitly
+            cursor.execute('BEGIN')
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(
+                'INSERT INTO schema_migrations (version, name) VALUES (?, ?)',
+                (version, name)
+            )
+            db.commit()
+            logger.info(f"Applied migration {version}: {name}")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Migration {version} ({name}) failed: {str(e)}")
+            raise
+
+
+def current_version(db):
+    """Highest applied migration version, or 0"""
+    cursor = db.cursor()
+    cursor.execute('SELECT MAX(version) FROM schema_migrations')
+    row = cursor.fetchone()
+    return row[0] or 0
@@ -0,0 +1,81 @@
+"""
+HugMood shared keyset pagination
+
+List endpoints page on their sort key, (created_at, id), rather than with
+OFFSET: a cursor encodes the key of the last item returned and the next page
+is an index range scan starting just past it, so every page costs the same
+however deep the client has scrolled. Cursors are opaque to clients
+(URL-safe base64 of the JSON-encoded key).
+"""
+
+import os
+import json
+import base64
+import binascii
+from collections import namedtuple
+
+# Configuration
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 100))
+
+# items: rows of this page; has_next_page: more rows follow; end_cursor: cursor of the last row
+Page = namedtuple('Page', ['items', 'has_next_page', 'end_cursor'])
+
+EMPTY_PAGE = Page([], False, None)
+
+
+class InvalidCursor(ValueError):
+    """A client-supplied cursor that was not produced by encode_cursor"""
+
+
+def encode_cursor(*key):
+    data = json.dumps(list(key), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size=2):
+    """Sort key encoded in cursor, as a tuple of size values"""
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(data)
+    except (TypeError, ValueError, binascii.Error):
+        raise InvalidCursor('Invalid cursor')
+
+    # Every value is bound as a query parameter: only scalars SQLite accepts
+    if not isinstance(key, list) or len(key) != size or not all(
+        isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in key
+    ):
+        raise InvalidCursor('Invalid cursor')
+    return tuple(key)
+
+
+def page_size(first, default):
+    """Clamp a requested page size to 1..MAX_PAGE_SIZE"""
+    if first is None:
+        first = default
+    return max(1, min(int(first), MAX_PAGE_SIZE))
+
+
+def build_page(rows, size, key=lambda row: (row['created_at'], row['id'])):
+    """Page from rows fetched with LIMIT size + 1 (the extra row only signals a next page)"""
+    items = rows[:size]
+    end_cursor = encode_cursor(*key(items[-1])) if items else None
+    return Page(items, len(rows) > size, end_cursor)
+
+
+def page_headers(page):
+    """Pagination response headers for REST endpoints that return a bare list"""
+    headers = {'X-Has-Next-Page': 'true' if page.has_next_page else 'false'}
+    if page.has_next_page:
+        headers['X-Next-Cursor'] = page.end_cursor
+    return headers
+
+
+def connection(page, key=lambda item: (item['created_at'], item['id'])):
+    """Relay-style connection object for a GraphQL resolver (snake_case keys for the fallback resolvers)"""
+    return {
+        'edges': [{'cursor': encode_cursor(*key(item)), 'node': item} for item in page.items],
+        'page_info': {
+            'has_next_page': page.has_next_page,
+            'end_cursor': page.end_cursor
+        }
+    }
@@ -0,0 +1,100 @@
+"""
+HugMood shared User service profile lookups
+
+Services that show who did something (hug senders, group participants,
+feed authors) resolve user ids to display data with one users(ids: [...])
+GraphQL query to the User service per batch, over a keep-alive session,
+with the results held in a short-lived in-process cache.
+"""
+
+import logging
+
+import requests
+
+from shared.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+USERS_QUERY = """
+query Users($ids: [ID!]) {
+    users(ids: $ids) {
+        id
+        username
+        displayName
+        avatarUrl
+    }
+}
+"""
+
+
+def placeholder_profile(user_id):
+    """Minimal profile shown when the User service cannot resolve a user"""
+    return {
+        'id': user_id,
+        'username': f'user{user_id}',
+        'display_name': f'User {user_id}',
+        'avatar_url': None
+    }
+
+
+class UserProfiles:
+    """Cached user summaries from the User service, keyed by str(id).
+
+    Profiles use row-style keys (id, username, display_name, avatar_url)
+    like the services' own database objects. With placeholders=True, ids
+    the User service could not resolve (or every id, if it is down) get
+    placeholder_profile() instead of being left out; placeholders are never
+    cached.
+    """
+
+    def __init__(self, user_service_url, timeout=2, cache_size=10000, cache_ttl=60, placeholders=False):
+        self.url = f"{user_service_url}/graphql"
+        self.timeout = timeout
+        self.placeholders = placeholders
+        self.session = requests.Session()
+        self.cache = TTLCache(cache_size, cache_ttl)
+
+    def fetch(self, user_ids):
+        """Profiles for user_ids, from the cache or a single users(ids:) query"""
+        profiles = {}
+        missing = []
+        for user_id in dict.fromkeys(str(user_id) for user_id in user_ids):
+            profile = self.cache.get(user_id)
+            if profile:
+                profiles[user_id] = profile
+            else:
+                missing.append(user_id)
+
+        if missing:
+            try:
+                response = self.session.post(
+                    self.url,
+                    json={"query": USERS_QUERY, "variables": {"ids": missing}},
+                    timeout=self.timeout
+                )
+
+                if response.status_code == 200:
+                    for user in (response.json().get('data') or {}).get('users') or []:
+                        if user:
+                            profile = {
+                                'id': user['id'],
+                                'username': user.get('username'),
+                                'display_name': user.get('displayName'),
+                                'avatar_url': user.get('avatarUrl')
+                            }
+                            self.cache.set(str(user['id']), profile)
+                            profiles[str(user['id'])] = profile
+                else:
+                    logger.error(f"User service returned {response.status_code} for users({len(missing)} ids)")
+            except (requests.RequestException, ValueError) as e:
+                logger.error(f"Error fetching users from User service: {str(e)}")
+
+        if self.placeholders:
+            # A User service outage shouldn't fail the caller's query
+            for user_id in missing:
+                profiles.setdefault(user_id, placeholder_profile(user_id))
+
+        return profiles
+
+    def stats(self):
+        return self.cache.stats()
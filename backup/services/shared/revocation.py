@@ -0,0 +1,188 @@
+"""
+HugMood shared access token revocation list
+
+Gateways verify access tokens locally (see shared.jwks), so a logout or
+password change has to reach them some other way. The auth service keeps
+an incremental feed of revocations at /auth/revocations; a RevocationList
+long-polls it from a background thread and answers is_revoked(claims)
+from memory.
+
+Two kinds of revocation arrive on the feed:
+
+- a single token by ``jti`` (logout), kept until that token's exp;
+- every token of a user issued before a cutoff (password change).
+
+Revoked jtis sit behind a Bloom filter. Almost every token checked was
+never revoked, and for those the filter answers "no" without touching the
+exact set; a filter hit is confirmed against the exact set, so a false
+positive never rejects a good token. Entries are dropped once the tokens
+they cover have expired and the filter is rebuilt from what is left.
+
+The feed is for gateways only. Readers present REVOCATION_FEED_TOKEN, a
+credential shared with the auth service, in the X-Service-Token header;
+when none is configured the auth service serves the feed to loopback
+clients only.
+"""
+
+import os
+import hmac
+import math
+import time
+import hashlib
+import logging
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Configuration
+REVOCATION_POLL_WAIT = float(os.environ.get('REVOCATION_POLL_WAIT', 25))  # long-poll wait per request, seconds
+REVOCATION_PRUNE_INTERVAL = float(os.environ.get('REVOCATION_PRUNE_INTERVAL', 60))  # seconds
+REVOCATION_FILTER_CAPACITY = int(os.environ.get('REVOCATION_FILTER_CAPACITY', 100000))  # jtis before the filter is resized
+REVOCATION_FILTER_ERROR_RATE = float(os.environ.get('REVOCATION_FILTER_ERROR_RATE', 0.001))
+REVOCATION_FEED_TOKEN = os.environ.get('REVOCATION_FEED_TOKEN')  # shared by the auth service and its feed readers
+
+REVOCATION_FEED_HEADER = 'X-Service-Token'
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def feed_reader_allowed(headers, remote_addr, token=REVOCATION_FEED_TOKEN):
+    """Whether a request may read the revocation feed (see the module docstring)"""
+    if token:
+        return hmac.compare_digest(
+            headers.get(REVOCATION_FEED_HEADER, '').encode('utf-8'), token.encode('utf-8')
+        )
+    return remote_addr in LOOPBACK_ADDRESSES
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no removal; rebuild instead)"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))  # bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    """Revoked access tokens as seen by a gateway, fed from the auth service"""
+
+    def __init__(self, capacity=REVOCATION_FILTER_CAPACITY, error_rate=REVOCATION_FILTER_ERROR_RATE,
+                 token=REVOCATION_FEED_TOKEN):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.token = token
+        self.cursor = 0
+        self.synced = False
+        self.polls = 0
+        self.errors = 0
+        self._filter = BloomFilter(capacity, error_rate)
+        self._jtis = {}  # jti -> expires_at
+        self._cutoffs = {}  # user id (str) -> (issued_before, expires_at)
+        self._lock = threading.Lock()
+        self._pruned_at = time.time()
+
+    def add(self, revocations):
+        """Apply feed entries: {id, jti, expiresAt} or {id, userId, issuedBefore, expiresAt}"""
+        with self._lock:
+            for entry in revocations:
+                if entry.get('jti'):
+                    self._jtis[entry['jti']] = entry['expiresAt']
+                    self._filter.add(entry['jti'])
+                elif entry.get('issuedBefore') is not None:
+                    user_id = str(entry['userId'])
+                    issued_before, expires_at = self._cutoffs.get(user_id, (0, 0))
+                    self._cutoffs[user_id] = (
+                        max(issued_before, entry['issuedBefore']),
+                        max(expires_at, entry['expiresAt'])
+                    )
+                self.cursor = max(self.cursor, entry['id'])
+
+            if len(self._jtis) > self._filter.capacity:
+                self._rebuild(self._filter.capacity * 2)
+
+    def is_revoked(self, claims):
+        cutoff = self._cutoffs.get(str(claims.get('id')))
+        if cutoff and claims.get('iat', 0) <= cutoff[0]:
+            return True
+
+        jti = claims.get('jti')
+        return jti is not None and jti in self._filter and jti in self._jtis
+
+    def prune(self):
+        """Forget revocations whose tokens have all expired, and rebuild the filter"""
+        now = time.time()
+        with self._lock:
+            self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp >= now}
+            self._cutoffs = {user_id: cutoff for user_id, cutoff in self._cutoffs.items() if cutoff[1] >= now}
+            self._rebuild(max(self.capacity, len(self._jtis) * 2))
+            self._pruned_at = now
+
+    def _rebuild(self, capacity):
+        bloom = BloomFilter(capacity, self.error_rate)
+        for jti in self._jtis:
+            bloom.add(jti)
+        self._filter = bloom
+
+    def poll(self, url, wait=0):
+        """Fetch and apply revocations after the cursor; returns whether more are waiting"""
+        headers = {REVOCATION_FEED_HEADER: self.token} if self.token else {}
+        response = requests.get(
+            url, params={'since': self.cursor, 'wait': wait}, headers=headers, timeout=wait + 5
+        )
+        response.raise_for_status()
+        result = response.json()
+        self.add(result.get('revocations', []))
+        self.polls += 1
+        self.synced = True
+        return result.get('hasMore', False)
+
+    def start(self, url, wait=REVOCATION_POLL_WAIT):
+        """Follow the revocation feed at url from a daemon thread"""
+        def run():
+            backoff = 1
+            has_more = True
+            while True:
+                try:
+                    # Catch up without waiting, then hold a long poll open
+                    has_more = self.poll(url, 0 if has_more else wait)
+                    backoff = 1
+                except (requests.RequestException, ValueError) as e:
+                    self.errors += 1
+                    logger.error(f"Error polling revocations from {url}: {str(e)}")
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, 30)
+                    has_more = True
+
+                if time.time() - self._pruned_at >= REVOCATION_PRUNE_INTERVAL:
+                    self.prune()
+
+        threading.Thread(target=run, name='revocation-feed', daemon=True).start()
+
+    def stats(self):
+        return {
+            'cursor': self.cursor,
+            'synced': self.synced,
+            'jtis': len(self._jtis),
+            'users': len(self._cutoffs),
+            'filterBytes': len(self._filter._bits),
+            'polls': self.polls,
+            'errors': self.errors
+        }
@@ -0,0 +1,38 @@
+"""
+Fixtures for the service tests
+
+Each service is a standalone app.py that reads its configuration from the
+environment at import time, so tests load a fresh copy of the module per
+test, pointed at a throwaway database.
+"""
+
+import os
+import sys
+import importlib.util
+
+import pytest
+import ariadne.constants
+
+SERVICES_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICES_DIR)
+
+# ariadne 0.19 dropped PLAYGROUND_HTML, which every service still imports
+# for its GET /graphql page; the tests never render it.
+if not hasattr(ariadne.constants, 'PLAYGROUND_HTML'):
+    ariadne.constants.PLAYGROUND_HTML = ''
+
+
+@pytest.fixture
+def load_service(tmp_path, monkeypatch):
+    """load_service('hug-service') -> a freshly imported app module with an empty database"""
+    def load(name):
+        monkeypatch.setenv('DATABASE_PATH', str(tmp_path / f'{name}.db'))
+        monkeypatch.setenv('JWT_KEY_DIR', str(tmp_path / 'keys'))
+        spec = importlib.util.spec_from_file_location(
+            name.replace('-', '_'), os.path.join(SERVICES_DIR, name, 'app.py')
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return load
@@ -0,0 +1,112 @@
+"""History exports stream a large table in fixed-size batches"""
+
+import json
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pytest
+
+from shared.export import EXPORT_BATCH_SIZE
+
+ROWS = 200_000
+PEAK_LIMIT = 2 * 1024 * 1024  # bytes traced while streaming; every format exports over 5x this
+
+
+class RecordingCursor:
+    """Cursor proxy that records every fetch the export makes"""
+
+    def __init__(self, cursor, fetches):
+        self.cursor = cursor
+        self.fetches = fetches
+
+    def fetchmany(self, size):
+        rows = self.cursor.fetchmany(size)
+        self.fetches.append(('fetchmany', size, len(rows)))
+        return rows
+
+    def fetchall(self):
+        self.fetches.append(('fetchall', None, None))
+        return self.cursor.fetchall()
+
+    def __iter__(self):
+        self.fetches.append(('iter', None, None))
+        return iter(self.cursor)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class RecordingConnection:
+    def __init__(self, db):
+        self.db = db
+        self.fetches = []
+
+    def execute(self, *args):
+        return RecordingCursor(self.db.execute(*args), self.fetches)
+
+
+@pytest.fixture
+def moods(load_service):
+    """Mood service with ROWS moods for user 1 (and some for user 2)"""
+    moods = load_service('mood-service')
+    moods.init_db()
+    start = datetime(2015, 1, 1)
+
+    def rows():
+        for i in range(ROWS + ROWS // 10):
+            yield (
+                1 if i % 11 else 2, 'calm', i % 10 + 1, f'note {i}', '["walk", "read"]', i % 2,
+                (start + timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M:%S')
+            )
+
+    with moods.database.connection() as db:
+        db.executemany(
+            'INSERT INTO moods (user_id, mood, score, note, activities, is_public, created_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            rows()
+        )
+        db.commit()
+    return moods
+
+
+def test_export_reads_in_fetchmany_batches(moods):
+    with moods.database.connection() as db:
+        recording = RecordingConnection(db)
+        count = sum(1 for _ in moods.export_user_moods(1)(recording))
+
+    assert count == ROWS
+    kinds = {kind for kind, _, _ in recording.fetches}
+    assert kinds == {'fetchmany'}
+    sizes = [rows for _, size, rows in recording.fetches if size == EXPORT_BATCH_SIZE]
+    assert len(sizes) == len(recording.fetches) == -(-ROWS // EXPORT_BATCH_SIZE) + 1
+    assert max(sizes) == EXPORT_BATCH_SIZE
+
+
+@pytest.mark.parametrize('export_format', ['ndjson', 'csv'])
+def test_export_memory_stays_bounded(moods, export_format):
+    client = moods.app.test_client()
+    tracemalloc.start()
+    try:
+        response = client.get(
+            f'/users/1/moods/export?format={export_format}',
+            headers={'X-User-ID': '1'},
+            buffered=False
+        )
+        assert response.status_code == 200
+
+        streamed = lines = 0
+        for chunk in response.iter_encoded():
+            streamed += len(chunk)
+            lines += chunk.count(b'\n')
+            last = chunk
+        response.close()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert lines == ROWS + (export_format == 'csv')
+    if export_format == 'ndjson':
+        assert json.loads(last.splitlines()[-1])['user_id'] == 1
+    # Buffering the export (or fetchall()) would hold all of it at once
+    assert streamed > 5 * PEAK_LIMIT
+    assert peak < PEAK_LIMIT, f'peak {peak} bytes while streaming {streamed} bytes'
@@ -0,0 +1,148 @@
+"""GraphQL fields backed by camelCase values under the snake_case fallback resolvers"""
+
+import json
+
+
+def graphql(client, query, variables=None):
+    response = client.post('/graphql', json={'query': query, 'variables': variables or {}})
+    result = response.json
+    assert not result.get('errors'), result.get('errors')
+    return result['data']
+
+
+def test_user_settings_resolve(load_service):
+    users = load_service('user-service')
+    users.init_db()
+    with users.app.app_context():
+        db = users.get_db()
+        db.execute('INSERT INTO user_profiles (id, username) VALUES (1, ?)', ('plain',))
+        db.execute(
+            'INSERT INTO user_profiles (id, username, notification_settings, privacy_settings) VALUES (2, ?, ?, ?)',
+            ('custom', json.dumps({'pushEnabled': False}), json.dumps({'moodVisibility': 'private'}))
+        )
+        db.commit()
+
+    query = '''
+    query ($id: ID!) {
+        user(id: $id) {
+            notificationSettings { pushEnabled emailEnabled moodUpdates hugRequests achievements }
+            privacySettings { profileVisibility moodVisibility followersVisibility }
+        }
+    }
+    '''
+    client = users.app.test_client()
+
+    plain = graphql(client, query, {'id': '1'})['user']
+    assert plain['notificationSettings'] == {
+        'pushEnabled': True, 'emailEnabled': True, 'moodUpdates': True, 'hugRequests': True, 'achievements': True
+    }
+    assert plain['privacySettings'] == {
+        'profileVisibility': 'public', 'moodVisibility': 'friends', 'followersVisibility': 'public'
+    }
+
+    custom = graphql(client, query, {'id': '2'})['user']
+    assert custom['notificationSettings']['pushEnabled'] is False
+    assert custom['notificationSettings']['emailEnabled'] is True
+    assert custom['privacySettings']['moodVisibility'] == 'private'
+    assert custom['privacySettings']['profileVisibility'] == 'public'
+
+
+def test_group_hug_participant_count_resolves(load_service):
+    hugs = load_service('hug-service')
+    hugs.init_db()
+    with hugs.app.test_request_context():
+        group = hugs.create_group_hug(1, {
+            'title': 'Team hug', 'hugType': 'comfort', 'isPublic': True, 'initialParticipantIds': [2, 3]
+        })
+
+    client = hugs.app.test_client()
+    data = graphql(client, '''
+    query ($id: ID!) {
+        groupHug(id: $id) { id participantCount }
+        groupHugs { id participantCount }
+    }
+    ''', {'id': group['id']})
+
+    assert data['groupHug']['participantCount'] == 3
+    assert [g['participantCount'] for g in data['groupHugs']] == [3]
+    assert client.get(f"/group-hugs/{group['id']}").json['participantCount'] == 3
+
+
+def test_group_hug_participants_resolve_profiles_in_one_batch(load_service, monkeypatch):
+    users = load_service('user-service')
+    users.init_db()
+    with users.app.app_context():
+        db = users.get_db()
+        for user_id in range(1, 8):
+            db.execute(
+                'INSERT INTO user_profiles (id, username, display_name, avatar_url) VALUES (?, ?, ?, ?)',
+                (user_id, f'user{user_id}', f'User {user_id}', f'/avatars/{user_id}.png')
+            )
+        db.commit()
+    user_client = users.app.test_client()
+
+    hugs = load_service('hug-service')
+    hugs.init_db()
+    calls = []
+
+    class Response:
+        def __init__(self, response):
+            self.status_code = response.status_code
+            self._json = response.json
+
+        def json(self):
+            return self._json
+
+    def post(url, json=None, timeout=None):
+        calls.append(json['variables']['ids'])
+        return Response(user_client.post('/graphql', json=json))
+
+    monkeypatch.setattr(hugs.user_profiles.session, 'post', post)
+
+    with hugs.app.test_request_context():
+        hugs.create_group_hug(1, {'title': 'A', 'hugType': 'comfort', 'isPublic': True, 'initialParticipantIds': [2, 3]})
+        hugs.create_group_hug(4, {'title': 'B', 'hugType': 'comfort', 'isPublic': True, 'initialParticipantIds': [5, 6, 7]})
+
+    data = graphql(hugs.app.test_client(), '''
+    {
+        groupHugs {
+            creator { username }
+            participants { userId username displayName avatarUrl user { id } }
+        }
+    }
+    ''')
+
+    participants = [p for group in data['groupHugs'] for p in group['participants']]
+    assert len(participants) == 7
+    for participant in participants:
+        user_id = participant['userId']
+        assert participant['username'] == f'user{user_id}'
+        assert participant['displayName'] == f'User {user_id}'
+        assert participant['avatarUrl'] == f'/avatars/{user_id}.png'
+        assert participant['user']['id'] == user_id
+    assert len(calls) == 1
+
+
+def test_mood_analytics_resolve(load_service):
+    moods = load_service('mood-service')
+    moods.init_db()
+    with moods.app.test_request_context():
+        for mood, score in (('happy', 8), ('happy', 6), ('calm', 7)):
+            moods.create_mood(1, {'mood': mood, 'score': score})
+
+    client = moods.app.test_client()
+    query = '''
+    {
+        moodAnalytics(userId: "1", timeRange: 30) {
+            userId timeRange moodFrequency moodByDayOfWeek moodByTimeOfDay averageScore streak insights
+        }
+    }
+    '''
+    for _ in range(2):  # computed, then served from the analytics cache
+        analytics = graphql(client, query)['moodAnalytics']
+        assert analytics['userId'] == '1'
+        assert analytics['timeRange'] == 30
+        assert analytics['moodFrequency'] == {'happy': 2, 'calm': 1}
+        assert analytics['averageScore'] == 7.0
+        assert analytics['moodByDayOfWeek'] and analytics['moodByTimeOfDay']
+        assert analytics['streak'] == 1
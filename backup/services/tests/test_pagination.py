@@ -0,0 +1,59 @@
+"""Malformed keyset cursors are rejected with 400, never reach SQLite"""
+
+import base64
+import json
+
+import pytest
+
+from shared.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def raw_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+BAD_CURSORS = [
+    raw_cursor([{'a': 1}, [2]]),
+    raw_cursor(['2024-01-01 00:00:00', None]),
+    raw_cursor([True, 1]),
+    raw_cursor(['2024-01-01 00:00:00']),
+    raw_cursor({'created_at': 'x', 'id': 1}),
+    'not base64!'
+]
+
+
+@pytest.mark.parametrize('cursor', BAD_CURSORS)
+def test_decode_cursor_rejects_malformed_keys(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+
+
+def test_decode_cursor_round_trips():
+    assert decode_cursor(encode_cursor('2024-01-01 00:00:00', 'x')) == ('2024-01-01 00:00:00', 'x')
+    assert decode_cursor(encode_cursor('2024-01-01 00:00:00', 7)) == ('2024-01-01 00:00:00', 7)
+    assert decode_cursor(encode_cursor(1.5, 7)) == (1.5, 7)
+
+
+@pytest.mark.parametrize('cursor', BAD_CURSORS[:3])
+def test_hug_lists_answer_400(load_service, cursor):
+    hugs = load_service('hug-service')
+    hugs.init_db()
+    with hugs.app.test_request_context():
+        group = hugs.create_group_hug(1, {'title': 'g', 'hugType': 'comfort', 'isPublic': True})
+
+    client = hugs.app.test_client()
+    for path in (
+        '/users/1/sent-hugs', '/users/1/received-hugs', '/users/1/hug-requests',
+        '/group-hugs', '/users/1/group-hugs', f"/group-hugs/{group['id']}"
+    ):
+        response = client.get(path, query_string={'after': cursor})
+        assert response.status_code == 400, path
+        assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+@pytest.mark.parametrize('cursor', BAD_CURSORS[:3])
+def test_mood_history_answers_400(load_service, cursor):
+    moods = load_service('mood-service')
+    moods.init_db()
+    response = moods.app.test_client().get('/users/1/moods', query_string={'after': cursor})
+    assert response.status_code == 400
@@ -0,0 +1,56 @@
+"""Password operations fail fast with a busy answer when the hasher is saturated"""
+
+import pytest
+
+CHANGE_PASSWORD = 'mutation { changePassword(currentPassword: "password123", newPassword: "another1") { success message } }'
+
+
+@pytest.fixture
+def auth(load_service, monkeypatch):
+    monkeypatch.setenv('BCRYPT_ROUNDS', '4')
+    monkeypatch.setenv('PASSWORD_HASH_WORKERS', '0')
+    monkeypatch.setenv('PASSWORD_HASH_QUEUE', '1')
+    service = load_service('auth-service')
+    service.signing_keys.load()
+    service.init_db()
+    return service
+
+
+@pytest.fixture
+def saturate(auth):
+    """Take every hasher slot, as concurrent logins would, until the test ends"""
+    def take_all():
+        taken = 0
+        while auth.password_hasher._slots.acquire(blocking=False):
+            taken += 1
+        assert taken == 2
+        return taken
+
+    taken = []
+    yield lambda: taken.append(take_all())
+    for _ in range(sum(taken)):
+        auth.password_hasher._slots.release()
+
+
+def test_login_returns_503_when_busy(auth, saturate):
+    client = auth.app.test_client()
+    saturate()
+    response = client.post('/auth/login', json={'email': 'testuser', 'password': 'password123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_change_password_reports_busy(auth, saturate):
+    client = auth.app.test_client()
+    token = client.post('/auth/login', json={'email': 'testuser', 'password': 'password123'}).get_json()['token']
+    with auth.app.app_context():
+        stored = auth.get_user_by_username('testuser')['password']
+    saturate()
+
+    result = client.post('/graphql', headers={'Authorization': f'Bearer {token}'}, json={'query': CHANGE_PASSWORD}).get_json()
+
+    assert not result.get('errors'), result.get('errors')
+    assert result['data']['changePassword'] == {'success': False, 'message': 'Service busy, please try again'}
+    assert auth.password_hasher.stats()['rejected'] == 1
+    with auth.app.app_context():
+        assert auth.get_user_by_username('testuser')['password'] == stored
@@ -0,0 +1,60 @@
+"""shared.profiles: batched, cached User service lookups"""
+
+import requests
+
+from shared.profiles import UserProfiles
+
+
+class Response:
+    status_code = 200
+
+    def __init__(self, users):
+        self._users = users
+
+    def json(self):
+        return {'data': {'users': self._users}}
+
+
+def test_fetch_batches_and_caches(monkeypatch):
+    profiles = UserProfiles('http://users')
+    calls = []
+
+    def post(url, json=None, timeout=None):
+        calls.append(json['variables']['ids'])
+        return Response([{'id': i, 'username': f'user{i}', 'displayName': None, 'avatarUrl': None}
+                         for i in json['variables']['ids'] if i != '3'])
+
+    monkeypatch.setattr(profiles.session, 'post', post)
+
+    result = profiles.fetch([1, 2, 2, 3])
+    assert calls == [['1', '2', '3']]
+    assert result['1']['username'] == 'user1' and set(result) == {'1', '2'}
+
+    # Found users come from the cache; the unknown one is asked for again
+    assert set(profiles.fetch([1, 2, 3])) == {'1', '2'}
+    assert calls[1] == ['3']
+
+
+def test_placeholders_when_user_service_is_down(monkeypatch):
+    profiles = UserProfiles('http://users', placeholders=True)
+
+    def post(url, json=None, timeout=None):
+        raise requests.ConnectionError('down')
+
+    monkeypatch.setattr(profiles.session, 'post', post)
+
+    result = profiles.fetch([7])
+    assert result['7']['username'] == 'user7'
+    assert profiles.cache.get('7') is None
+
+
+def test_mood_feed_attaches_authors(load_service, monkeypatch):
+    moods = load_service('mood-service')
+    monkeypatch.setattr(moods.user_profiles.session, 'post', lambda url, json=None, timeout=None: Response(
+        [{'id': '5', 'username': 'sam', 'displayName': 'Sam', 'avatarUrl': '/sam.png'}]
+    ))
+
+    feed = [{'user_id': 5}, {'user_id': 6}]
+    moods.attach_authors(feed)
+    assert feed[0]['display_name'] == 'Sam' and feed[0]['avatar_url'] == '/sam.png'
+    assert feed[1]['username'] is None
@@ -0,0 +1,143 @@
+"""Hot queries resolve through indexes once the migrations have run.
+
+Each test calls the service functions behind the hot endpoints against a
+freshly migrated database, captures the SQL they execute and checks its
+EXPLAIN QUERY PLAN: every access to a hot table must be an index (or
+primary key) lookup, never a full table scan.
+"""
+
+import re
+
+import pytest
+
+from shared.pagination import encode_cursor
+
+HOT_TABLES = {
+    'moods', 'mood_rollups', 'hugs', 'hug_requests', 'group_hugs', 'group_hug_participants',
+    'user_badges', 'user_profiles'
+}
+
+TABLE_ACCESS = re.compile(r'^(?:SCAN|SEARCH) (\w+)(?: AS \w+)?(.*)$')
+INDEXED = re.compile(r'USING (?:COVERING )?INDEX|USING (?:INTEGER )?PRIMARY KEY')
+ALIAS = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?(?!(?:WHERE|JOIN|ON|ORDER|GROUP|LIMIT|UNION)\b)(\w+)', re.I)
+
+AFTER = encode_cursor('2024-01-01 00:00:00', 'x')
+
+
+def query_plans(service, calls):
+    """[(sql, plan lines)] for every SELECT run by calls, inside one request"""
+    with service.app.test_request_context():
+        db = service.get_db()
+        statements = []
+        db.set_trace_callback(statements.append)
+        for call in calls:
+            result = call(db)
+            if callable(result):
+                # Export record generators take the connection to stream from
+                list(result(db))
+        db.set_trace_callback(None)
+
+        return [
+            (sql, [row[3] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}')])
+            for sql in statements
+            if sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+        ]
+
+
+def table_scans(plans, tables=HOT_TABLES):
+    """Plan lines that read a hot table without an index"""
+    scans = []
+    for sql, plan in plans:
+        for line in plan:
+            match = TABLE_ACCESS.match(line)
+            if match and match.group(1) in tables and not INDEXED.search(match.group(2)):
+                scans.append((' '.join(sql.split()), line))
+    return scans
+
+
+def alias_tables(plans):
+    """Resolve join aliases (FROM hugs h) so SEARCH h lines count as hugs"""
+    resolved = []
+    for sql, plan in plans:
+        aliases = {alias: table for table, alias in ALIAS.findall(sql)}
+        resolved.append((sql, [
+            re.sub(r'^(SCAN|SEARCH) (\w+)', lambda m: f'{m.group(1)} {aliases.get(m.group(2), m.group(2))}', line)
+            for line in plan
+        ]))
+    return resolved
+
+
+def assert_indexed(plans):
+    plans = alias_tables(plans)
+    assert plans, 'no queries were captured'
+    searched = {TABLE_ACCESS.match(line).group(1) for _, plan in plans for line in plan if TABLE_ACCESS.match(line)}
+    assert searched & HOT_TABLES
+    assert table_scans(plans) == []
+
+
+def test_mood_queries_use_indexes(load_service):
+    moods = load_service('mood-service')
+    moods.init_db()
+    plans = query_plans(moods, [
+        lambda db: moods.get_user_moods(1),
+        lambda db: moods.get_user_moods(1, after=AFTER),
+        lambda db: moods.get_public_moods_from_db(20),
+        lambda db: moods.get_public_moods_from_db(20, 50),
+        lambda db: moods.load_mood_aggregate(db.cursor(), 1, 30),
+        lambda db: moods.export_user_moods(1)
+    ])
+    assert_indexed(plans)
+
+    # The public feed pages a global set: it must come out of the index in order
+    feed = [plan for sql, plan in plans if 'is_public = 1' in sql]
+    assert feed and not any('TEMP B-TREE' in line for plan in feed for line in plan)
+
+
+def test_hug_queries_use_indexes(load_service):
+    hugs = load_service('hug-service')
+    hugs.init_db()
+    assert_indexed(query_plans(hugs, [
+        lambda db: hugs.get_user_sent_hugs(1),
+        lambda db: hugs.get_user_sent_hugs(1, after=AFTER),
+        lambda db: hugs.get_user_received_hugs(1),
+        lambda db: hugs.get_user_received_hugs(1, after=AFTER),
+        lambda db: hugs.get_user_hug_requests(1),
+        lambda db: hugs.get_user_hug_requests(1, after=AFTER),
+        lambda db: hugs.get_group_hugs(20),
+        lambda db: hugs.get_group_hugs(20, after=AFTER),
+        lambda db: hugs.get_group_hugs(20, 1),
+        lambda db: hugs.get_group_hugs(20, 1, AFTER),
+        lambda db: hugs.get_group_hug('g'),
+        lambda db: hugs.get_group_participants('g', after=AFTER),
+        lambda db: hugs.load_group_participants(db.cursor(), ['a', 'b']),
+        lambda db: hugs.count_group_participants(db.cursor(), ['a', 'b']),
+        lambda db: hugs.export_user_hugs(1, ('sent', 'received'))
+    ]))
+
+
+def test_user_queries_use_indexes(load_service):
+    users = load_service('user-service')
+    users.init_db()
+    with users.app.app_context():
+        db = users.get_db()
+        db.executemany('INSERT INTO user_profiles (id, username) VALUES (?, ?)', [(1, 'ann'), (2, 'bob')])
+        db.commit()
+
+    assert_indexed(query_plans(users, [
+        lambda db: users.get_user_badges(1),
+        lambda db: users.get_badges_for_users([1, 2]),
+        lambda db: users.get_users_by_ids([1, 2]),
+        lambda db: users.get_user_by_id(1)
+    ]))
+
+
+@pytest.mark.parametrize('plan_line, scan', [
+    ('SCAN moods', True),
+    ('SEARCH moods USING INDEX idx_moods_user_created (user_id=?)', False),
+    ('SEARCH p USING COVERING INDEX idx_group_participants_user (user_id=?)', False),
+    ('SEARCH user_profiles USING INTEGER PRIMARY KEY (rowid=?)', False),
+    ('SCAN (subquery-1)', False)
+])
+def test_table_scan_detection(plan_line, scan):
+    plans = alias_tables([('SELECT * FROM moods JOIN group_hug_participants p', [plan_line])])
+    assert bool(table_scans(plans)) == scan
@@ -0,0 +1,73 @@
+"""The auth service's revocation feed and the gateways' RevocationList"""
+
+import pytest
+
+from shared import revocation
+from shared.revocation import RevocationList
+
+
+@pytest.fixture
+def auth(load_service, monkeypatch):
+    monkeypatch.setenv('BCRYPT_ROUNDS', '4')
+    monkeypatch.setenv('PASSWORD_HASH_WORKERS', '0')
+    service = load_service('auth-service')
+    service.signing_keys.load()
+    service.init_db()
+    return service
+
+
+def login(client):
+    return client.post('/auth/login', json={'email': 'testuser', 'password': 'password123'}).get_json()
+
+
+def test_feed_needs_the_service_token(auth, monkeypatch):
+    client = auth.app.test_client()
+
+    # No token configured: loopback readers only
+    assert client.get('/auth/revocations').status_code == 200
+    assert client.get('/auth/revocations', environ_base={'REMOTE_ADDR': '10.1.2.3'}).status_code == 403
+
+    monkeypatch.setattr(auth, 'REVOCATION_FEED_TOKEN', 'feed-secret')
+    assert client.get('/auth/revocations').status_code == 403
+    assert client.get('/auth/revocations', headers={'X-Service-Token': 'wrong'}).status_code == 403
+    response = client.get(
+        '/auth/revocations', headers={'X-Service-Token': 'feed-secret'}, environ_base={'REMOTE_ADDR': '10.1.2.3'}
+    )
+    assert response.status_code == 200
+
+
+def test_feed_entries_carry_only_what_gateways_need(auth, monkeypatch):
+    client = auth.app.test_client()
+    first, second = login(client), login(client)
+    client.post('/auth/logout', headers={'Authorization': 'Bearer ' + first['token']})
+    with auth.app.app_context():
+        auth.revoke_user_access_tokens(second['user']['id'])
+
+    entries = client.get('/auth/revocations').get_json()['revocations']
+    assert [sorted(entry) for entry in entries] == [
+        ['expiresAt', 'id', 'jti'],
+        ['expiresAt', 'id', 'issuedBefore', 'userId']
+    ]
+
+    # A gateway presenting the token picks both up
+    monkeypatch.setattr(auth, 'REVOCATION_FEED_TOKEN', 'feed-secret')
+
+    class Response:
+        def __init__(self, response):
+            self.status_code = response.status_code
+            self._json = response.get_json()
+
+        def raise_for_status(self):
+            assert self.status_code == 200
+
+        def json(self):
+            return self._json
+
+    def get(url, params=None, headers=None, timeout=None):
+        return Response(client.get('/auth/revocations', query_string=params, headers=headers))
+
+    monkeypatch.setattr(revocation.requests, 'get', get)
+    revocations = RevocationList(capacity=100, token='feed-secret')
+    revocations.poll('http://auth/auth/revocations')
+    assert revocations.stats()['jtis'] == 1 and revocations.stats()['users'] == 1
+    assert revocations.cursor == entries[-1]['id']
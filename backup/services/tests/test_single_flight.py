@@ -0,0 +1,88 @@
+"""Concurrent cold misses share one computation"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from shared.cache import SingleFlight
+
+CALLERS = 100
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def run_together(fn, callers=CALLERS):
+    """Results of fn() called from callers threads released at the same moment"""
+    barrier = threading.Barrier(callers)
+
+    def call(_):
+        barrier.wait()
+        return fn()
+
+    with ThreadPoolExecutor(callers) as pool:
+        return list(pool.map(call, range(callers)))
+
+
+def test_one_computation_for_parallel_callers():
+    flight = SingleFlight()
+    computations = []
+
+    def compute():
+        computations.append(threading.get_ident())
+        # Stay in flight until every other caller has joined
+        wait_for(lambda: flight.shared == CALLERS - 1)
+        return {'value': 42}
+
+    results = run_together(lambda: flight.do('analytics:1:30', compute))
+
+    assert len(computations) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats()['executions'] == 1 and not flight.in_flight('analytics:1:30')
+
+
+def test_failure_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight()
+
+    def fail():
+        wait_for(lambda: flight.shared == 9)
+        raise RuntimeError('boom')
+
+    def call():
+        with pytest.raises(RuntimeError):
+            flight.do('key', fail)
+        return True
+
+    assert all(run_together(call, 10))
+    assert flight.do('key', lambda: 'fresh') == 'fresh'
+
+
+def test_cold_analytics_requests_recompute_once(load_service, monkeypatch):
+    moods = load_service('mood-service')
+    moods.init_db()
+    with moods.app.test_request_context():
+        moods.create_mood(1, {'mood': 'calm', 'score': 6})
+    moods.invalidate_mood_analytics(1)
+
+    build = moods.build_mood_analytics
+    computations = []
+
+    def counting_build(user_id, time_range, aggregate):
+        computations.append(user_id)
+        wait_for(lambda: moods.analytics_flight.shared == CALLERS - 1)
+        return build(user_id, time_range, aggregate)
+
+    monkeypatch.setattr(moods, 'build_mood_analytics', counting_build)
+
+    client = moods.app.test_client()
+    responses = run_together(lambda: client.get('/users/1/mood-analytics?timeRange=30'))
+
+    assert len(computations) == 1
+    assert {response.status_code for response in responses} == {200}
+    assert {response.get_json()['averageScore'] for response in responses} == {6.0}
@@ -0,0 +1,51 @@
+"""The API gateway's verified-token cache"""
+
+import time
+
+import pytest
+
+
+@pytest.fixture
+def gateway(load_service):
+    return load_service('api-gateway')
+
+
+def claims(user_id, expires_in=600):
+    return {'id': user_id, 'username': f'user{user_id}', 'exp': time.time() + expires_in}
+
+
+def test_entries_expire_at_token_exp(gateway, monkeypatch):
+    cache = gateway.TokenCache(10, max_ttl=300)
+    cache.set('soon', claims(1, expires_in=5), {'id': 1})
+    cache.set('later', claims(2, expires_in=3600), {'id': 2})
+    cache.set('expired', claims(3, expires_in=-1), {'id': 3})
+
+    assert cache.get('soon')[0] == {'id': 1}
+    assert cache.get('expired') == (None, None)
+
+    now = time.monotonic()
+    monkeypatch.setattr('shared.cache.time.monotonic', lambda: now + 10)
+    assert cache.get('soon') == (None, None)
+    assert cache.get('later')[0] == {'id': 2}
+
+    # exp beyond max_ttl is capped
+    monkeypatch.setattr('shared.cache.time.monotonic', lambda: now + 301)
+    assert cache.get('later') == (None, None)
+
+
+def test_revoke_and_bounded_size(gateway):
+    cache = gateway.TokenCache(3, max_ttl=300)
+    for i, user_id in enumerate([1, 1, 2]):
+        cache.set(f'token{i}', claims(user_id), {'id': user_id})
+
+    cache.revoke(user_id=1)
+    assert cache.get('token0') == cache.get('token1') == (None, None)
+    assert cache.get('token2')[0] == {'id': 2}
+    cache.revoke(token='token2')
+    assert cache.get('token2') == (None, None)
+
+    for i in range(5):
+        cache.set(f'new{i}', claims(i), {'id': i})
+    stats = cache.stats()
+    assert stats['size'] == 3 and stats['maxSize'] == 3
+    assert stats['hits'] == 1 and stats['misses'] == 3
@@ -0,0 +1,48 @@
+"""validateTokens and the auth service's user cache"""
+
+import pytest
+
+VALIDATE = 'query ($tokens: [String!]!) { validateTokens(tokens: $tokens) { valid user { id username } } }'
+
+
+@pytest.fixture
+def auth(load_service, monkeypatch):
+    monkeypatch.setenv('BCRYPT_ROUNDS', '4')
+    monkeypatch.setenv('PASSWORD_HASH_WORKERS', '0')
+    service = load_service('auth-service')
+    service.signing_keys.load()
+    service.init_db()
+    return service
+
+
+def validate(client, tokens):
+    result = client.post('/graphql', json={'query': VALIDATE, 'variables': {'tokens': tokens}}).get_json()
+    assert not result.get('errors'), result.get('errors')
+    return result['data']['validateTokens']
+
+
+def test_user_cache_is_short_lived_by_default(auth):
+    assert auth.USER_CACHE_TTL <= 5
+
+
+def test_user_writes_invalidate_the_cache(auth):
+    client = auth.app.test_client()
+    session = client.post('/auth/login', json={'email': 'testuser', 'password': 'password123'}).get_json()
+    user_id = session['user']['id']
+    assert validate(client, [session['token']])[0]['user']['username'] == 'testuser'
+
+    with auth.app.app_context():
+        db = auth.get_db()
+        db.execute('UPDATE users SET username = ? WHERE id = ?', ('renamed', user_id))
+        db.commit()
+        auth.user_changed(user_id)
+
+    assert validate(client, [session['token']])[0]['user']['username'] == 'renamed'
+
+    # A password change drops the record too (and revokes the token)
+    assert auth.user_cache.get(int(user_id)) is not None
+    client.post('/graphql', headers={'Authorization': 'Bearer ' + session['token']}, json={
+        'query': 'mutation { changePassword(currentPassword: "password123", newPassword: "another1") { success } }'
+    })
+    assert auth.user_cache.get(int(user_id)) is None
+    assert validate(client, [session['token']]) == [{'valid': False, 'user': None}]
@@ -12,12 +12,27 @@ import jwt
 from datetime import datetime, timedelta
 import logging
 from ariadne import load_schema_from_path, make_executable_schema, graphql_sync
-from ariadne import ObjectType, QueryType, MutationType
+from ariadne import ObjectType, QueryType, MutationType, snake_case_fallback_resolvers
+from ariadne import convert_camel_case_to_snake
 from ariadne.constants import PLAYGROUND_HTML
 import json
 import sqlite3  # Using SQLite for simplicity; in production, use PostgreSQL with SQLAlchemy
 from functools import wraps
 import requests
+import re
+import sys
+import time
+import bisect
+import threading
+import unicodedata
+
+# Shared service utilities live in ../shared
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from shared.db import SQLiteDatabase
+from shared.migrations import apply_migrations
+from shared.dataloader import BatchLoader
+from shared.cache import TTLCache
+from shared.jwks import KeySet, KeySetUnavailable, JWT_LEGACY_HS256
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -38,12 +53,26 @@ MOOD_SERVICE_URL = os.environ.get('MOOD_SERVICE_URL', 'http://localhost:5003')
 HUG_SERVICE_URL = os.environ.get('HUG_SERVICE_URL', 'http://localhost:5004')
 SOCIAL_SERVICE_URL = os.environ.get('SOCIAL_SERVICE_URL', 'http://localhost:5005')
 STREAK_SERVICE_URL = os.environ.get('STREAK_SERVICE_URL', 'http://localhost:5006')
+JWKS_URL = os.environ.get('JWKS_URL', f'{AUTH_SERVICE_URL}/.well-known/jwks.json')
+
+# Full-text matches ranked per search; broad prefixes rank the first this many in id order
+SEARCH_RANK_CANDIDATES = int(os.environ.get('SEARCH_RANK_CANDIDATES', 5000))
+
+# In-memory autocomplete: top users per short prefix, plus recent search results
+PREFIX_INDEX_ENABLED = os.environ.get('PREFIX_INDEX_ENABLED', 'true').lower() == 'true'
+PREFIX_INDEX_MAX_LENGTH = int(os.environ.get('PREFIX_INDEX_MAX_LENGTH', 3))
+PREFIX_INDEX_SIZE = int(os.environ.get('PREFIX_INDEX_SIZE', 25))  # users kept per prefix
+PREFIX_INDEX_REBUILD_INTERVAL = int(os.environ.get('PREFIX_INDEX_REBUILD_INTERVAL', 3600))  # seconds
+SEARCH_CACHE_SIZE = int(os.environ.get('SEARCH_CACHE_SIZE', 1024))
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 30))  # seconds; bounds staleness across processes
 
 # Database setup - would typically use SQLAlchemy in production
+DATABASE_PATH = os.environ.get('DATABASE_PATH', 'user.db')
+database = SQLiteDatabase(DATABASE_PATH, app)
+
 def get_db():
-    db = sqlite3.connect('user.db')
-    db.row_factory = sqlite3.Row
-    return db
+    """Connection for the current request (pooled, released at teardown)"""
+    return database.get()
 
 def init_db():
     with app.app_context():
@@ -115,16 +144,82 @@ def init_db():
             db.commit()
         except sqlite3.Error as e:
             logger.error(f"Error creating sample badges: {str(e)}")
+        
+        apply_migrations(db, MIGRATIONS)
+
+# Schema migrations, applied in order by init_db()
+MIGRATIONS = [
+    (1, 'user hot-path indexes', [
+        # Badges of a user, newest first
+        'CREATE INDEX IF NOT EXISTS idx_user_badges_user_earned ON user_badges (user_id, earned_at)',
+        # Search results are ordered by username
+        'CREATE INDEX IF NOT EXISTS idx_user_profiles_username ON user_profiles (username)'
+    ])
+]
+
+def fts5_available(cursor):
+    """Whether this SQLite build has the FTS5 extension"""
+    cursor.execute('PRAGMA compile_options')
+    return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+def create_user_search_index(cursor):
+    """Full-text index over usernames and display names, kept in step by triggers.
+    
+    An external-content FTS5 table stores only the index (rows are read back
+    from user_profiles), with prefix indexes so autocomplete queries of one
+    to three characters are a single index lookup. Without FTS5, search keeps
+    using LIKE.
+    """
+    if not fts5_available(cursor):
+        logger.warning("SQLite was built without FTS5; user search will use LIKE scans")
+        return
+    
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS user_search USING fts5(
+        username, display_name,
+        content='user_profiles', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='1 2 3'
+    )
+    ''')
+    
+    # Username matches outrank display name matches
+    cursor.execute("INSERT INTO user_search (user_search, rank) VALUES ('rank', 'bm25(2.0, 1.0)')")
+    
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS user_search_insert AFTER INSERT ON user_profiles BEGIN
+        INSERT INTO user_search (rowid, username, display_name)
+        VALUES (new.id, new.username, new.display_name);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS user_search_delete AFTER DELETE ON user_profiles BEGIN
+        INSERT INTO user_search (user_search, rowid, username, display_name)
+        VALUES ('delete', old.id, old.username, old.display_name);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS user_search_update AFTER UPDATE OF username, display_name ON user_profiles BEGIN
+        INSERT INTO user_search (user_search, rowid, username, display_name)
+        VALUES ('delete', old.id, old.username, old.display_name);
+        INSERT INTO user_search (rowid, username, display_name)
+        VALUES (new.id, new.username, new.display_name);
+    END
+    ''')
+    
+    # Index the profiles that already exist
+    cursor.execute("INSERT INTO user_search (user_search) VALUES ('rebuild')")
+
+MIGRATIONS.append((2, 'user search index', [create_user_search_index]))
 
 # Authentication utilities
+key_set = KeySet(JWKS_URL, legacy_secret=SECRET_KEY if JWT_LEGACY_HS256 else None)
+
 def verify_token(token):
-    """Verify a JWT token and return the payload"""
+    """Verify a JWT token against the Auth service's published keys and return the payload"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
+        return key_set.decode(token)
+    except (jwt.InvalidTokenError, KeySetUnavailable):
         return None
 
 def get_user_from_header():
@@ -190,6 +285,8 @@ def get_user_by_id(user_id):
                     # Get the created profile
                     cursor.execute('SELECT * FROM user_profiles WHERE id = ?', (user_id,))
                     user = cursor.fetchone()
+                    if user:
+                        search_profile_changed(None, dict(user))
         except Exception as e:
             logger.error(f"Error fetching user from Auth service: {str(e)}")
     
@@ -198,11 +295,350 @@ def get_user_by_id(user_id):
     
     return dict(user)
 
+def get_users_by_ids(user_ids):
+    """Load many user profiles with a single IN (...) query, keyed by str(id)"""
+    if not user_ids:
+        return {}
+    
+    db = get_db()
+    cursor = db.cursor()
+    
+    placeholders = ', '.join('?' for _ in user_ids)
+    cursor.execute(f'SELECT * FROM user_profiles WHERE id IN ({placeholders})', list(user_ids))
+    users = {str(user['id']): dict(user) for user in cursor.fetchall()}
+    
+    # Profiles not created yet are fetched from the Auth service one by one (rare)
+    for user_id in user_ids:
+        if str(user_id) not in users:
+            user = get_user_by_id(user_id)
+            if user:
+                users[str(user_id)] = user
+    
+    return users
+
+def get_badges_for_users(user_ids):
+    """Load badges of many users with a single query, keyed by str(user_id)"""
+    badges = {str(user_id): [] for user_id in user_ids}
+    if not user_ids:
+        return badges
+    
+    db = get_db()
+    cursor = db.cursor()
+    
+    placeholders = ', '.join('?' for _ in user_ids)
+    cursor.execute(
+        f'''
+        SELECT b.*, ub.earned_at, ub.user_id AS badge_user_id
+        FROM badges b
+        JOIN user_badges ub ON b.id = ub.badge_id
+        WHERE ub.user_id IN ({placeholders})
+        ORDER BY ub.user_id, ub.earned_at DESC
+        ''',
+        list(user_ids)
+    )
+    
+    for row in cursor.fetchall():
+        badge = dict(row)
+        user_id = str(badge.pop('badge_user_id'))
+        badges.setdefault(user_id, []).append(badge)
+    
+    return badges
+
+def create_loaders():
+    """Per-request batch loaders for GraphQL execution"""
+    return {
+        'users': BatchLoader(get_users_by_ids),
+        'badges': BatchLoader(get_badges_for_users)
+    }
+
+# Words of a search query, as FTS5 sees them (unicode61 splits on anything but letters and digits)
+SEARCH_TERM_PATTERN = re.compile(r'[^\W_]+')
+
+def search_match_expression(query):
+    """FTS5 MATCH expression for every word of query as a prefix, or None if it has no words"""
+    terms = SEARCH_TERM_PATTERN.findall(query)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def fold_search_text(text):
+    """Lowercase text with diacritics removed, the way the unicode61 tokenizer compares it"""
+    if not text or text.isascii():
+        return (text or '').lower()
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+def search_words(username, display_name, folded_username=None):
+    """Folded words a profile can be found by"""
+    if folded_username is None:
+        folded_username = fold_search_text(username)
+    return set(SEARCH_TERM_PATTERN.findall(folded_username)) | \
+        set(SEARCH_TERM_PATTERN.findall(fold_search_text(display_name)))
+
+class UserSearchIndex:
+    """Top matching users for every short search prefix, kept in memory.
+
+    For each prefix of up to max_length characters of any word of a username
+    or display name, a sorted list holds the first `size` matching users:
+    users whose username starts with the prefix first, then by username.
+    A one-word query that short is answered from its list without SQLite.
+    Creates and renames are applied incrementally. A list that overflowed
+    and then lost members to renames may be too short to answer a query;
+    such queries fall back to full-text search until the next rebuild.
+    """
+    
+    def __init__(self, max_length, size):
+        self.max_length = max_length
+        self.size = size
+        self.loaded = False
+        self.builds = 0
+        self.last_build_seconds = 0.0
+        self.hits = 0
+        self.fallbacks = 0
+        # prefix -> sorted [(not username match, folded username, user id)]
+        self._lists = {}
+        # Prefixes whose list holds every matching user
+        self._complete = set()
+        # (old, new) profile changes seen while a build runs, replayed onto its result
+        self._pending = None
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def _entries(self, profile):
+        """(prefix, sort key) of every list a profile belongs in"""
+        username = fold_search_text(profile['username'])
+        prefixes = {
+            word[:length]
+            for word in search_words(profile['username'], profile['display_name'], username)
+            for length in range(1, min(len(word), self.max_length) + 1)
+        }
+        return [(prefix, (not username.startswith(prefix), username, profile['id'])) for prefix in prefixes]
+    
+    def _insert(self, lists, complete, prefix, key):
+        entries = lists.get(prefix)
+        if entries is None:
+            # No user had this prefix before, so the list is complete
+            lists[prefix] = [key]
+            complete.add(prefix)
+            return
+        
+        if len(entries) >= self.size and key > entries[-1]:
+            complete.discard(prefix)
+            return
+        
+        position = bisect.bisect_left(entries, key)
+        if position < len(entries) and entries[position] == key:
+            return
+        entries.insert(position, key)
+        if len(entries) > self.size:
+            entries.pop()
+            complete.discard(prefix)
+    
+    def _remove(self, lists, complete, prefix, key):
+        entries = lists.get(prefix)
+        if entries is None:
+            return
+        
+        position = bisect.bisect_left(entries, key)
+        if position < len(entries) and entries[position] == key:
+            del entries[position]
+            if not entries and prefix in complete:
+                del lists[prefix]
+                complete.discard(prefix)
+    
+    def _apply(self, lists, complete, old, new):
+        if old is not None:
+            for prefix, key in self._entries(old):
+                self._remove(lists, complete, prefix, key)
+        if new is not None:
+            for prefix, key in self._entries(new):
+                self._insert(lists, complete, prefix, key)
+    
+    def update(self, old, new):
+        """Apply a created (old None) or renamed profile; call after commit"""
+        with self._lock:
+            if self.loaded:
+                self._apply(self._lists, self._complete, old, new)
+            if self._pending is not None:
+                self._pending.append((old, new))
+    
+    def build(self, db):
+        """Rebuild every list from user_profiles; queries keep using the old lists meanwhile"""
+        started = time.monotonic()
+        with self._lock:
+            self._pending = []
+        
+        lists = {}
+        complete = set()
+        try:
+            cursor = db.execute('SELECT id, username, display_name FROM user_profiles')
+            for profile in cursor:
+                for prefix, key in self._entries(profile):
+                    self._insert(lists, complete, prefix, key)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        
+        # Changes committed while reading may be missing from the snapshot; applying
+        # them again is harmless because inserts and removes are idempotent
+        with self._lock:
+            for old, new in self._pending:
+                self._apply(lists, complete, old, new)
+            self._pending = None
+            self._lists = lists
+            self._complete = complete
+            self.loaded = True
+            self.builds += 1
+            self.last_build_seconds = time.monotonic() - started
+        
+        logger.info(f"Built search prefix index: {len(lists)} prefixes in {self.last_build_seconds:.1f}s")
+    
+    def lookup(self, prefix, limit):
+        """Ids of the first limit users matching prefix, or None when the lists can't tell"""
+        with self._lock:
+            if not self.loaded or len(prefix) > self.max_length:
+                return None
+            
+            entries = self._lists.get(prefix, [])
+            if len(entries) < limit and prefix not in self._complete and prefix in self._lists:
+                self.fallbacks += 1
+                return None
+            
+            self.hits += 1
+            return [key[2] for key in entries[:limit]]
+    
+    def start(self, interval):
+        """Build in a background thread now, then again every interval seconds"""
+        if self._thread is not None:
+            return
+        
+        def run():
+            while True:
+                try:
+                    with database.connection() as db:
+                        self.build(db)
+                except Exception as e:
+                    logger.error(f"Error building search prefix index: {str(e)}")
+                time.sleep(interval)
+        
+        self._thread = threading.Thread(target=run, name='search-prefix-index', daemon=True)
+        self._thread.start()
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'loaded': self.loaded,
+                'prefixes': len(self._lists),
+                'entries': sum(len(entries) for entries in self._lists.values()),
+                'completePrefixes': len(self._complete),
+                'builds': self.builds,
+                'lastBuildSeconds': round(self.last_build_seconds, 3),
+                'hits': self.hits,
+                'fallbacks': self.fallbacks
+            }
+
+user_search_index = UserSearchIndex(PREFIX_INDEX_MAX_LENGTH, PREFIX_INDEX_SIZE)
+
+# Recent search results by (folded query words, limit); see search_profile_changed
+search_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+def search_cache_key(query, limit):
+    terms = SEARCH_TERM_PATTERN.findall(fold_search_text(query))
+    # Queries without words take the LIKE path and are cached verbatim
+    return (tuple(terms) if terms else query, limit)
+
+def search_key_matches(key, profile):
+    """Whether the cached search key could find profile"""
+    terms = key[0]
+    if isinstance(terms, str):
+        return any(
+            terms.lower() in (value or '').lower()
+            for value in (profile['username'], profile['display_name'])
+        )
+    
+    words = search_words(profile['username'], profile['display_name'])
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+def invalidate_search_results(user_id):
+    """Drop cached searches that returned this user (call after any change to its profile)"""
+    search_cache.delete_where(lambda key, users: any(user['id'] == user_id for user in users))
+
+def search_profile_changed(old, new):
+    """Keep the prefix index and search cache in step with a created or changed profile"""
+    if old is not None and (old['username'], old['display_name']) == (new['username'], new['display_name']):
+        invalidate_search_results(new['id'])
+        return
+    
+    user_search_index.update(old, new)
+    search_cache.delete_where(
+        lambda key, users: any(user['id'] == new['id'] for user in users) or search_key_matches(key, new)
+    )
+
+def user_search_index_exists(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_search'")
+    return cursor.fetchone() is not None
+
 def search_users(query, limit=10):
-    """Search users by username or display name"""
+    """Search users by username or display name (recent results are served from search_cache)"""
+    key = search_cache_key(query, limit)
+    users = search_cache.get(key)
+    if users is None:
+        users = find_users(query, limit)
+        search_cache.set(key, users)
+    return users
+
+def get_profiles_in_order(user_ids):
+    """Profiles for user_ids, in that order, with one IN (...) query"""
+    if not user_ids:
+        return []
+    
     db = get_db()
     cursor = db.cursor()
     
+    placeholders = ', '.join('?' for _ in user_ids)
+    cursor.execute(f'SELECT * FROM user_profiles WHERE id IN ({placeholders})', list(user_ids))
+    users = {user['id']: dict(user) for user in cursor.fetchall()}
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+def find_users(query, limit):
+    """Search users by username or display name.
+    
+    Words of the query match the start of words in either field. A single
+    word of up to PREFIX_INDEX_MAX_LENGTH characters is looked up in the
+    in-memory prefix index (username matches first, then by username).
+    Longer queries go to the full-text index, best matches first; only the
+    first SEARCH_RANK_CANDIDATES matches are ranked, which bounds the cost
+    of broad prefixes. Queries without letters or digits, and databases
+    without the FTS5 index, fall back to a substring scan ordered by
+    username.
+    """
+    terms = SEARCH_TERM_PATTERN.findall(fold_search_text(query))
+    if len(terms) == 1:
+        user_ids = user_search_index.lookup(terms[0], limit)
+        if user_ids is not None:
+            return get_profiles_in_order(user_ids)
+    
+    db = get_db()
+    cursor = db.cursor()
+    
+    match = search_match_expression(query)
+    if match and user_search_index_exists(cursor):
+        cursor.execute(
+            '''
+            SELECT p.* FROM (
+                SELECT rowid, rank FROM user_search
+                WHERE user_search MATCH ?
+                LIMIT ?
+            ) s
+            JOIN user_profiles p ON p.id = s.rowid
+            ORDER BY s.rank, p.username
+            LIMIT ?
+            ''',
+            (match, SEARCH_RANK_CANDIDATES, limit)
+        )
+        return [dict(user) for user in cursor.fetchall()]
+    
     search_query = f"%{query}%"
     cursor.execute(
         '''
@@ -287,7 +723,11 @@ def update_user_profile(user_id, profile_data):
     cursor.execute('SELECT * FROM user_profiles WHERE id = ?', (user_id,))
     updated = cursor.fetchone()
     
-    return dict(updated) if updated else None
+    if not updated:
+        return None
+    
+    search_profile_changed(dict(existing), dict(updated))
+    return dict(updated)
 
 def get_user_badges(user_id):
     """Get badges for a user"""
@@ -360,6 +800,7 @@ def set_user_online_status(user_id, is_online):
                 (user_id,)
             )
         db.commit()
+        invalidate_search_results(user_id)
         
         return {'success': True}
     except sqlite3.Error as e:
@@ -466,22 +907,27 @@ query = QueryType()
 mutation = MutationType()
 user = ObjectType("User")
 
+def queue_badges(info, users):
+    """Queue badge loading for every user in a result so User.badges resolves in one batch"""
+    info.context['loaders']['badges'].enqueue(user['id'] for user in users if user)
+
 @query.field("user")
 def resolve_user(_, info, id):
-    return get_user_by_id(id)
+    user = info.context['loaders']['users'].load(id)
+    queue_badges(info, [user])
+    return user
 
 @query.field("users")
 def resolve_users(_, info, ids):
-    users = []
-    for user_id in ids:
-        user = get_user_by_id(user_id)
-        if user:
-            users.append(user)
+    users = [user for user in info.context['loaders']['users'].load_many(ids or []) if user]
+    queue_badges(info, users)
     return users
 
 @query.field("searchUsers")
 def resolve_search_users(_, info, query, limit=10):
-    return search_users(query, limit)
+    users = search_users(query, limit)
+    queue_badges(info, users)
+    return users
 
 @query.field("badges")
 def resolve_badges(_, info):
@@ -529,56 +975,50 @@ def resolve_set_online_status(_, info, isOnline):
 
 @user.field("badges")
 def resolve_user_badges_field(obj, info):
-    return get_user_badges(obj['id'])
+    return info.context['loaders']['badges'].load(obj['id'])
+
+# Settings are stored as the camelCase JSON the client sent; the schema's
+# snake_case fallback resolvers read snake_case keys.
+DEFAULT_NOTIFICATION_SETTINGS = {
+    'pushEnabled': True,
+    'emailEnabled': True,
+    'moodUpdates': True,
+    'hugRequests': True,
+    'achievements': True
+}
+
+DEFAULT_PRIVACY_SETTINGS = {
+    'profileVisibility': 'public',
+    'moodVisibility': 'friends',
+    'followersVisibility': 'public'
+}
+
+def load_settings(settings_json, defaults):
+    """Stored settings over their defaults, keyed for the snake_case resolvers"""
+    settings = dict(defaults)
+    if settings_json:
+        try:
+            stored = json.loads(settings_json)
+            if isinstance(stored, dict):
+                settings.update(stored)
+        except ValueError:
+            pass
+    return {convert_camel_case_to_snake(key): value for key, value in settings.items()}
 
 @user.field("notificationSettings")
 def resolve_notification_settings(obj, info):
-    settings_json = obj.get('notification_settings')
-    if not settings_json:
-        return {
-            'pushEnabled': True,
-            'emailEnabled': True,
-            'moodUpdates': True,
-            'hugRequests': True,
-            'achievements': True
-        }
-    
-    try:
-        return json.loads(settings_json)
-    except:
-        return {
-            'pushEnabled': True,
-            'emailEnabled': True,
-            'moodUpdates': True,
-            'hugRequests': True,
-            'achievements': True
-        }
+    return load_settings(obj.get('notification_settings'), DEFAULT_NOTIFICATION_SETTINGS)
 
 @user.field("privacySettings")
 def resolve_privacy_settings(obj, info):
-    settings_json = obj.get('privacy_settings')
-    if not settings_json:
-        return {
-            'profileVisibility': 'public',
-            'moodVisibility': 'friends',
-            'followersVisibility': 'public'
-        }
-    
-    try:
-        return json.loads(settings_json)
-    except:
-        return {
-            'profileVisibility': 'public',
-            'moodVisibility': 'friends',
-            'followersVisibility': 'public'
-        }
+    return load_settings(obj.get('privacy_settings'), DEFAULT_PRIVACY_SETTINGS)
 
 # Create executable schema
-schema = make_executable_schema(type_defs, query, mutation, user)
+schema = make_executable_schema(type_defs, query, mutation, user, snake_case_fallback_resolvers)
 
 # Authentication middleware for GraphQL
 def get_context_value():
-    return {'user': get_user_from_header()}
+    return {'user': get_user_from_header(), 'loaders': create_loaders()}
 
 # GraphQL endpoint
 @app.route('/graphql', methods=['GET', 'POST'])
@@ -691,11 +1131,23 @@ def get_badges_api():
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'service': 'user'}), 200
+    return jsonify({
+        'status': 'healthy',
+        'service': 'user',
+        'searchIndex': user_search_index.stats(),
+        'searchCache': search_cache.stats()
+    }), 200
 
 if __name__ == '__main__':
     # Initialize database
     init_db()
     
+    # Fetch token verification keys, then keep them fresh in the background
+    key_set.start()
+    
+    # Build the autocomplete prefix index in the background; searches use SQLite until it is ready
+    if PREFIX_INDEX_ENABLED:
+        user_search_index.start(PREFIX_INDEX_REBUILD_INTERVAL)
+    
     # Start server
     app.run(host='0.0.0.0', port=PORT)
\ No newline at end of file